@@ -19,13 +19,86 @@
         「一時停止」「再開ボタン」で、一時停止・再開ができます。
         シミュレーションが終了すると、「結果サマリ」のウィンドウ
         が表示されます。
+        画面なしで実行する場合は、パラメータファイル(json)を指定
+        して、以下のように実行してください。結果(csv)とサマリが
+        書き出されます。
+            python3 cv19sim.py run params.json --out history.csv
+        同じパラメータで、乱数シードだけを変えて複数回実行し、結
+        果を集計する場合（アンサンブル実行）は、以下のように実行
+        してください。サイクル毎の人数の平均・5%/50%/95%点(csv)
+        と、結果のばらつきのサマリが書き出されます。
+            python3 cv19sim.py ensemble params.json -n 100 --out band.csv
+        人数が少ない場合は、--engine batchを指定すると、全レプリカ
+        をまとめて配列で実行します（NumPyが必要です。１回ずつ実行
+        するより大幅に速くなります）。
+            python3 cv19sim.py ensemble params.json -n 1000 --engine batch --out band.csv
+        パラメータを変化させて（組合せて）実行する場合（パラメータ
+        スイープ）は、変化させるパラメータと範囲を書いたファイル
+        (json)を指定して、以下のように実行してください。組合せ毎
+        の結果(csv)と、サイクル毎の人数(csv)が書き出されます。
+            python3 cv19sim.py sweep sweep.json --out sweep.csv --histories sweep_his.csv
+        「run」「resume」「ensemble」「sweep」コマンドで--storeを指定
+        すると、実行結果（パラメータ・結果サマリの指標・サイクル毎
+        の人数）をデータベース(SQLite)に追加します。保存した結果は、
+        パラメータや指標の範囲で検索できます（--historyで、実行毎
+        のサイクル毎の人数を取り出せます）。
+            python3 cv19sim.py ensemble params.json -n 100 --store runs.db
+            python3 cv19sim.py query runs.db -w "infection_rate>=0.5" -w "peak_i>80"
+        「run」「ensemble」「sweep」コマンドで--cacheを指定すると、
+        同じパラメータ・乱数シード・エンジンの結果を、ディレクトリ
+        (省略時はCACHE_DIR)に保存しておき、次からは実行せずに使い
+        ます（画面のアンサンブル実行は、常にCACHE_DIRを使います）。
+        大きさがCACHE_MAX_BYTESを超えると、古いものから消します。
+            python3 cv19sim.py ensemble params.json -n 100 --cache
+        長時間のシミュレーションは、途中の状態(チェックポイント)
+        を保存しておき、中断した所から続きを実行できます。
+            python3 cv19sim.py run params.json --checkpoint run.ckpt --every 100
+            python3 cv19sim.py resume run.ckpt --out history.csv
+        サイクル数が多い場合は、履歴をメモリに溜めずに、サイクル
+        毎にファイルへ書き出せます（.csvの場合はcsv、それ以外はバ
+        イナリ。メモリには、最新のHIST_RING_ROWSサイクル分だけを
+        残します）。
+            python3 cv19sim.py run params.json --stream history.bin --out history.csv
+        全員の位置・ステータスを、サイクル毎に記録しておき（軌跡
+        の記録）、後から任意のサイクルの状態を取り出せます（位置
+        は量子化して、前のサイクルからの差分で記録します。
+        --traj-rawの場合は差分にしません）。
+            python3 cv19sim.py run params.json --traj run.traj
+            python3 cv19sim.py traj run.traj --cycle 100 --out cycle100.csv
+        記録した軌跡は、シミュレーションを実行し直さずに、画面で
+        再生できます（「記録を再生」ボタンでも開けます）。
+            python3 cv19sim.py replay run.traj
+        プログラム(python)から実行する場合は、simulate()で、サイク
+        ル毎の記録(CycleRecord)を１つずつ受け取れます。受け取るの
+        をやめると、実行も終わります（履歴は、指定しない限り保持
+        しません）。
+            import cv19sim
+            for rec in cv19sim.simulate({"infection_rate": 0.5}, seed=1):
+                print(rec.no, rec.infected(), rec.d)
+        チェックポイントの状態から、移動制限・外出制限のパラメー
+        タを変えた複数の分岐を実行する場合（分岐実行）は、分岐毎
+        のパラメータを書いたファイル(json)を指定して、以下のよう
+        に実行してください。分岐毎の結果(csv)と、サイクル毎の人数
+        (csv)が書き出されます。
+            python3 cv19sim.py fork run.ckpt branches.json --out fork.csv --histories fork_his.csv
+        sweep.jsonの例（baseは元にするパラメータファイル。省略時は
+        デフォルト値。範囲は、値のリストでも指定できます）
+            {"base": "params.json",
+             "sweep": {"s_move_disable_rate": {"start": 0.0, "stop": 0.9, "step": 0.1},
+                       "infection_rate": [0.2, 0.4, 0.6, 0.8]}}
+        branches.json の例（変更できるのは、移動距離制限率・移動
+        制限率(外出制限)のパラメータだけです）
+            {"branches": [{"name": "規制強化", "s_move_disable_rate": 0.8},
+                          {"name": "規制なし", "s_move_disable_rate": 0.0}]}
     
     機能:以下の機能があります
         (1)シミュレーションの前提条件（パラメータ）の設定
             デフォルト値を用意していますが、利用者が変更すること
             が可能です。
-            ※初期人数を大きくし過ぎないでください。処理が非常に
-            重くなる場合があります。
+            ※初期人数が多い場合（数千人以上）は、「NumPyエンジン
+            (大人数)」を使ってください。100万人程度まで実行できま
+            す。それ以外のエンジンでは、処理が非常に重くなる場合
+            があります。
         (2)パラメータの保存・復元
             パラメータはJson形式のファイルに書き出すことができ
             ます。また、以前の書き出しておいたパラメータファイル
@@ -35,6 +108,10 @@
             子をアニメーションで表示します。ただし、グラフやアニ
             メは処理が非常に重いため、結果のみが必要な場合は、こ
             れらの機能をオフすることができます。
+            人数がRASTER_THRESHOLDを超える場合は、１人ずつの図形
+            ではなく、全員を１枚の画像(ビットマップ)に描画します。
+            さらに、人数が画素数を超える場合は、人の密度を色の濃
+            さで表示(ヒートマップ)します。
         (4)シミュレーションの一時停止・再開
             シミュレーションを一時停止し、一部のパラメータを変更
             することができます。例えば、感染が拡大してきたので、
@@ -56,6 +133,29 @@
             いる自作クラスや関数の説明もあります。利用上、これら
             クラスや関数の説明は不要ですが、pythonの学習用という
             意味も踏まえて表示しています。
+        (8)アンサンブル実行
+            同じパラメータで、乱数シードだけを変えたシミュレーショ
+            ンを「アンサンブル回数」分実行し、サイクル毎の人数の
+            ばらつき（5%〜95%の範囲と中央値）をグラフに表示します。
+            結果サマリには、ピーク時感染者数や死亡者数などの平均
+            と5%/50%/95%点が表示されます。各回は、CPUのコア数分
+            並列に実行します。画面なしの場合は、全レプリカを２次元
+            の配列でまとめて実行することもできます（BatchEngine）。
+            同じ条件で実行したことがあるレプリカは、実行せずに、
+            保存しておいた結果（ResultCache）を使います。
+        (9)分岐実行
+            一時停止中に「分岐実行」ボタンを押すと、画面のパラ
+            メータと、分岐指定ファイル(json)のパラメータ毎に、一
+            時停止した所から続きを並列に実行し、感染者数・死亡者
+            数を１つのグラフで比較できます。一時停止までのサイク
+            ルは実行し直しません。元のシミュレーションは一時停止
+            のままです。
+        (10)記録の再生
+            「記録を再生」ボタンで、軌跡ファイル(run --trajで記録
+            したもの)を選択すると、移動・感染判定を行わずに、記録
+            したサイクルを画面に表示します。再生ウインドウで、再生・
+            停止、再生速度の変更、スライダーによる任意のサイクルへ
+            の移動、感染者数が最大のサイクルへの移動ができます。
             
     パラメータの説明:
         「サイクル」
@@ -136,7 +236,24 @@
             人々の移動そのものを制限する割合です。「外出制限」に
             相当します。シミュレーション中でも一時停止することで、
             値を変更することができます。
-            
+        「乱数シード」
+            移動や感染判定に使う乱数の種です。同じシード・同じパ
+            ラメータであれば、同じ結果になります（同じエンジンの
+            場合）。0の場合は実行ごとにランダムに決め、決めたシー
+            ドを結果サマリに表示します。
+        「チェックポイント間隔」
+            シミュレーションの途中の状態（チェックポイント）を、
+            ファイルに保存するサイクルの間隔です。0の場合は保存し
+            ません。画面ありの場合は、一時停止した時にも保存しま
+            す(保存先は~/.cache/cv19sim/cv19sim.ckpt。結果サマリに
+            も表示します)。保存した状態から、続きを実行することが
+            できます（同じ結果になります）。
+        「アンサンブル回数」
+            アンサンブル実行で、シミュレーションを繰り返す回数で
+            す。各回のシードは、「乱数シード」から重複しないように
+            決めます（「乱数シード」が同じなら、同じ集計結果になり
+            ます）。
+
     補足・注意事項:
         ・「実行再生産数」は、厳密な計算ではありません。前サイク
         　ルと現サイクルの感染者数の差異から計算しています。
@@ -151,12 +268,25 @@
     実装方式:どのように構築されているかの説明です（マニアック）
         外部ライブラリは使用せず、python3.8の標準ライブラリの
         みで構築しています。GUIは、tkinterです。
+        ただし、NumPyがインストールされている場合は、大人数向け
+        の「配列版エンジン」を選択できます（「NumPyエンジン」チ
+        ェックボタン）。配列版エンジンでは、同じサイクルで感染し
+        た人はそのサイクル中は他の人に感染させないため、結果は
+        統計的には同じですが、個々の結果は一致しません。
+        また、「イベント駆動(病状)」チェックボタン（画面なしの場
+        合は --engine event）で、感染者の病状（死亡・症状の変化・
+        免疫獲得）を、サイクル毎の判定ではなく、発生するサイクル
+        を予め決めておく方式（イベント駆動エンジン）にできます。
+        結果は統計的に同じで、感染者が多い場合に速くなります。
         このプログラムは、Lynux(BionicPup32-jp - 19.03)
         上で開発されました。Windows10()で簡単な稼働確認をして
         います。
         [注意]Windows10で動かすためには、事前にpython3.8のイ
         ンストールが必要です。
-        マルチスレッドには対応していません。
+        画面あり(tkinter)で実行する場合、シミュレーション（移動・
+        感染判定）は、画面とは別のスレッドで実行します。画面は、
+        一定の間隔で最新のサイクルの状態を表示します（画面の表示
+        が追いつかない場合は、途中のサイクルの表示を省きます）。
         シミュレーション空間とアニメーション画面は分離しています。
         移動・感染判定はすべてシミュレーション空間で行い、結果の
         みをアニメーション画面に表示しています。そのため、シミュ
@@ -165,9 +295,19 @@
         える場合があります。
 """
 
-import os, tkinter, tkinter.filedialog, tkinter.scrolledtext
-import time, pathlib, datetime, glob, shutil, sys
-import json, random, math, csv
+import os, time, pathlib, datetime, glob, shutil, sys
+import json, random, math, csv, argparse, itertools
+import concurrent.futures, threading, queue, heapq, struct, mmap, array
+import multiprocessing, gc, tempfile, sqlite3, hashlib, zlib
+#tkinterとNumPyは、使う時に読み込む（import_tk()、import_np()）
+#（画面なしで実行する場合に、起動を速くするため）
+tkinter = None
+np = None
+#分岐実行の元になる（一時停止中の）シミュレーション
+#（forkしたプロセスが、コピーオンライトで引き継ぐ）
+fork_base = None
+#デフォルトのパラメータ（最初に使う時に作る。defaultprm()）
+default_prm = None
 
 ###CONST
 ###ステータス
@@ -179,6 +319,37 @@ D_STATE = 'D'       #死者（D）
 I_RANK_NON = 'N'    #症状なし（移動制限なし）
 I_RANK_LOW = 'L'    #軽症（隔離）
 I_RANK_HIGH = 'H'   #重症（入院）
+#ArrayEngineクラス用の状態コード
+CODE_S = 0          #未感染者（S）
+CODE_I = 1          #感染者（I）
+CODE_R = 2          #免疫保持者（R）
+CODE_D = 3          #死者（D）
+CODE_NON = 0        #重篤度なし
+CODE_N = 1          #症状なし
+CODE_L = 2          #軽症
+CODE_H = 3          #重症
+#状態コード(stat*4+serious)から、グループ番号(s,i_n,i_l,i_h,r,d)への変換表
+GROUP_LUT = (0,0,0,0, 1,1,2,3, 4,4,4,4, 5,5,5,5)
+#Personのステータス・重篤度と、状態コードの変換表（チェックポイント用）
+STAT_CODE = {S_STATE:CODE_S, I_STATE:CODE_I, R_STATE:CODE_R, D_STATE:CODE_D}
+CODE_STAT = (S_STATE, I_STATE, R_STATE, D_STATE)
+SERIOUS_CODE = {"":CODE_NON, I_RANK_NON:CODE_N, I_RANK_LOW:CODE_L, I_RANK_HIGH:CODE_H}
+CODE_SERIOUS = ("", I_RANK_NON, I_RANK_LOW, I_RANK_HIGH)
+#グループ番号(s,i_n,i_l,i_h,r,d)
+GRP_S = 0
+GRP_I_N = 1
+GRP_I_L = 2
+GRP_I_H = 3
+GRP_R = 4
+GRP_D = 5
+#感染者の重篤度から、グループ番号への変換表
+SERIOUS_GROUP = {I_RANK_NON:GRP_I_N, I_RANK_LOW:GRP_I_L, I_RANK_HIGH:GRP_I_H}
+#ステータス＋重篤度から、グループ番号への変換表
+#（免疫保持者・死亡者は、最後の重篤度が残っている）
+STAT_GROUP = {S_STATE:GRP_S,    \
+    I_STATE+I_RANK_NON:GRP_I_N, I_STATE+I_RANK_LOW:GRP_I_L, I_STATE+I_RANK_HIGH:GRP_I_H,    \
+    R_STATE:GRP_R, R_STATE+I_RANK_NON:GRP_R, R_STATE+I_RANK_LOW:GRP_R, R_STATE+I_RANK_HIGH:GRP_R,  \
+    D_STATE:GRP_D, D_STATE+I_RANK_NON:GRP_D, D_STATE+I_RANK_LOW:GRP_D, D_STATE+I_RANK_HIGH:GRP_D}
 #画面関連
 #キャンバス
 SIM_PERSONS_R = 6
@@ -209,6 +380,8 @@ PERSON_I_H_CLR = "red"
 PERSON_R_CLR = "blue"
 PERSON_D_CLR = "white"
 PERSON_ECO_CLR = "pink"
+#グループ番号(s,i_n,i_l,i_h,r,d)毎の色
+GROUP_CLR = (PERSON_S_CLR, PERSON_I_N_CLR, PERSON_I_L_CLR, PERSON_I_H_CLR, PERSON_R_CLR, PERSON_D_CLR)
 #パラメータ域のフォントサイズ
 PRM_FONT_SIZE = "8"
 #表示用タイトル
@@ -246,9 +419,155 @@ DENCTY_CELL=100
 #サイクル実行フラグ
 CYC_PAUSE="pause"
 CYC_RUN="run"
-#Personクラスの描画モード
-MODE_REFRESH="refresh"
-MODE_MOVE="move"
+#シミュレーションスレッドへのメッセージ
+WK_PAUSE="pause"        #一時停止
+WK_RESUME="resume"      #再開（パラメータの変更を伴う）
+#シミュレーションスレッドから画面への、状態(スナップショット)のキューの長さ
+SNAP_QUEUE_SIZE = 2
+#画面の更新間隔(ms)
+FRAME_MS = 40
+#CanvasRendererクラス用
+#１回の描画で呼び出す描画メソッド(itemconfig・coords)の上限
+RENDER_BUDGET = 5000
+#RasterRendererクラス用
+#画像(ビットマップ)で描画する人数（これを超えるとRasterRendererを使用）
+RASTER_THRESHOLD = 3000
+#１人を描画する点の大きさ(ドット)
+RASTER_DOT = 2
+#ヒートマップの濃さの段階数
+RASTER_LEVELS = 16
+#重なった場合に上に描画する順位(グループ番号(s,i_n,i_l,i_h,r,d)毎、
+#大きい方が上。最後の要素は背景)
+RASTER_PRIORITY = (1, 4, 5, 6, 2, 3, 0)
+#HistoryGraphクラス用
+#グラフの横幅に表示する最初のサイクル数（足りなくなったら２倍にする）
+GRAPH_SPAN_MIN = 64
+#グラフ用に保持する集計(バケツ)の数の上限（横幅の何倍か）
+GRAPH_BUCKET_RATE = 2
+#積み上げグラフの色（上から D→R→S→I(n→l→h) の順に重ねる）
+GRAPH_LAYER_CLR = (PERSON_D_CLR, PERSON_R_CLR, PERSON_S_CLR, PERSON_I_N_CLR, PERSON_I_L_CLR, PERSON_I_H_CLR)
+#感染する確率の表(PrmSnap.infection_lut)の、最初に作る大きさ(人数0〜63)
+INFECTION_LUT_SIZE = 64
+#シミュレーションエンジンの種類
+ENGINE_PERSON="person"      #PersonEngine
+ENGINE_ARRAY="array"        #ArrayEngine(NumPy)
+ENGINE_EVENT="event"        #EventEngine(病状をイベント駆動で判定)
+ENGINE_LIST=(ENGINE_PERSON, ENGINE_ARRAY, ENGINE_EVENT)
+ENGINE_BATCH="batch"        #BatchEngine(NumPy。アンサンブル実行でレプリカを一括実行)
+ENSEMBLE_ENGINE_LIST=ENGINE_LIST + (ENGINE_BATCH,)
+#BatchEngineクラス用
+#１回に一括実行する(１プロセスに渡す)レプリカの数の目安（レプリカ数×人数）
+#※レプリカの分け方は並列数によらないため、同じシードなら同じ結果になる
+BATCH_ELEMENTS = 32768
+#感染判定で、セル毎の人数の表を作るセル数の上限（１レプリカの人数の何倍か）
+BATCH_CELL_RATE = 64
+#EventEngineクラス用
+#病状のイベント（同じサイクルの場合は、免疫獲得→死亡→症状変化の順に優先）
+EV_RECOVER = 0      #免疫獲得
+EV_DEAD = 1         #死亡
+EV_TRAN = 2         #症状変化
+#ArrayEngineの状態の配列（チェックポイントに保存する）
+ARRAY_STATE_KEYS = ("x", "y", "degree", "stat", "serious", "delta_x", "delta_y", "r",   \
+    "odometter", "i_history", "r_history")
+#Checkpointクラス用
+CHECKPOINT_MAGIC = b"CV19CKPT"     #ファイルの先頭(識別用)
+CHECKPOINT_VERSION = 2              #ファイル形式の版数
+CHECKPOINT_ALIGN = 8                #配列の開始位置の境界(バイト)
+CHECKPOINT_FILE = "cv19sim.ckpt"    #画面ありの場合の保存先のファイル名(CACHE_DIRの下)
+#HistBuffer・HistSinkクラス用
+HIST_COLS = 9           #sim_historyの項目数(no,s,i_n,i_l,i_h,r,d,R,ECO)
+HIST_INT_COLS = 7       #先頭から整数の項目数(no〜d)
+HIST_RING_ROWS = 4096   #ストリーム出力する場合に、メモリに残すサイクル数
+HIST_FLUSH_ROWS = 256   #ストリーム出力で、まとめて書き込む行数
+HIST_MAGIC = b"CV19HIST"    #バイナリ形式の先頭(識別用)
+HIST_VERSION = 1            #バイナリ形式の版数
+#TrajRecorder・TrajReaderクラス用
+TRAJ_MAGIC = b"CV19TRAJ"    #ファイルの先頭(識別用)
+TRAJ_VERSION = 2            #ファイル形式の版数(2:フレームにサイクル毎の人数を含む)
+#ヘッダ(識別,版数,人数,フレーム数の上限,記録したフレーム数,キーフレームの間隔,
+#差分の単位,予備,フィールドサイズ,座標の倍率)
+TRAJ_HEAD = struct.Struct("<8sIIIIIIIdd")
+TRAJ_HEAD_SIZE = 64         #ヘッダの大きさ(バイト)
+TRAJ_LEVELS = 65536         #座標の量子化の段階数(フィールド1辺分。0〜TRAJ_LEVELS-1)
+TRAJ_KEY_EVERY = 32         #差分で記録する場合の、キーフレームの間隔
+TRAJ_MOVE_MARGIN = 16       #１サイクルの移動距離の上限(平均移動距離に足す)
+TRAJ_ROW_FMT = "<{}d".format(HIST_COLS)     #フレームの先頭の履歴(sim_history)
+TRAJ_ROW_SIZE = struct.calcsize(TRAJ_ROW_FMT)
+#ReplayWindowクラス用
+REPLAY_SPEED_MAX = 64       #再生速度の上限(１回の画面更新で進めるサイクル数)
+#RunStoreクラス用
+STORE_VERSION = 1           #データベースの版数(PRAGMA user_version)
+#ResultCacheクラス用
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "cv19sim")    #デフォルトの保存先
+CACHE_MAX_BYTES = 256*1024*1024     #大きさの上限(バイト)
+CACHE_MAGIC = b"CV19CACH"           #ファイルの先頭(識別用)
+CACHE_SUFFIX = ".res"               #ファイルの拡張子
+#キーに含めないパラメータ（表示だけのもの・結果が変わらないもの。シードは別に含める）
+CACHE_IGNORE_KEYS = ("cycle_speed", "seed", "ensemble_count", "checkpoint_cycle")
+#エンジン毎の版数（結果が変わる修正をしたら上げる。古いキャッシュを使わないように）
+ENGINE_VERSION = {ENGINE_PERSON: 1, ENGINE_ARRAY: 1, ENGINE_EVENT: 1, ENGINE_BATCH: 1}
+#Forkクラス用
+#分岐で変更できるパラメータ（一時停止中に変更できるもの）
+FORK_KEYS = ("s_move_limit_rate", "i_n_move_limit_rate", "i_l_move_limit_rate", "i_h_move_limit_rate",   \
+    "r_move_limit_rate", "s_move_disable_rate", "i_n_move_disable_rate", "i_l_move_disable_rate",   \
+    "i_h_move_disable_rate", "r_move_disable_rate")
+#分岐毎の線の色（分岐が多い場合は繰り返す）
+FORK_CLR = ("red", "cyan", "yellow", "magenta", "lime", "orange", "deepskyblue", "white")
+#分岐比較画面のグラフの高さ
+FORK_GRAPH_H = 300
+#Sweepクラス用
+#変化させられないパラメータ（計算値・シード・結果が変わらないもの）
+#※人口密度(density)は、フィールドサイズに変換して変化させる
+SWEEP_FIXED_KEYS = ("total_persons_count", "seed", "cycle_speed", "ensemble_count", "checkpoint_cycle")
+#アンサンブル集計用
+#分位点(5%,50%,95%)
+BAND_QUANTILES = (0.05, 0.5, 0.95)
+BAND_STATS = ("平均", "5%", "50%", "95%")
+#集計する項目(sim_historyの位置,タイトル) ※感染者(合計)は位置-1
+BAND_COLUMNS = ( (1,"未感染"), (2,"感染(無)"), (3,"感染(軽)"), (4,"感染(重)"), (-1,"感染(計)"),   \
+                    (5,"免疫保持"), (6,"死亡"), (7,"実行再生産数"), (8,"経済活動(%)") )
+#結果サマリの指標(キー,タイトル)
+ENSEMBLE_METRICS = ( ("peak_i","ピーク時感染者(合計)"), ("peak_cycle","ピーク時サイクル"),   \
+                    ("dead","死亡者人数"), ("min_eco","最大経済影響(%)"),    \
+                    ("avr_eco","平均経済影響(%)"), ("cycles","収束までのサイクル") )
+
+def import_tk():
+    """tkinterの読込み
+
+     tkinter(GUI)を読み込む。画面を構築する前に呼び出す。
+
+    Args:なし
+    Returns:なし
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    global tkinter
+    import tkinter, tkinter.filedialog, tkinter.scrolledtext
+
+def import_np():
+    """NumPyの読込み
+
+     NumPyを読み込む（NumPyは任意。ArrayEngine・BatchEngineと、軌跡
+     の記録・読込み(TrajRecorder・TrajReader)で使用）
+
+    Args:なし
+    Returns:
+        True:読み込めた（読込み済み）
+        False:NumPyがインストールされていない
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            return False
+    return True
 
 class TimeRec():
     """TimeRec【実行時間記録用クラス】
@@ -577,6 +896,8 @@ class UserPrm():
         sv(tkinter.StringVar):
             画面表示用の変数インスタンスの保持
             ※vlとsvは常に同期している
+            ※画面を作るまで(makesv()が呼ばれるまで)はNone。
+            画面なしで実行する場合はNoneのまま
     """
     def __init__(self,tag,title,value,valuetype,uitype=MAKE_ENTRY):
         """コンストラクタ
@@ -604,8 +925,7 @@ class UserPrm():
         self.vl=value
         self.valuetype=valuetype        #"INT"or"DOUBLE"
         self.uitype=uitype
-        self.sv=tkinter.StringVar()
-        self.sv.set(self.vl)
+        self.sv=None
    
     def set(self,value):
         """値の設定
@@ -621,7 +941,26 @@ class UserPrm():
         Note:なし
         """
         self.vl=value
-        self.sv.set(self.vl)
+        if self.sv is not None:
+            self.sv.set(self.vl)
+
+    def makesv(self):
+        """画面表示用の変数インスタンスの生成
+        
+         画面表示用の変数インスタンスを生成する（生成済みの場合は
+         それを返す）。tkinterのルートを作った後に呼び出す。
+
+        Args:なし
+        Returns:変数インスタンス(tkinter.StringVar)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.sv is None:
+            self.sv=tkinter.StringVar()
+            self.sv.set(self.vl)
+        return self.sv
         
     def getsv(self):
         """値の取得
@@ -1023,6 +1362,9 @@ class UsrPrms():
         self.ups_dic["i_l_move_disable_rate"]= UserPrm(tag="i_l_move_disable_rate",value=0,title="移動対象者制限率:感染者(軽症/隔離)",valuetype=VAL_DOUBLE)
         self.ups_dic["i_h_move_disable_rate"]= UserPrm(tag="i_h_move_disable_rate",value=0,title="移動対象者制限率:感染者(重症/入院)",valuetype=VAL_DOUBLE)
         self.ups_dic["r_move_disable_rate"]= UserPrm(tag="r_move_disable_rate",value=0,title="移動対象者制限率:免疫保持者",valuetype=VAL_DOUBLE)
+        self.ups_dic["seed"]= UserPrm(tag="seed",value=0,title="乱数シード(0:毎回変える)",valuetype=VAL_INT)
+        self.ups_dic["ensemble_count"]= UserPrm(tag="ensemble_count",value=0,title="アンサンブル回数",valuetype=VAL_INT)
+        self.ups_dic["checkpoint_cycle"]= UserPrm(tag="checkpoint_cycle",value=0,title="チェックポイント間隔(0:なし)",valuetype=VAL_INT)
         
     def loaddefault(self):
         """デフォルト値の設定
@@ -1095,6 +1437,15 @@ class UsrPrms():
         self.ups_dic["i_h_move_disable_rate"].set(1.0)      #感染者用・重症
         self.ups_dic["r_move_disable_rate"].set(0.0)        #免疫保持者用
 
+        #乱数シード　※同じシードなら同じ結果になる。0の場合は実行ごとにランダムに決める
+        self.ups_dic["seed"].set(0)
+
+        #アンサンブル回数　※アンサンブル実行時に、シードを変えて実行する回数
+        self.ups_dic["ensemble_count"].set(20)
+
+        #チェックポイント間隔　※このサイクル毎に、途中の状態をファイルに保存する。0の場合は保存しない
+        self.ups_dic["checkpoint_cycle"].set(0)
+
     def loadprms(self):
         """パラメータファイル(json)の読込み・設定
         
@@ -1120,7 +1471,26 @@ class UsrPrms():
         #キャンセルが押された
         if 0 == len(in_f):
             return False
-    
+
+        self.loadjson(in_f)
+
+        return True
+
+    def loadjson(self, in_f):
+        """パラメータファイル(json)の読込み・設定(ファイル指定)
+        
+         指定されたパラメータファイル(json)を読込み、各パラメー
+         タに値を設定する。
+         (画面なしで実行する場合にも使用する)
+
+        Args:
+            in_f(str):パラメータファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
         b = open(in_f)
         c = json.load(b)
         b.close()
@@ -1129,15 +1499,27 @@ class UsrPrms():
             self.ups_dic[key].set(value)
 
         #計算値(total_persons_countとdensity)はjsonが間違っているかもしれないので再計算
+        self.recalc()
+
+    def recalc(self):
+        """計算値の再計算
+        
+         計算値(total_persons_countとdensity)を、他のパラメータか
+         ら再計算する（画面の入力を通さずに値を設定した場合用）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
         #対象者人数合計
         self.ups_dic["total_persons_count"].set( \
             self.ups_dic["s_persons_count"].getvl() +  self.ups_dic["i_persons_count"].getvl() +   \
             self.ups_dic["r_persons_count"].getvl() +  self.ups_dic["d_persons_count"].getvl() )
         #人口密度　※総人数÷フィールド面積
         self.ups_dic["density"].set(self.ups_dic["total_persons_count"].getvl() / self.ups_dic["field_size"].getvl()**2*(DENCTY_CELL**2))
-
-        
-        return True
          
     def saveprms(self):
         """パラメータをファイル(json)に保存する
@@ -1156,11 +1538,6 @@ class UsrPrms():
         Examples:なし
         Note:なし
         """
-        prm_json = {}
-        
-        for key, value in self.ups_dic.items():
-            prm_json[key]=value.getvl()
-        
         # ファイル選択ダイアログの表示
         fTyp = [("JSONファイル", "*.json")]
         out_f = tkinter.filedialog.asksaveasfilename(filetypes = fTyp, title='パラメータファイル（json）を選択してくだい。')
@@ -1170,11 +1547,481 @@ class UsrPrms():
             return False
         
         a = open(out_f, "w")
-        json.dump(prm_json,a,indent=4)
+        json.dump(self.getdic(),a,indent=4)
         a.close()
         
         return True
 
+    def getdic(self):
+        """パラメータ値の辞書の取得
+        
+         各パラメータの値を辞書にして返す(jsonに保存する内容)
+
+        Args:なし
+        Returns:
+            パラメータ値の辞書
+                key(str):インスタンスのタグ名
+                value(int or float):値
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm_json = {}
+        
+        for key, value in self.ups_dic.items():
+            prm_json[key]=value.getvl()
+
+        return prm_json
+
+    def compile(self):
+        """パラメータのスナップショットの作成
+        
+         現在のパラメータ値から、シミュレーション実行用の読取り
+         専用のスナップショット(PrmSnap)を作成する。
+         (セットアップ時と、一時停止からの再開時に呼ばれる)
+
+        Args:なし
+        Returns:スナップショット(PrmSnap)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return PrmSnap(self.getdic())
+
+class PrmSnap():
+    """PrmSnap【パラメータスナップショットクラス】
+
+        シミュレーション実行用の、パラメータ値の読取り専用のコピ
+        ーです。移動・感染判定では、１人ごとに何度もパラメータを
+        参照するため、辞書(ups_dic)の検索やメソッド呼び出しをせ
+        ずに、属性として直接参照できるようにしています(__slots__)。
+        値の変更はできません。パラメータを変更した場合は、
+        UsrPrms.compile()で作り直します。
+
+    Attributes:
+        ※UsrPrms.ups_dicのタグ名と同じ名前の属性（値）に加え、
+        計算済みの値として以下を持ちます
+        infection_r2(int):感染領域の２乗
+        move_disable(tuple):グループ(s,i_n,i_l,i_h,r,d)毎の
+                対象者移動制限率（死亡者は1.0）
+        move_limit(tuple):グループ(s,i_n,i_l,i_h,r,d)毎の
+                距離移動制限率（死亡者は1.0）
+        dead_rate(tuple):重篤度コード(CODE_NON〜CODE_H)毎の死亡率
+        tran_rate(tuple):重篤度コード(CODE_NON〜CODE_H)毎の症状変化率
+        infection_lut[](float):近くの感染者の人数k毎の、感染する
+                確率 1-(1-感染確率)^k の表（infection_p()で参照）
+    """
+    __slots__ = ("s_persons_count", "i_persons_count", "r_persons_count", "d_persons_count",    \
+        "total_persons_count", "field_size", "density", "cycle_max", "cycle_speed",    \
+        "move_r", "infection_r", "infection_rate", "get_immunity_cycle",    \
+        "i_n2l_tran_rate", "i_l2h_tran_rate", "n_dead_rate", "l_dead_rate", "h_dead_rate",    \
+        "s_move_limit_rate", "i_n_move_limit_rate", "i_l_move_limit_rate", "i_h_move_limit_rate", "r_move_limit_rate",    \
+        "s_move_disable_rate", "i_n_move_disable_rate", "i_l_move_disable_rate", "i_h_move_disable_rate", "r_move_disable_rate",  \
+        "seed", "ensemble_count", "checkpoint_cycle",   \
+        "infection_r2", "move_disable", "move_limit", "dead_rate", "tran_rate", "infection_lut")
+    #計算済みの値の属性名(getdic()で除く)
+    DERIVED = ("infection_r2", "move_disable", "move_limit", "dead_rate", "tran_rate", "infection_lut")
+    #感染する確率の表を延ばす時のロック（スナップショットは、スレッド間で共有できる）
+    LUT_LOCK = threading.Lock()
+
+    def __init__(self, prm_dic):
+        """コンストラクタ
+        
+         パラメータ値の辞書から、スナップショットを構築する
+
+        Args:
+            prm_dic(dic):パラメータ値の辞書(UsrPrms.getdic())
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        for key, value in prm_dic.items():
+            object.__setattr__(self, key, value)
+
+        #計算済みの値
+        object.__setattr__(self, "infection_r2", self.infection_r**2)
+        object.__setattr__(self, "move_disable", (self.s_move_disable_rate, self.i_n_move_disable_rate,    \
+            self.i_l_move_disable_rate, self.i_h_move_disable_rate, self.r_move_disable_rate, 1.0))
+        object.__setattr__(self, "move_limit", (self.s_move_limit_rate, self.i_n_move_limit_rate,    \
+            self.i_l_move_limit_rate, self.i_h_move_limit_rate, self.r_move_limit_rate, 1.0))
+        object.__setattr__(self, "dead_rate", (0.0, self.n_dead_rate, self.l_dead_rate, self.h_dead_rate))
+        object.__setattr__(self, "tran_rate", (0.0, self.i_n2l_tran_rate, self.i_l2h_tran_rate, 0.0))
+        object.__setattr__(self, "infection_lut", [])
+        self.infection_p(INFECTION_LUT_SIZE-1)
+
+    def infection_p(self, k):
+        """感染する確率
+        
+         近くにk人の感染者がいる場合に、感染する確率を返す
+
+        Args:
+            k(int):感染領域（接近範囲）内の感染者の人数
+        Returns:
+            感染する確率(float) 1-(1-感染確率)^k
+        Raises:なし
+        Yields:なし
+        Examples:
+            if rng.bernoulli(prm.infection_p(k)):   #感染する
+        Note:
+            感染者１人ずつ感染確率で判定し、１回でも当たれば感
+            染する、のと同じ確率。表(infection_lut)にない人数の
+            場合は、表を延ばす
+        """
+        lut = self.infection_lut
+        if len(lut) <= k:
+            #複数のスレッドから同時に延ばさないように、ロックする
+            with self.LUT_LOCK:
+                while len(lut) <= k:
+                    lut.append(1.0 - (1.0 - self.infection_rate)**len(lut))
+        return lut[k]
+
+    def getdic(self):
+        """パラメータ値の辞書の取得
+        
+         スナップショットを作った時の、パラメータ値の辞書を返す
+         (計算済みの値は除く)
+
+        Args:なし
+        Returns:
+            パラメータ値の辞書(UsrPrms.getdic()と同じ形式)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return {key: getattr(self, key) for key in self.__slots__ if key not in self.DERIVED}
+
+    def __setattr__(self, key, value):
+        """値の変更（不可）
+        
+         読取り専用のため、値の変更は例外とする
+
+        Args:
+            key(str):属性名
+            value:値
+        Returns:なし
+        Raises:
+            AttributeError:常に発生する
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        raise AttributeError("PrmSnap is read-only ({})".format(key))
+
+def defaultprm():
+    """デフォルトのパラメータ
+    
+     デフォルト値(UsrPrms.loaddefault())のパラメータのスナップショッ
+     トを返す。最初の１回だけ作り、以降は同じものを返す
+
+    Args:なし
+    Returns:パラメータ(PrmSnap)
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:
+        スナップショットは読取り専用のため、複数のシミュレーション
+        で共有できる
+    """
+    global default_prm
+    if default_prm is None:
+        up = UsrPrms()
+        up.loaddefault()
+        default_prm = up.compile()
+    return default_prm
+
+class SimRandom(random.Random):
+    """SimRandom【シミュレーション用乱数クラス】
+
+        シミュレーション１回ごとに持つ乱数生成器です(random.Random
+        を継承)。シードを指定して作るため、同じシードであれば、
+        同じ乱数の列（同じシミュレーション結果）になります。
+        確率による判定（感染する／しない等）は、すべて
+        bernoulli()で行います。
+
+    Attributes:
+        base_seed(int):構築時の乱数シード
+                ※random.Random.seed()を隠さないよう、別の名前とする
+    """
+    def __init__(self, seed=None):
+        """コンストラクタ
+        
+         指定されたシードで、乱数生成器を構築する
+
+        Args:
+            seed(int,optional):乱数シード(省略時はrandom.Randomと同じ)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        super().__init__(seed)
+        self.base_seed = seed
+
+    def __reduce__(self):
+        """コピー・pickle用の情報
+
+         構築時の乱数シードと、乱数生成器の状態を返す
+         (copy.copy()・copy.deepcopy()・pickleで使われる)
+
+        Args:なし
+        Returns:
+            (クラス, コンストラクタの引数, 乱数生成器の状態)のタプル
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            random.Random.__reduce__()は、構築時の乱数シードを引き
+            継がないため、置き換える
+        """
+        return (self.__class__, (self.base_seed,), self.getstate())
+
+    def bernoulli(self, p):
+        """確率による判定
+        
+         確率pでTrueを返す
+
+        Args:
+            p(float):確率(0.0〜1.0)
+        Returns:
+            True:当たり（確率pで発生）
+            False:はずれ
+        Raises:なし
+        Yields:なし
+        Examples:
+            if rng.bernoulli(prm.infection_rate):   #感染する
+        Note:
+            random.choices([True,False],weights=[p,1-p],k=1)と
+            同じ判定を、リストを作らずに行う
+        """
+        return self.random() < p
+
+    def geometric(self, p):
+        """初めて当たるまでの回数
+
+         確率pの判定を繰り返して、初めて当たるまでの回数(幾何
+         分布)を返す。bernoulli(p)を１回ずつ繰り返すのと同じ分布
+         を、１回の乱数で求める。
+
+        Args:
+            p(float):確率(0.0〜1.0)
+        Returns:
+            回数(int)(1以上)
+            None:当たらない(p<=0の場合)
+        Raises:なし
+        Yields:なし
+        Examples:
+            n = rng.geometric(prm.h_dead_rate)  #n回目の判定で死亡
+        Note:
+            逆関数法：P(n>k)=(1-p)^k から、n=floor(log(U)/log(1-p))+1
+            (Uは(0,1]の一様乱数)
+        """
+        if p <= 0.0:
+            return None
+        if p >= 1.0:
+            return 1
+        return int(math.log(1.0 - self.random()) / math.log(1.0 - p)) + 1
+
+    @staticmethod
+    def newseed():
+        """シードの生成
+        
+         シードが指定されていない(0)場合に使うシードを、OSの乱
+         数から生成する
+
+        Args:なし
+        Returns:乱数シード(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return random.SystemRandom().randrange(1, 2**31)
+
+class InfectionGrid():
+    """InfectionGrid【感染判定用空間インデックスクラス】
+
+        感染者の位置を、格子状のセル単位で管理するクラスです。
+        セルの１辺は「感染領域」以上の大きさにしているため、未感
+        染者は自分のいるセルと周囲８セルの感染者だけを調べれば、
+        感染判定ができます（全感染者との距離を計算しなくてよい）。
+        フィールドは上下左右がつながっているため、端のセルは反
+        対側の端のセルと隣接しているものとして扱います。
+        なお、距離の判定自体は従来どおり（折り返しなし）です。
+        移動処理の後、１サイクルに１回再構築します。感染判定中
+        にステータスが変化した場合は、add/removeで更新します。
+
+    Attributes:
+        cell_count(int):フィールド１辺あたりのセル数
+        cell_w(float):セル１辺の大きさ
+        cells[][](Person):セル毎の感染者のリスト
+        nbr_cells[][](int):セル毎の、自身と周囲８セルの番号のリスト
+                ※セル数が少ない場合に同じセルを重複して調べない
+                ように、重複を除いている
+        near[](int):セル毎の、自身と周囲８セルにいる感染者の人数
+                ※0のセルにいる未感染者は、感染者を探さなくてよい
+    """
+    def __init__(self, field_size, cell_size):
+        """コンストラクタ
+
+         インスタンスの構築を行う
+
+        Args:
+            field_size(int):フィールドサイズ(1辺)
+            cell_size(int):セル１辺の最小の大きさ(「感染領域」)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #セル数は切り捨て（セルが「感染領域」より小さくならないように）
+        if cell_size > 0:
+            self.cell_count = max(1, int(field_size // cell_size))
+        else:
+            self.cell_count = 1
+        self.cell_w = field_size / self.cell_count
+        self.cells = [[] for i in range(self.cell_count**2)]
+        self.near = [0] * (self.cell_count**2)
+
+        #周囲のセル番号(壁にあたったら、反対側)をあらかじめ求めておく
+        n = self.cell_count
+        self.nbr_cells = []
+        for cx in range(n):
+            for cy in range(n):
+                nbr = set()
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        nbr.add(((cx+dx) % n)*n + ((cy+dy) % n))
+                self.nbr_cells.append(sorted(nbr))
+
+    def cellidx(self, point):
+        """セル番号の取得
+
+         座標からセル番号を求める
+
+        Args:
+            point[x,y](float,float):シミュレーション空間の座標
+        Returns:セル番号(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        n = self.cell_count
+        return (int(point[0] / self.cell_w) % n)*n + (int(point[1] / self.cell_w) % n)
+
+    def rebuild(self, persons):
+        """インデックスの再構築
+
+         現在の感染者の位置で、インデックスを作り直す
+
+        Args:
+            persons[](Person):対象者オブジェクトのリスト
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        for cell in self.cells:
+            cell.clear()
+        near = self.near
+        for c in range(len(near)):
+            near[c] = 0
+        for p in persons:
+            if p.stat == I_STATE:
+                c = self.cellidx(p.point)
+                self.cells[c].append(p)
+                for nbr in self.nbr_cells[c]:
+                    near[nbr] += 1
+
+    def add(self, person):
+        """感染者の追加
+
+         新たに感染した人をインデックスに追加する
+
+        Args:
+            person(Person):追加する人
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        c = self.cellidx(person.point)
+        self.cells[c].append(person)
+        for nbr in self.nbr_cells[c]:
+            self.near[nbr] += 1
+
+    def remove(self, person):
+        """感染者の削除
+
+         免疫保持者・死亡者になった人をインデックスから削除する
+
+        Args:
+            person(Person):削除する人
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        c = self.cellidx(person.point)
+        self.cells[c].remove(person)
+        for nbr in self.nbr_cells[c]:
+            self.near[nbr] -= 1
+
+    def neighbors(self, point):
+        """近傍の感染者の取得
+
+         指定した座標のセルと、周囲８セルにいる感染者を返す
+
+        Args:
+            point[x,y](float,float):シミュレーション空間の座標
+        Returns:なし
+        Raises:なし
+        Yields:感染者(Person)
+        Examples:なし
+        Note:なし
+        """
+        for c in self.nbr_cells[self.cellidx(point)]:
+            yield from self.cells[c]
+
+    def count(self, point, r2):
+        """近傍の感染者数の取得
+        
+         指定した座標から、距離の２乗がr2未満の感染者の人数を
+         数える（周囲８セルまでを調べる）
+
+        Args:
+            point[x,y](float,float):シミュレーション空間の座標
+            r2(float):距離の２乗の上限（「感染領域」の２乗）
+        Returns:感染者の人数(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            周囲のセルに感染者がいない場合(near)は、すぐに0を返す
+        """
+        cidx = self.cellidx(point)
+        if 0 == self.near[cidx]:
+            return 0
+        x, y = point
+        k = 0
+        cells = self.cells
+        for c in self.nbr_cells[cidx]:
+            for p in cells[c]:
+                q = p.point
+                if r2 > (x - q[0])**2 + (y - q[1])**2:
+                    k += 1
+        return k
+
 class Person():
     """Person【人クラス】
 
@@ -1183,6 +2030,7 @@ class Person():
     Attributes:
         id(str):識別番号("PS"+番号)
                 シミュレーション時の図形識別TAGとしても使用
+        idx(int):番号(エンジンの対象者リスト(persons)の添字)
         stat(str):感染状態
                 「未感染→感染→免疫or死」の順に遷移
         serious(str):感染時の重篤度
@@ -1203,15 +2051,16 @@ class Person():
                 感染時のサイクル、累積移動距離
         r_history[cycle,distance](int,float):
                 免疫保持時or死亡時のサイクル、累積移動距離
-        item_id(int):図形表示用のID(図形識別TAGとは違うもの)
     """    
-    def __init__(self, id, stat = S_STATE,  serious = ""):
+    def __init__(self, id, rng, field_size, stat = S_STATE,  serious = ""):
         """コンストラクタ
         
          インスタンスの構築を行う
 
         Args:
             id(int):識別番号(PSxx)の生成に使用。重複不可
+            rng(SimRandom):乱数生成器(初期位置・方向の決定に使用)
+            field_size(float):フィールドサイズ(1辺)
             stat(str):初期構築時のステータス。以下のいずれか
                 S_STATE:未感染者(デフォルト)
                 I_STATE:感染者
@@ -1229,25 +2078,27 @@ class Person():
         Note:なし
         """
         self.id = "PS"+str(id)    #もしかしたら後で使うかも知れないので作っておく
+        self.idx = id
         self.stat = stat    #ステータス   ※感染状態（未感染→感染→免疫or死）
         self.serious = serious   #重篤度　※（症状なし/軽症/重症）
-        self.point = [random.uniform(0,main.up.ups_dic["field_size"].getvl()), random.uniform(0,main.up.ups_dic["field_size"].getvl()) ]    #現在位置（x, y）※論理的な位置
-        self.degree = random.randint(0,360)
+        self.point = [rng.uniform(0,field_size), rng.uniform(0,field_size) ]    #現在位置（x, y）※論理的な位置
+        self.degree = rng.randint(0,360)
         self.delta_x = 0
         self.delta_y = 0
         self.r=0.0
         self.odometter = 0  #累計移動距離
         self.i_history = [0,0]     #感染時（サイクル、移動距離）
         self.r_history = [0,0]      #免疫保持時or死亡時（サイクル、移動距離）
-        self.item_id = None #図形ID
 
-    def move(self):
+    def move(self, prm, rng):
         """人の移動
         
          シュミレーション空間上で人をランダムに移動させる
          （画面への反映はここでは行わない）
 
-        Args:なし
+        Args:
+            prm(PrmSnap):パラメータ
+            rng(SimRandom):乱数生成器(エンジンのもの)
         Returns:なし
         Raises:なし
         Yields:なし
@@ -1264,40 +2115,40 @@ class Person():
         if self.stat == D_STATE:
             return
         elif self.stat == S_STATE:
-            if [True] == random.choices([True,False],weights=[main.up.ups_dic["s_move_disable_rate"].getvl(), 1-main.up.ups_dic["s_move_disable_rate"].getvl()],k=1):
+            if rng.bernoulli(prm.s_move_disable_rate):
                 return
         elif self.stat == R_STATE:
-            if [True] == random.choices([True,False],weights=[main.up.ups_dic["r_move_disable_rate"].getvl(), 1-main.up.ups_dic["r_move_disable_rate"].getvl()],k=1):
+            if rng.bernoulli(prm.r_move_disable_rate):
                 return
         else:       #i_stat
             if self.serious == I_RANK_NON:
-                if [True] == random.choices([True,False],weights=[main.up.ups_dic["i_n_move_disable_rate"].getvl(), 1-main.up.ups_dic["i_n_move_disable_rate"].getvl()],k=1):
+                if rng.bernoulli(prm.i_n_move_disable_rate):
                     return
             elif self.serious == I_RANK_LOW:       
-                if [True] == random.choices([True,False],weights=[main.up.ups_dic["i_l_move_disable_rate"].getvl(), 1-main.up.ups_dic["i_l_move_disable_rate"].getvl()],k=1):
+                if rng.bernoulli(prm.i_l_move_disable_rate):
                     return
             else:       #I_RANK_HIGH
-                if [True] == random.choices([True,False],weights=[main.up.ups_dic["i_h_move_disable_rate"].getvl(), 1-main.up.ups_dic["i_h_move_disable_rate"].getvl()],k=1):
+                if rng.bernoulli(prm.i_h_move_disable_rate):
                     return
 
         #移動予定距離（r）・移動予定方向（Θ）をランダムに決める
-        r = random.normalvariate(main.up.ups_dic["move_r"].getvl(),4)       #標準偏差はとりあえず4
-        dlt_degree = random.normalvariate(0,50)    #標準偏差はとりあえず8
+        r = rng.normalvariate(prm.move_r,4)       #標準偏差はとりあえず4
+        dlt_degree = rng.normalvariate(0,50)    #標準偏差はとりあえず8
         self.degree += dlt_degree
         radian = math.radians(self.degree)
 
         #距離移動制限率で移動予定距離を補正する
         if self.stat == S_STATE:
-            r = r *(1-main.up.ups_dic["s_move_limit_rate"].getvl())
+            r = r *(1-prm.s_move_limit_rate)
         elif self.stat == R_STATE:
-            r = r *(1-main.up.ups_dic["r_move_limit_rate"].getvl())
+            r = r *(1-prm.r_move_limit_rate)
         else:       #i_stat
             if self.serious == I_RANK_NON:
-                r = r *(1-main.up.ups_dic["i_n_move_limit_rate"].getvl())
+                r = r *(1-prm.i_n_move_limit_rate)
             elif self.serious == I_RANK_LOW:       
-                r = r *(1-main.up.ups_dic["i_l_move_limit_rate"].getvl())
+                r = r *(1-prm.i_l_move_limit_rate)
             else:       #I_RANK_HIGH
-                r = r *(1-main.up.ups_dic["i_h_move_limit_rate"].getvl())
+                r = r *(1-prm.i_h_move_limit_rate)
 
         #移動分の座標を求める
         cos_x = math.cos(radian)
@@ -1305,17 +2156,17 @@ class Person():
 
         #壁にあたったら、反対側から出てくる
         if 0 > ((r*cos_x) + self.point[0]):
-            self.delta_x = ((r*cos_x)+main.up.ups_dic["field_size"].getvl())
-        elif main.up.ups_dic["field_size"].getvl() < ((r*cos_x) + self.point[0]):
-            self.delta_x = ((r*cos_x)-main.up.ups_dic["field_size"].getvl()) 
+            self.delta_x = ((r*cos_x)+prm.field_size)
+        elif prm.field_size < ((r*cos_x) + self.point[0]):
+            self.delta_x = ((r*cos_x)-prm.field_size) 
         else:
             self.delta_x = (r*cos_x) 
         self.point[0]  += self.delta_x
 
         if 0 > ((r*sin_y) + self.point[1]):
-            self.delta_y = ((r*sin_y)+main.up.ups_dic["field_size"].getvl())
-        elif main.up.ups_dic["field_size"].getvl() < ((r*sin_y) + self.point[1]):
-            self.delta_y = ((r*sin_y)-main.up.ups_dic["field_size"].getvl())
+            self.delta_y = ((r*sin_y)+prm.field_size)
+        elif prm.field_size < ((r*sin_y) + self.point[1]):
+            self.delta_y = ((r*sin_y)-prm.field_size)
         else:
             self.delta_y = (r*sin_y)
         self.point[1] += self.delta_y
@@ -1324,108 +2175,73 @@ class Person():
         self.r=r
         self.odometter += r
 
-    def stat_renew(self):
+    def stat_renew(self, engine, now_cycle):
         """感染判定
         
          自分が感染するか判定する。近くに感染者がいれば、
          ある確率で感染する。
 
-        Args:なし
+        Args:
+            engine(PersonEngine):自分を保持するエンジン(パラメータ・
+                    乱数生成器・感染判定用インデックス・人数を持つ)
+            now_cycle(int):現在サイクル
         Returns:なし
         Raises:なし
         Yields:なし
         Examples:なし
         Note:なし
         """
+        prm = engine.prm
+        rng = engine.rng
         #未感染者の場合
         if self.stat == S_STATE:
-            #感染者を探す
-            for p in [pp for pp in main.persons if pp.stat == I_STATE]:
-                if self.id != p.id:     #自分は省く
-                    #ステータスチェック
-                    delta_x = self.point[0] - p.point[0]
-                    delta_y = self.point[1] - p.point[1]
-                    #感染領域（接近範囲）内に他の感染者がいれば、ステータスを感染者に。
-                    if main.up.ups_dic["infection_r"].getvl()**2 > (delta_x**2 + delta_y**2):
-                        if [True] == random.choices([True,False],weights=[main.up.ups_dic["infection_rate"].getvl(), 1-main.up.ups_dic["infection_rate"].getvl()],k=1):
-                            #重篤度を感染者重篤割合を使ってランダムに設定。
-                            self.stat = I_STATE
-                            self.serious = I_RANK_NON
-                            #履歴に、感染時（サイクル、移動距離）を記録
-                            self.i_history = [main.now_cycle,self.odometter]
- 
-                            break
+            #感染領域（接近範囲）内の感染者を数える（近くのセルにいる感染者のみ）
+            #※自分は未感染者なので、インデックスには含まれない
+            k = engine.igrid.count(self.point, prm.infection_r2)
+            #k人の感染者それぞれから感染確率で判定するのと同じ確率で、１回だけ判定する
+            if k > 0 and rng.bernoulli(prm.infection_p(k)):
+                self.stat = I_STATE
+                self.serious = I_RANK_NON
+                #履歴に、感染時（サイクル、移動距離）を記録
+                self.i_history = [now_cycle,self.odometter]
+            #新たに感染した場合は、インデックスに追加
+            if self.stat == I_STATE:
+                engine.igrid.add(self)
+                engine.transit(GRP_S, GRP_I_N, idx=self.idx)
         #感染者の場合。
         elif self.stat == I_STATE:
             #感染期間が、免疫獲得サイクルを越えていれば（現在サイクルー履歴.感染時サイクル＞感染期間）、
-            if main.up.ups_dic["get_immunity_cycle"].getvl() < (main.now_cycle - self.i_history[0] ):
+            if prm.get_immunity_cycle < (now_cycle - self.i_history[0] ):
                 #ステータスを免疫保持者に更新
                 self.stat = R_STATE
+                engine.igrid.remove(self)
+                engine.transit(SERIOUS_GROUP[self.serious], GRP_R, idx=self.idx)
                 #履歴に、免疫保持時（サイクル、移動距離）を記録
-                self.r_history = [main.now_cycle,self.odometter]
+                self.r_history = [now_cycle,self.odometter]
             else:
                 #死亡率により死亡判定。死亡の場合はステータスを死亡に。
                 #履歴に、死亡時（サイクル、移動距離）を記録
                 if self.serious == I_RANK_NON:
-                    dead_rate = main.up.ups_dic["n_dead_rate"].getvl()
+                    dead_rate = prm.n_dead_rate
                 elif self.serious == I_RANK_LOW:
-                    dead_rate = main.up.ups_dic["l_dead_rate"].getvl()
+                    dead_rate = prm.l_dead_rate
                 else:   #I_RANK_HIGH
-                    dead_rate = main.up.ups_dic["h_dead_rate"].getvl()
-                if [True] == random.choices([True,False],weights=[dead_rate, 1-dead_rate],k=1):
+                    dead_rate = prm.h_dead_rate
+                if rng.bernoulli(dead_rate):
                     self.stat = D_STATE
-                    self.r_history = [main.now_cycle,self.odometter]
+                    engine.igrid.remove(self)
+                    engine.transit(SERIOUS_GROUP[self.serious], GRP_D, idx=self.idx)
+                    self.r_history = [now_cycle,self.odometter]
                 #死ななかったら、次の症状にランダムに移行
                 else:
                     if self.serious == I_RANK_NON:
-                        if [True] == random.choices([True,False],weights=[main.up.ups_dic["i_n2l_tran_rate"].getvl(), 1-main.up.ups_dic["i_n2l_tran_rate"].getvl()],k=1):
+                        if rng.bernoulli(prm.i_n2l_tran_rate):
                             self.serious = I_RANK_LOW
+                            engine.transit(GRP_I_N, GRP_I_L, idx=self.idx)
                     elif self.serious == I_RANK_LOW:
-                        if [True] == random.choices([True,False],weights=[main.up.ups_dic["i_l2h_tran_rate"].getvl(), 1-main.up.ups_dic["i_l2h_tran_rate"].getvl()],k=1):
+                        if rng.bernoulli(prm.i_l2h_tran_rate):
                             self.serious = I_RANK_HIGH
-
-    def drow_p(self,refresh=MODE_MOVE):
-        """図形描画
-        
-         シミュレーション画面に図形を描写or移動する。
-            初期描画時：描画(create_oval)
-            それ以外：移動(move)         
-
-        Args:
-            refresh:描画モード。以下のいずれか
-                MODE_REFRESH:描画する
-                MODE_MOVE:移動する(デフォルト)
-        Returns:なし
-        Raises:なし
-        Yields:なし
-        Examples:なし
-        Note:なし
-        """
-        if self.stat == S_STATE:
-            d_color = PERSON_S_CLR
-        elif self.stat == I_STATE:
-            if self.serious == I_RANK_NON:
-                d_color = PERSON_I_N_CLR
-            elif self.serious == I_RANK_LOW:
-                d_color = PERSON_I_L_CLR
-            else:    #I_RANK_HIGH
-                d_color = PERSON_I_H_CLR
-        elif self.stat == R_STATE:
-            d_color = PERSON_R_CLR            
-        else:       #D_STATE
-            d_color = PERSON_D_CLR
-        
-        #中心点から  矩形座標（始点、終点）に変換
-        dx1 = self.point[0]*main.disp_exp_rate
-        dy1 = self.point[1]*main.disp_exp_rate
-        dx2 = self.point[0]*main.disp_exp_rate + SIM_PERSONS_R
-        dy2 = self.point[1]*main.disp_exp_rate + SIM_PERSONS_R
-
-        if refresh == MODE_REFRESH:
-            self.item_id=main.canvas_sim.create_oval(dx1,dy1,dx2,dy2,fill=d_color,tags=self.id)
-        else:
-            main.canvas_sim.itemconfig(self.item_id, fill=d_color)
-            main.canvas_sim.move(self.id,self.delta_x*main.disp_exp_rate, self.delta_y*main.disp_exp_rate)
+                            engine.transit(GRP_I_L, GRP_I_H, idx=self.idx)
 
     def dump_dsp(self):
         """ダンプ
@@ -1439,121 +2255,5828 @@ class Person():
         Examples:なし
         Note:なし
         """
-        print("{},{},{},{},{},{},{},{},{},{},{},{},{},{},{}".format( self.id,self.stat,self.serious, \
+        print("{},{},{},{},{},{},{},{},{},{},{},{},{},{}".format( self.id,self.stat,self.serious, \
             self.point[0],self.point[1],self.degree,self.delta_x,self.delta_y,  \
             self.r,self.odometter,self.i_history[0],self.i_history[1],  \
-            self.r_history[0],self.r_history[1],self.item_id ))
+            self.r_history[0],self.r_history[1] ))
+
+class PersonEngine():
+    """PersonEngine【人オブジェクト版シミュレーションエンジンクラス】
+
+        対象者を人クラス(Person)のオブジェクトで保持し、１人ずつ
+        移動・感染判定を行うエンジンです（従来の方式）。
+        ArrayEngineクラスと同じメソッドを持ち、MainAppクラスから
+        は、どちらのエンジンも同じように呼び出せます。
+        対象者は、グループ(s,i_n,i_l,i_h,r,d)別の集合(pools)でも
+        管理し（状態が変わった時にtransit()で更新）、処理に関係の
+        ある人だけを処理します。
+        ・移動：対象者移動制限率が1.0のグループ（死亡者を含む）
+          は移動しないため、処理しない
+        ・感染判定：未感染者（周囲に感染者がいない人は、すぐに終
+          わる）と、感染者だけを処理する（免疫保持者・死亡者は、
+          状態が変わらないため処理しない）
+        感染判定は、未感染者の感染判定→感染者の判定の順に行いま
+        す（今回サイクルに免疫保持者・死亡者になる感染者も、今回
+        サイクルは感染させる）。
 
-class Prm_entry():
-    """Prm_entry【パラメータ入力クラス】
+    Attributes:
+        persons[](Person):対象者オブジェクトのリスト
+        igrid(InfectionGrid):感染判定用の空間インデックス
+        prm(PrmSnap):パラメータ
+                ※Personの移動・感染判定は、これを受け取って行う
+        rng(SimRandom):乱数生成器
+                ※Personの移動・感染判定はすべてこれを使う
+        counts[](int):グループ(s,i_n,i_l,i_h,r,d)別の人数
+                ※状態が変わった時だけ更新する(transit())
+        seri_counts[](int):重篤度(CODE_NON〜CODE_H)別の人数
+                ※免疫保持者・死亡者は、最後の重篤度で数える
+        pools[]{}(int):グループ(s,i_n,i_l,i_h,r,d)別の、対象者の
+                番号(personsの添字)の集合
+                ※状態が変わった時だけ更新する(transit())
+                ※処理の順序が決まるように、集合(set)ではなく、
+                追加順を保つ辞書(値はNone)で持つ
+        stat_codes(bytearray):対象者毎のステータスコード(CODE_S〜CODE_D)
+                ※状態が変わった時だけ更新する(transit())。軌跡の
+                記録(frame())で、全員分を毎サイクル作り直さないため
+        seri_codes(bytearray):対象者毎の重篤度コード(CODE_NON〜CODE_H)
+                ※stat_codesと同じ
+        moved_r(float):今回サイクルで移動した距離の合計
+    """
+    def __init__(self, prm, seed):
+        """コンストラクタ
+
+         初期パラメータに従って、対象者オブジェクトを生成する
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seed(int):乱数シード
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.persons = []
+        self.prm = prm
+        self.rng = SimRandom(seed)
+
+        #初期インスタンスの生成
+        total_persons_count =0
+        for i in  range(prm.s_persons_count):
+            self.persons.append( Person(id=i, rng=self.rng, field_size=prm.field_size) )
+        total_persons_count =i+1  #0 origin
+    
+        for i in  range(prm.i_persons_count):
+            self.persons.append( Person(id=(i+total_persons_count), rng=self.rng, field_size=prm.field_size, stat=I_STATE, serious=I_RANK_NON ) )
+        total_persons_count +=(i+1)
+        
+        for i in  range(prm.r_persons_count):
+            self.persons.append( Person(id=(i+total_persons_count), rng=self.rng, field_size=prm.field_size, stat=R_STATE ) )
+        total_persons_count +=(i+1)
+        
+        for i in  range(prm.d_persons_count):
+            self.persons.append( Person(id=(i+total_persons_count), rng=self.rng, field_size=prm.field_size, stat=D_STATE ) )
+
+        #人数（初期人数から、状態が変わる度に更新）
+        self.counts = [prm.s_persons_count, prm.i_persons_count, 0, 0, prm.r_persons_count, prm.d_persons_count]
+        self.seri_counts = [0, prm.i_persons_count, 0, 0]
+        #グループ別の集合
+        self.pools = [{} for g in range(len(GROUP_CLR))]
+        for p in self.persons:
+            self.pools[STAT_GROUP[p.stat+p.serious]][p.idx] = None
+        self.initcodes()
+        self.moved_r = 0.0
+
+        #感染判定用インデックス
+        self.igrid=InfectionGrid(prm.field_size, prm.infection_r)
+
+    def initcodes(self):
+        """ステータスコード・重篤度コードの作成
+
+         全員のステータスコード・重篤度コードを作る（以降は、
+         transit()で、状態が変わった人の分だけ更新する）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        persons = self.persons
+        self.stat_codes = bytearray([STAT_CODE[p.stat] for p in persons])
+        self.seri_codes = bytearray([SERIOUS_CODE[p.serious] for p in persons])
+
+    def move(self):
+        """移動
+
+         移動しうる人（対象者移動制限率が1.0未満のグループ）を移
+         動させる
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            移動しないグループの人は、移動距離(Person.r)を更新し
+            ないため、移動距離の合計はここで求めておく(moved_r)
+        """
+        persons = self.persons
+        prm = self.prm
+        rng = self.rng
+        moved_r = 0.0
+        for grp, pool in enumerate(self.pools):
+            if prm.move_disable[grp] >= 1.0:
+                continue
+            for idx in pool:
+                p = persons[idx]
+                p.move(prm, rng)
+                moved_r += p.r
+        self.moved_r = moved_r
+
+    def infected(self):
+        """感染者の番号
+
+         感染者(i_n,i_l,i_h)の番号のリストを返す
+
+        Args:なし
+        Returns:感染者の番号(personsの添字)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            リストは、呼び出した時点の感染者（その後、状態が変
+            わっても変わらない）
+        """
+        pools = self.pools
+        return [*pools[GRP_I_N], *pools[GRP_I_L], *pools[GRP_I_H]]
+
+    def stat_renew(self, now_cycle):
+        """感染判定
+
+         全員の感染判定を行う
+
+        Args:
+            now_cycle(int):現在サイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        persons = self.persons
+        #感染判定の前の感染者(今回感染した人は、今回は判定しない)
+        infected = self.infected()
+
+        #感染判定用インデックスの再構築(移動後の位置で)
+        self.igrid.rebuild([persons[idx] for idx in infected])
+
+        #未感染者の感染判定
+        for idx in list(self.pools[GRP_S]):
+            persons[idx].stat_renew(self, now_cycle)
+        #感染者の判定
+        for idx in infected:
+            persons[idx].stat_renew(self, now_cycle)
+
+    def transit(self, fr, to, n=1, idx=None):
+        """状態の変化（人数の更新）
+
+         状態が変わった人の分だけ、人数とグループ別の集合を更新
+         する
+
+        Args:
+            fr(int):変化前のグループ番号(GRP_S〜GRP_D)
+            to(int):変化後のグループ番号(GRP_S〜GRP_D)
+            n(int,optional):人数(デフォルト1)
+            idx(int,optional):状態が変わった人の番号(Person.idx)
+                ※指定した場合は、グループ別の集合も更新する
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:
+            engine.transit(GRP_S, GRP_I_N, idx=p.idx)     #感染
+        Note:
+            重篤度別の人数は、感染者のグループ(GRP_I_N〜GRP_I_H)
+            に変わった時だけ更新する（グループ番号と重篤度コード
+            は同じ値）
+            idxを指定する場合は、その人のステータス・重篤度を変え
+            てから呼び出す（ステータスコード・重篤度コードを更新
+            する）
+        """
+        self.counts[fr] -= n
+        self.counts[to] += n
+        if GRP_I_N <= to <= GRP_I_H:
+            self.seri_counts[to] += n
+            if GRP_I_N <= fr <= GRP_I_H:
+                self.seri_counts[fr] -= n
+        if idx is not None:
+            del self.pools[fr][idx]
+            self.pools[to][idx] = None
+            p = self.persons[idx]
+            self.stat_codes[idx] = STAT_CODE[p.stat]
+            self.seri_codes[idx] = SERIOUS_CODE[p.serious]
+
+    def count(self):
+        """人数カウント
+
+         ステータス（重篤度）別の人数を返す
+
+        Args:なし
+        Returns:
+            人数のリスト[s,i_n,i_l,i_h,r,d](int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            全員を数え直さずに、transit()で更新している人数を返す
+        """
+        return list(self.counts)
+
+    def movesum(self):
+        """移動距離の合計
+
+         今回サイクルで全員が移動した距離の合計を求める
+         （経済活動の計算用）
+
+        Args:なし
+        Returns:移動距離の合計(float)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            移動時に求めた合計(moved_r)を返す
+        """
+        return self.moved_r
+
+    def final_counts(self):
+        """結果サマリ用の人数カウント
+
+         未感染者・免疫保持者・死亡者の人数と、重篤度別の発生人
+         数（最後の重篤度で数える）を数える
+
+        Args:なし
+        Returns:
+            人数のタプル(s,r,d,i_n,i_l,i_h)(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return (self.counts[GRP_S], self.counts[GRP_R], self.counts[GRP_D],  \
+            self.seri_counts[CODE_N], self.seri_counts[CODE_L], self.seri_counts[CODE_H])
+
+    def drawdata(self):
+        """描画用データの取得
+
+         全員の位置とグループ番号を返す（CanvasRendererで使用）
+
+        Args:なし
+        Returns:
+            (x座標のリスト, y座標のリスト, グループ番号のリスト)
+            ※シミュレーション空間の座標
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        persons = self.persons
+        return ([p.point[0] for p in persons], [p.point[1] for p in persons],   \
+            [STAT_GROUP[p.stat+p.serious] for p in persons])
+
+    def frame(self):
+        """軌跡記録用データの取得
+
+         全員の位置・ステータスコード・重篤度コードを返す
+         （TrajRecorderで使用）
+
+        Args:なし
+        Returns:
+            (x座標, y座標, ステータスコード(CODE_S〜CODE_D),
+            重篤度コード(CODE_NON〜CODE_H))
+            ※NumPyがある場合はndarray、無い場合はリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            座標は、全員の座標を１回で１つの配列にして、x,y毎のビ
+            ューで返す（リストを作ってから変換しない）。ステータス
+            コード・重篤度コードは、transit()で更新しているものの
+            ビュー（コピーしない）
+        """
+        persons = self.persons
+        if np is not None:
+            xy = np.fromiter(itertools.chain.from_iterable([p.point for p in persons]), np.float64, 2*len(persons))
+            return (xy[0::2], xy[1::2], np.frombuffer(self.stat_codes, dtype=np.uint8),   \
+                np.frombuffer(self.seri_codes, dtype=np.uint8))
+        return ([p.point[0] for p in persons], [p.point[1] for p in persons],   \
+            list(self.stat_codes), list(self.seri_codes))
+
+    def getstate(self):
+        """状態の取得（チェックポイント用）
+
+         エンジンの状態（全員の状態・人数・乱数の状態）を返す
+
+        Args:なし
+        Returns:
+            (状態の辞書(jsonに変換できる値), 配列の辞書)
+            ※配列は、array.array(Personの項目毎)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            グループ別の集合は、処理の順序が変わらないように、
+            並び順のまま保存する
+        """
+        persons = self.persons
+        arrays = {
+            "stat": array.array("b", self.stat_codes),
+            "serious": array.array("b", self.seri_codes),
+            "x": array.array("d", [p.point[0] for p in persons]),
+            "y": array.array("d", [p.point[1] for p in persons]),
+            "degree": array.array("d", [p.degree for p in persons]),
+            "delta_x": array.array("d", [p.delta_x for p in persons]),
+            "delta_y": array.array("d", [p.delta_y for p in persons]),
+            "r": array.array("d", [p.r for p in persons]),
+            "odometter": array.array("d", [p.odometter for p in persons]),
+            "i_cycle": array.array("q", [p.i_history[0] for p in persons]),
+            "i_distance": array.array("d", [p.i_history[1] for p in persons]),
+            "r_cycle": array.array("q", [p.r_history[0] for p in persons]),
+            "r_distance": array.array("d", [p.r_history[1] for p in persons]),
+            "pools": array.array("q", [idx for pool in self.pools for idx in pool]) }
+        state = {"counts": self.counts, "seri_counts": self.seri_counts, "moved_r": self.moved_r,    \
+            "pool_sizes": [len(pool) for pool in self.pools], "rng": self.rng.getstate()}
+        return state, arrays
+
+    def setstate(self, prm, seed, state, arrays):
+        """状態の復元（チェックポイント用）
+
+         getstate()で取得した状態から、エンジンを復元する
+         (コンストラクタの代わりに呼び出す)
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seed(int):乱数シード
+            state(dic):状態の辞書(getstate()の結果)
+            arrays(dic):配列の辞書(getstate()の結果。memoryviewでも可)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:
+            engine = PersonEngine.__new__(PersonEngine)
+            engine.setstate(prm, seed, state, arrays)
+        Note:なし
+        """
+        self.prm = prm
+        self.rng = SimRandom(seed)
+        rng_state = state["rng"]
+        self.rng.setstate((rng_state[0], tuple(rng_state[1]), rng_state[2]))
+
+        #対象者（コンストラクタを通さずに、保存した値を設定する）
+        self.persons = []
+        cols = [arrays[key].tolist() for key in ("stat", "serious", "x", "y", "degree", "delta_x", "delta_y",   \
+            "r", "odometter", "i_cycle", "i_distance", "r_cycle", "r_distance")]
+        for idx, (stat, serious, x, y, degree, delta_x, delta_y, r, odometter, i_cycle, i_distance,   \
+                r_cycle, r_distance) in enumerate(zip(*cols)):
+            p = Person.__new__(Person)
+            p.id = "PS"+str(idx)
+            p.idx = idx
+            p.stat = CODE_STAT[stat]
+            p.serious = CODE_SERIOUS[serious]
+            p.point = [x, y]
+            p.degree = degree
+            p.delta_x = delta_x
+            p.delta_y = delta_y
+            p.r = r
+            p.odometter = odometter
+            p.i_history = [i_cycle, i_distance]
+            p.r_history = [r_cycle, r_distance]
+            self.persons.append(p)
+
+        self.counts = list(state["counts"])
+        self.seri_counts = list(state["seri_counts"])
+        self.moved_r = state["moved_r"]
+        #グループ別の集合（保存した並び順のまま）
+        order = arrays["pools"].tolist()
+        self.pools = []
+        pos = 0
+        for size in state["pool_sizes"]:
+            self.pools.append(dict.fromkeys(order[pos:pos+size]))
+            pos += size
+        self.initcodes()
+
+        #感染判定用インデックス（感染判定の最初に作り直す）
+        self.igrid=InfectionGrid(prm.field_size, prm.infection_r)
+
+class EventEngine(PersonEngine):
+    """EventEngine【イベント駆動版シミュレーションエンジンクラス】
+
+        PersonEngineと同じく、対象者を人クラス(Person)で保持する
+        エンジンですが、感染者の病状（死亡・症状の変化・免疫獲得）
+        の判定方式が異なります。
+        PersonEngineでは、感染者全員について、サイクル毎に死亡・
+        症状の変化の判定（確率による判定）を行います。確率は小さい
+        ため、ほとんどの判定は何も起こりません。
+        EventEngineでは、感染時・症状の変化時に、死亡・症状の変化
+        までのサイクル数を幾何分布から求め（SimRandom.geometric()）、
+        免疫獲得のサイクルと合わせて、一番早いものだけを優先度付
+        きキュー（ヒープ）に入れておきます。サイクル毎には、その
+        サイクルのイベントだけを処理します。
+        ・同じサイクルの死亡と症状の変化は、死亡を優先する（サイ
+          クル毎の判定で、死亡を先に判定するのと同じ）
+        ・免疫獲得のサイクル以降の死亡・症状の変化は起こらない
+        ・イベントの処理（感染者の状態の変化）は、未感染者の感染
+          判定の後に行う（PersonEngineと同じ順序）
+        そのため、乱数の使い方は異なりますが、結果はPersonEngine
+        と同じ分布になります。
+        一時停止中にパラメータ（死亡率・症状変化率・免疫獲得サイ
+        クル）が変わった場合は、感染者全員のイベントを決め直しま
+        す（幾何分布は無記憶のため、決め直しても分布は変わらない）。
+
+    Attributes:
+        events[](tuple):病状のイベントのヒープ
+                (サイクル, 人の番号, イベント(EV_*), 版数)
+        ev_ver[](int):人ごとのイベントの版数
+                ※決め直した場合は版数を上げ、古いイベントは捨てる
+        ev_prm(PrmSnap):イベントを決めた時のパラメータ
+        ※その他はPersonEngineを参照
+    """
+    def __init__(self, prm, seed):
+        """コンストラクタ
+
+         初期パラメータに従って、対象者オブジェクトを生成し、
+         初期の感染者のイベントを決める
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seed(int):乱数シード
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            初期の感染者は、サイクル0から判定する（PersonEngine
+            と同じ）
+        """
+        super().__init__(prm, seed)
+        self.events = []
+        self.ev_ver = [0] * len(self.persons)
+        self.ev_prm = prm
+        for idx in self.infected():
+            self.schedule(idx, 0)
+
+    def schedule(self, idx, start):
+        """イベントの決定
+
+         感染者の次のイベント（死亡・症状の変化・免疫獲得のうち、
+         一番早いもの）と、そのサイクルを決めて、キューに入れる
+
+        Args:
+            idx(int):人の番号(personsの添字)
+            start(int):最初に判定するサイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        p = self.persons[idx]
+        code = SERIOUS_GROUP[p.serious]     #グループ番号と重篤度コードは同じ値
+        #免疫獲得（感染期間が免疫獲得サイクルを越えたサイクル）
+        cycle = max(p.i_history[0] + prm.get_immunity_cycle + 1, start)
+        event = EV_RECOVER
+        #死亡・症状の変化（免疫獲得より前のみ。同じサイクルは死亡を優先）
+        n = self.rng.geometric(prm.dead_rate[code])
+        if n is not None and start + n - 1 < cycle:
+            cycle = start + n - 1
+            event = EV_DEAD
+        n = self.rng.geometric(prm.tran_rate[code])
+        if n is not None and start + n - 1 < cycle:
+            cycle = start + n - 1
+            event = EV_TRAN
+        self.ev_ver[idx] += 1
+        heapq.heappush(self.events, (cycle, idx, event, self.ev_ver[idx]))
+
+    def stat_renew(self, now_cycle):
+        """感染判定
+
+         未感染者の感染判定と、今回サイクルのイベントの処理を行う
+
+        Args:
+            now_cycle(int):現在サイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        persons = self.persons
+        infected = self.infected()
+        #病状のパラメータが変わった場合は、感染者全員のイベントを決め直す
+        #（移動制限・外出制限だけの変更では、決め直さない）
+        if self.prm is not self.ev_prm:
+            prm, ev_prm = self.prm, self.ev_prm
+            self.ev_prm = prm
+            if (prm.get_immunity_cycle, prm.dead_rate, prm.tran_rate) !=   \
+                    (ev_prm.get_immunity_cycle, ev_prm.dead_rate, ev_prm.tran_rate):
+                self.events = []
+                for idx in infected:
+                    self.schedule(idx, now_cycle)
+
+        #今回サイクルのイベント（古い版数のものは捨てる）
+        due = {}
+        events = self.events
+        ev_ver = self.ev_ver
+        while events and events[0][0] <= now_cycle:
+            cycle, idx, event, ver = heapq.heappop(events)
+            if ver == ev_ver[idx]:
+                due[idx] = event
+
+        #感染判定用インデックスの再構築(移動後の位置で)
+        self.igrid.rebuild([persons[idx] for idx in infected])
+
+        #未感染者の感染判定
+        for idx in list(self.pools[GRP_S]):
+            p = persons[idx]
+            p.stat_renew(self, now_cycle)
+            #新たに感染した場合は、次のサイクルから判定
+            if p.stat == I_STATE:
+                self.schedule(idx, now_cycle + 1)
+        #イベントの処理（PersonEngineと同じ順序）
+        for idx, event in due.items():
+            self.fire(idx, event, now_cycle)
+
+    def fire(self, idx, event, now_cycle):
+        """イベントの処理
+
+         感染者の状態を、イベントに従って変える
+         （Person.stat_renew()の感染者の場合と同じ）
+
+        Args:
+            idx(int):人の番号(personsの添字)
+            event(int):イベント(EV_RECOVER/EV_DEAD/EV_TRAN)
+            now_cycle(int):現在サイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            症状が変化した場合は、次のサイクルからのイベントを決め
+            る
+        """
+        p = self.persons[idx]
+        if event == EV_TRAN:
+            if p.serious == I_RANK_NON:
+                p.serious = I_RANK_LOW
+                self.transit(GRP_I_N, GRP_I_L, idx=idx)
+            else:   #I_RANK_LOW
+                p.serious = I_RANK_HIGH
+                self.transit(GRP_I_L, GRP_I_H, idx=idx)
+            self.schedule(idx, now_cycle + 1)
+            return
+        if event == EV_RECOVER:
+            p.stat = R_STATE
+            self.transit(SERIOUS_GROUP[p.serious], GRP_R, idx=idx)
+        else:   #EV_DEAD
+            p.stat = D_STATE
+            self.transit(SERIOUS_GROUP[p.serious], GRP_D, idx=idx)
+        self.igrid.remove(p)
+        #履歴に、免疫保持時or死亡時（サイクル、移動距離）を記録
+        p.r_history = [now_cycle, p.odometter]
+
+    def getstate(self):
+        """状態の取得（チェックポイント用）
+
+         PersonEngineの状態に、イベントのキューを加えて返す
+
+        Args:なし
+        Returns:
+            (状態の辞書, 配列の辞書) ※PersonEngine.getstate()を参照
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            キューは、ヒープの並び順のまま保存する
+        """
+        state, arrays = super().getstate()
+        events = self.events
+        arrays["ev_cycle"] = array.array("q", [e[0] for e in events])
+        arrays["ev_idx"] = array.array("q", [e[1] for e in events])
+        arrays["ev_event"] = array.array("b", [e[2] for e in events])
+        arrays["ev_ver"] = array.array("q", [e[3] for e in events])
+        arrays["ev_person_ver"] = array.array("q", self.ev_ver)
+        return state, arrays
+
+    def setstate(self, prm, seed, state, arrays):
+        """状態の復元（チェックポイント用）
+
+         PersonEngineの状態と、イベントのキューを復元する
+
+        Args:
+            ※PersonEngine.setstate()を参照
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        super().setstate(prm, seed, state, arrays)
+        self.events = list(zip(arrays["ev_cycle"].tolist(), arrays["ev_idx"].tolist(),   \
+            arrays["ev_event"].tolist(), arrays["ev_ver"].tolist()))
+        self.ev_ver = arrays["ev_person_ver"].tolist()
+        self.ev_prm = prm
+
+class ArrayEngine():
+    """ArrayEngine【配列版シミュレーションエンジンクラス】
+
+        対象者の状態を、NumPyの配列（人数分の長さの配列を項目ご
+        とに持つ）で保持し、移動・感染判定を配列演算でまとめて
+        行うエンジンです。大人数（100万人程度まで）のシミュレー
+        ションに使用します。NumPyがインストールされていない場合
+        は使用できません。
+        モデルはPersonEngineと同じですが、感染判定はサイクルの開
+        始時点の状態でまとめて行います（同じサイクルで感染した
+        人が、そのサイクル中に他の人に感染させることはない）。
+        そのため、結果は統計的に一致しますが、乱数の列が同じでも
+        個々の結果は一致しません。
+
+    Attributes:
+        count_all(int):人数
+        x[](float):x座標（シミュレーション空間）
+        y[](float):y座標（シミュレーション空間）
+        degree[](float):進行方向(角度)
+        stat[](int8):感染状態（CODE_S/CODE_I/CODE_R/CODE_D）
+        serious[](int8):重篤度（CODE_NON/CODE_N/CODE_L/CODE_H）
+        delta_x[](float):x座標の増分（今回サイクル）
+        delta_y[](float):y座標の増分（今回サイクル）
+        r[](float):移動距離（今回サイクル）
+        odometter[](float):累積移動距離
+        i_history[](int32):感染時のサイクル
+        r_history[](int32):免疫保持時or死亡時のサイクル
+        group_lut[](int8):グループ番号への変換表(GROUP_LUT)
+        counts[](int):グループ(s,i_n,i_l,i_h,r,d)別の人数
+                ※状態が変わった時だけ更新する(transit())
+        seri_counts[](int):重篤度(CODE_NON〜CODE_H)別の人数
+                ※免疫保持者・死亡者は、最後の重篤度で数える
+        prm(PrmSnap):パラメータ
+        rng(numpy.random.Generator):乱数生成器
+                ※確率による判定は、サイクルごとに人数分の乱数
+                (一様乱数)をまとめて引いて行う
+    """
+    def __init__(self, prm, seed):
+        """コンストラクタ
+
+         初期パラメータに従って、対象者の配列を生成する
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seed(int):乱数シード
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.prm = prm
+        self.rng = np.random.default_rng(seed)
+        field_size = prm.field_size
+        cnts = [prm.s_persons_count, prm.i_persons_count, \
+            prm.r_persons_count, prm.d_persons_count]
+        self.count_all = sum(cnts)
+        n = self.count_all
+
+        self.x = self.rng.uniform(0, field_size, n)
+        self.y = self.rng.uniform(0, field_size, n)
+        self.degree = self.rng.integers(0, 361, n).astype(np.float64)
+        #並び順はPersonEngineと同じ（S→I→R→D）
+        self.stat = np.repeat(np.array([CODE_S, CODE_I, CODE_R, CODE_D], dtype=np.int8), cnts)
+        self.serious = np.where(self.stat == CODE_I, CODE_N, CODE_NON).astype(np.int8)
+        self.delta_x = np.zeros(n)
+        self.delta_y = np.zeros(n)
+        self.r = np.zeros(n)
+        self.odometter = np.zeros(n)
+        self.i_history = np.zeros(n, dtype=np.int32)
+        self.r_history = np.zeros(n, dtype=np.int32)
+        self.group_lut = np.array(GROUP_LUT, dtype=np.int8)
+        #人数（初期人数から、状態が変わる度に更新）
+        self.counts = [prm.s_persons_count, prm.i_persons_count, 0, 0, prm.r_persons_count, prm.d_persons_count]
+        self.seri_counts = [0, prm.i_persons_count, 0, 0]
+
+    def group(self):
+        """グループ番号の取得
+
+         ステータスと重篤度から、sim_historyの人数の並び
+         (s,i_n,i_l,i_h,r,d)と同じ順のグループ番号(0〜5)を求める
+
+        Args:なし
+        Returns:グループ番号の配列(ndarray)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.group_lut[self.stat*4 + self.serious]
+
+    def move(self):
+        """移動
+
+         全員をまとめて移動させる（Person.move()と同じモデル）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        field_size = prm.field_size
+        grp = self.group()
+        #グループ別の対象者移動制限率・距離移動制限率(死亡者は移動しない)
+        disable = np.array([prm.s_move_disable_rate, prm.i_n_move_disable_rate,   \
+            prm.i_l_move_disable_rate, prm.i_h_move_disable_rate,    \
+            prm.r_move_disable_rate, 1.0])
+        limit = np.array([prm.s_move_limit_rate, prm.i_n_move_limit_rate,   \
+            prm.i_l_move_limit_rate, prm.i_h_move_limit_rate,    \
+            prm.r_move_limit_rate, 1.0])
+
+        self.r.fill(0.0)
+        self.delta_x.fill(0.0)
+        self.delta_y.fill(0.0)
+
+        #対象者移動制限
+        idx = np.flatnonzero(self.rng.random(self.count_all) >= disable[grp])
+        if 0 == idx.size:
+            return
+
+        #移動予定距離（r）・移動予定方向（Θ）をランダムに決める
+        r = self.rng.normal(prm.move_r, 4, idx.size)
+        self.degree[idx] += self.rng.normal(0, 50, idx.size)
+        radian = np.radians(self.degree[idx])
+        #距離移動制限率で移動予定距離を補正する
+        r *= (1 - limit[grp[idx]])
+
+        #壁にあたったら、反対側から出てくる
+        for pos, delta, d in ((self.x, self.delta_x, r*np.cos(radian)), (self.y, self.delta_y, r*np.sin(radian))):
+            to = pos[idx] + d
+            d[to < 0] += field_size
+            d[to > field_size] -= field_size
+            delta[idx] = d
+            pos[idx] += d
+
+        #累計移動距離の更新
+        self.r[idx] = r
+        self.odometter[idx] += r
+
+    def stat_renew(self, now_cycle):
+        """感染判定
+
+         全員の感染判定を、まとめて行う
+
+        Args:
+            now_cycle(int):現在サイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        inf_idx = np.flatnonzero(self.stat == CODE_I)
+        if 0 == inf_idx.size:
+            return
+
+        #感染判定（判定開始時点の感染者が対象）
+        new_inf = self.infect(inf_idx)
+
+        #感染者の判定（今回感染した人は対象外）
+        #感染期間が、免疫獲得サイクルを越えていれば、免疫保持者
+        recover = prm.get_immunity_cycle < (now_cycle - self.i_history[inf_idx])
+        rec_idx = inf_idx[recover]
+        self.stat[rec_idx] = CODE_R
+        self.r_history[rec_idx] = now_cycle
+        self.transit_seri(self.serious[rec_idx], GRP_R)
+
+        #死亡率により死亡判定
+        rest = inf_idx[~recover]
+        seri = self.serious[rest]
+        dead_rate = np.array(prm.dead_rate)
+        dead = self.rng.random(rest.size) < dead_rate[seri]
+        self.stat[rest[dead]] = CODE_D
+        self.r_history[rest[dead]] = now_cycle
+        self.transit_seri(seri[dead], GRP_D)
+
+        #死ななかったら、次の症状にランダムに移行
+        rest = rest[~dead]
+        seri = self.serious[rest]
+        tran_rate = np.array(prm.tran_rate)
+        tran = self.rng.random(rest.size) < tran_rate[seri]
+        self.serious[rest[tran]] += 1
+        tran_cnt = np.bincount(seri[tran], minlength=4)
+        self.transit(GRP_I_N, GRP_I_L, int(tran_cnt[CODE_N]))
+        self.transit(GRP_I_L, GRP_I_H, int(tran_cnt[CODE_L]))
+
+        #今回感染した人
+        self.stat[new_inf] = CODE_I
+        self.serious[new_inf] = CODE_N
+        self.i_history[new_inf] = now_cycle
+        self.transit(GRP_S, GRP_I_N, new_inf.size)
+
+    def infect(self, inf_idx):
+        """新規感染者の判定
+
+         感染者の周囲のセル（格子）にいる未感染者を探し、感染す
+         るかを判定する。未感染者ごとに、近くの感染者の人数kを
+         数え、確率 1-(1-感染確率)^k で１回だけ判定する
+         （Person.stat_renew()と同じ）。
+
+        Args:
+            inf_idx[](int):感染者の番号の配列
+        Returns:新たに感染する人の番号の配列(ndarray)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        field_size = prm.field_size
+        infection_r = prm.infection_r
+        sus_idx = np.flatnonzero(self.stat == CODE_S)
+        if 0 == sus_idx.size or infection_r <= 0:
+            return sus_idx[:0]
+
+        #セルの大きさはInfectionGridと同じ
+        #未感染者をセル順に並べ、感染者の周囲のセルにいる未感染者を探す
+        n = max(1, int(field_size // infection_r))
+        cell_w = field_size / n
+        sus_cells = (self.x[sus_idx] / cell_w).astype(np.int64) % n * n + (self.y[sus_idx] / cell_w).astype(np.int64) % n
+        order = np.argsort(sus_cells, kind="stable")
+        sus_sorted = sus_idx[order]
+        sus_cells = sus_cells[order]
+        inf_cx = (self.x[inf_idx] / cell_w).astype(np.int64) % n
+        inf_cy = (self.y[inf_idx] / cell_w).astype(np.int64) % n
+
+        #周囲８セル（セル数が少ない場合は重複を除く）
+        offsets = {(dx % n, dy % n) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        near_list = []
+        for dx, dy in offsets:
+            ncell = ((inf_cx + dx) % n)*n + (inf_cy + dy) % n
+            lo = np.searchsorted(sus_cells, ncell, "left")
+            cnt = np.searchsorted(sus_cells, ncell, "right") - lo
+            total = int(cnt.sum())
+            if 0 == total:
+                continue
+            #(未感染者,感染者)のペアを展開
+            pair_i = np.repeat(inf_idx, cnt)
+            pair_s = sus_sorted[np.arange(total) + np.repeat(lo - (np.cumsum(cnt) - cnt), cnt)]
+            d2 = (self.x[pair_s] - self.x[pair_i])**2 + (self.y[pair_s] - self.y[pair_i])**2
+            near_list.append(pair_s[prm.infection_r2 > d2])
+        if 0 == len(near_list):
+            return sus_idx[:0]
+        #未感染者ごとの、近くの感染者の人数(k)
+        near_s, k = np.unique(np.concatenate(near_list), return_counts=True)
+        if 0 == near_s.size:
+            return near_s
+        #１人１回、確率 1-(1-感染確率)^k で判定（表を引く）
+        prm.infection_p(int(k.max()))
+        lut = np.array(prm.infection_lut)
+        return near_s[self.rng.random(near_s.size) < lut[k]]
+
+    def transit(self, fr, to, n=1, idx=None):
+        """状態の変化（人数の更新）
+
+         状態が変わった人の分だけ、人数を更新する
+         ※PersonEngine.transit()と同じ
+
+        Args:
+            fr(int):変化前のグループ番号(GRP_S〜GRP_D)
+            to(int):変化後のグループ番号(GRP_S〜GRP_D)
+            n(int,optional):人数(デフォルト1)
+            idx(int,optional):未使用（PersonEngineと同じ引数）
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.counts[fr] -= n
+        self.counts[to] += n
+        if GRP_I_N <= to <= GRP_I_H:
+            self.seri_counts[to] += n
+            if GRP_I_N <= fr <= GRP_I_H:
+                self.seri_counts[fr] -= n
+
+    def transit_seri(self, seri, to):
+        """感染者の状態の変化（重篤度別に人数を更新）
+
+         免疫保持・死亡した感染者の人数を、変化前の重篤度別に
+         数えて更新する
+
+        Args:
+            seri[](int8):状態が変わった人の重篤度の配列
+            to(int):変化後のグループ番号(GRP_R or GRP_D)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        seri_cnt = np.bincount(seri, minlength=4)
+        #感染者のグループ番号(GRP_I_N〜GRP_I_H)と重篤度コードは同じ値
+        for code in (CODE_N, CODE_L, CODE_H):
+            self.transit(code, to, int(seri_cnt[code]))
+
+    def count(self):
+        """人数カウント
+
+         ステータス（重篤度）別の人数を返す
+
+        Args:なし
+        Returns:
+            人数のリスト[s,i_n,i_l,i_h,r,d](int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            全員を数え直さずに、transit()で更新している人数を返す
+        """
+        return list(self.counts)
+
+    def movesum(self):
+        """移動距離の合計
+
+         今回サイクルで全員が移動した距離の合計を求める
+         （経済活動の計算用）
+
+        Args:なし
+        Returns:移動距離の合計(float)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return float(self.r.sum())
+
+    def final_counts(self):
+        """結果サマリ用の人数カウント
+
+         未感染者・免疫保持者・死亡者の人数と、重篤度別の発生人
+         数（最後の重篤度で数える）を数える
+
+        Args:なし
+        Returns:
+            人数のタプル(s,r,d,i_n,i_l,i_h)(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return (self.counts[GRP_S], self.counts[GRP_R], self.counts[GRP_D],  \
+            self.seri_counts[CODE_N], self.seri_counts[CODE_L], self.seri_counts[CODE_H])
+
+    def drawdata(self):
+        """描画用データの取得
+
+         全員の位置とグループ番号を返す（CanvasRendererで使用）
+
+        Args:なし
+        Returns:
+            (x座標の配列, y座標の配列, グループ番号の配列)(ndarray)
+            ※シミュレーション空間の座標
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            配列はコピー（シミュレーションスレッドが次のサイクルを
+            実行しても変わらない）。リストにしないのは、大人数の場
+            合に、RasterRendererが変換せずに使えるようにするため
+        """
+        return self.x.copy(), self.y.copy(), self.group()
+
+    def frame(self):
+        """軌跡記録用データの取得
+
+         全員の位置・ステータスコード・重篤度コードを返す
+         （TrajRecorderで使用）
+
+        Args:なし
+        Returns:
+            (x座標, y座標, ステータスコード, 重篤度コード)の配列
+            (ndarray)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            コピーせずに、エンジンの配列をそのまま返す（次の移動
+            までに使うこと）
+        """
+        return self.x, self.y, self.stat, self.serious
+
+    def getstate(self):
+        """状態の取得（チェックポイント用）
+
+         エンジンの状態（全員の配列・人数・乱数の状態）を返す
+
+        Args:なし
+        Returns:
+            (状態の辞書(jsonに変換できる値), 配列の辞書(ndarray))
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        arrays = {key: getattr(self, key) for key in ARRAY_STATE_KEYS}
+        state = {"counts": self.counts, "seri_counts": self.seri_counts,   \
+            "rng": self.rng.bit_generator.state}
+        return state, arrays
+
+    def setstate(self, prm, seed, state, arrays):
+        """状態の復元（チェックポイント用）
+
+         getstate()で取得した状態から、エンジンを復元する
+         (コンストラクタの代わりに呼び出す)
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seed(int):乱数シード
+            state(dic):状態の辞書(getstate()の結果)
+            arrays(dic):配列の辞書(getstate()の結果。memoryviewでも可)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            配列は、チェックポイントファイルをメモリマップしたま
+            ま使う（コピーしない。書き換えた部分だけがメモリに
+            コピーされる）ため、大人数でもすぐに復元できる
+        """
+        self.prm = prm
+        self.rng = np.random.default_rng(seed)
+        self.rng.bit_generator.state = state["rng"]
+        for key in ARRAY_STATE_KEYS:
+            mv = memoryview(arrays[key])
+            setattr(self, key, np.frombuffer(mv, dtype=mv.format))
+        self.count_all = self.x.size
+        self.group_lut = np.array(GROUP_LUT, dtype=np.int8)
+        self.counts = list(state["counts"])
+        self.seri_counts = list(state["seri_counts"])
+
+class BatchEngine():
+    """BatchEngine【レプリカ一括実行エンジンクラス】
+
+        同じパラメータのシミュレーション（レプリカ）を、複数まと
+        めて実行するエンジンです。対象者の状態を、レプリカ×人数の
+        ２次元の配列で保持し、全レプリカの移動・感染判定を、１回
+        の配列演算で行います。人数が少ない（デフォルトの200人程度
+        の）シミュレーションを、多数回実行する場合（アンサンブル
+        実行）に使用します。NumPyがインストールされていない場合は
+        使用できません。
+        モデル・感染判定の方法はArrayEngineと同じです（感染判定は
+        サイクルの開始時点の状態でまとめて行う）。終了したレプリカ
+        は、配列から取り除きます（以降は移動・判定しない）。
+        乱数生成器は全レプリカで１つのため、レプリカ毎の結果は、
+        同じシードで１つずつ実行した場合とは一致しません（統計的に
+        は一致します）。
+
+    Attributes:
+        count_all(int):１レプリカの人数
+        rep[](int):行毎のレプリカ番号（終了したレプリカの行は取り除く）
+        x[][](float):x座標（シミュレーション空間）
+        y[][](float):y座標（シミュレーション空間）
+        degree[][](float):進行方向(角度)
+        stat[][](int8):感染状態（CODE_S/CODE_I/CODE_R/CODE_D）
+        serious[][](int8):重篤度（CODE_NON/CODE_N/CODE_L/CODE_H）
+        r[][](float):移動距離（今回サイクル）
+        i_history[][](int32):感染時のサイクル
+                ※配列は、すべて(レプリカ数,人数)の２次元
+        group_lut[](int8):グループ番号への変換表(GROUP_LUT)
+        prm(PrmSnap):パラメータ
+        rng(numpy.random.Generator):乱数生成器
+                ※全レプリカのシードから作る
+    """
+    def __init__(self, prm, seeds):
+        """コンストラクタ
+
+         初期パラメータに従って、全レプリカの対象者の配列を生成する
+
+        Args:
+            prm(PrmSnap):パラメータ
+            seeds[](int):レプリカ毎の乱数シード
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.prm = prm
+        self.rng = np.random.default_rng(list(seeds))
+        field_size = prm.field_size
+        cnts = [prm.s_persons_count, prm.i_persons_count, \
+            prm.r_persons_count, prm.d_persons_count]
+        self.count_all = sum(cnts)
+        shape = (len(seeds), self.count_all)
+
+        self.rep = np.arange(len(seeds))
+        self.x = self.rng.uniform(0, field_size, shape)
+        self.y = self.rng.uniform(0, field_size, shape)
+        self.degree = self.rng.integers(0, 361, shape).astype(np.float64)
+        #並び順はPersonEngineと同じ（S→I→R→D）
+        stat = np.repeat(np.array([CODE_S, CODE_I, CODE_R, CODE_D], dtype=np.int8), cnts)
+        self.stat = np.tile(stat, (shape[0], 1))
+        self.serious = np.where(self.stat == CODE_I, CODE_N, CODE_NON).astype(np.int8)
+        self.r = np.zeros(shape)
+        self.i_history = np.zeros(shape, dtype=np.int32)
+        self.group_lut = np.array(GROUP_LUT, dtype=np.int8)
+
+    def group(self):
+        """グループ番号の取得
+
+         ステータスと重篤度から、sim_historyの人数の並び
+         (s,i_n,i_l,i_h,r,d)と同じ順のグループ番号(0〜5)を求める
+
+        Args:なし
+        Returns:グループ番号の配列(ndarray)(レプリカ数,人数)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.group_lut[self.stat*4 + self.serious]
+
+    def move(self):
+        """移動
+
+         全レプリカの全員をまとめて移動させる（ArrayEngine.move()
+         と同じモデル）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            移動しない人の分も乱数を引き、移動距離を0にする（人数
+            が少ない場合は、番号を集めるより速い）
+        """
+        prm = self.prm
+        field_size = prm.field_size
+        shape = self.x.shape
+        grp = self.group()
+        #グループ別の対象者移動制限率・距離移動制限率(死亡者は移動しない)
+        disable = np.array([prm.s_move_disable_rate, prm.i_n_move_disable_rate,   \
+            prm.i_l_move_disable_rate, prm.i_h_move_disable_rate,    \
+            prm.r_move_disable_rate, 1.0])
+        limit = np.array([prm.s_move_limit_rate, prm.i_n_move_limit_rate,   \
+            prm.i_l_move_limit_rate, prm.i_h_move_limit_rate,    \
+            prm.r_move_limit_rate, 1.0])
+
+        #対象者移動制限
+        moving = self.rng.random(shape) >= disable[grp]
+
+        #移動予定距離（r）・移動予定方向（Θ）をランダムに決める
+        #距離移動制限率で移動予定距離を補正する
+        r = self.rng.normal(prm.move_r, 4, shape)
+        r *= (1 - limit[grp])
+        r[~moving] = 0.0
+        turn = self.rng.normal(0, 50, shape)
+        turn[~moving] = 0.0
+        self.degree += turn
+        radian = np.radians(self.degree)
+
+        #壁にあたったら、反対側から出てくる
+        for pos, d in ((self.x, r*np.cos(radian)), (self.y, r*np.sin(radian))):
+            pos += d
+            pos[pos < 0] += field_size
+            pos[pos > field_size] -= field_size
+
+        self.r = r
+
+    def stat_renew(self, now_cycle):
+        """感染判定
+
+         全レプリカの感染判定を、まとめて行う
+         （ArrayEngine.stat_renew()と同じ）
+
+        Args:
+            now_cycle(int):現在サイクル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            判定は、配列を１次元に並べて（ravel()。コピーしない）
+            行う
+        """
+        prm = self.prm
+        stat = self.stat.ravel()
+        serious = self.serious.ravel()
+        i_history = self.i_history.ravel()
+        inf_idx = np.flatnonzero(stat == CODE_I)
+        if 0 == inf_idx.size:
+            return
+
+        #感染判定（判定開始時点の感染者が対象）
+        new_inf = self.infect(inf_idx)
+
+        #感染者の判定（今回感染した人は対象外）
+        #感染期間が、免疫獲得サイクルを越えていれば、免疫保持者
+        recover = prm.get_immunity_cycle < (now_cycle - i_history[inf_idx])
+        stat[inf_idx[recover]] = CODE_R
+
+        #死亡率により死亡判定
+        rest = inf_idx[~recover]
+        dead_rate = np.array(prm.dead_rate)
+        dead = self.rng.random(rest.size) < dead_rate[serious[rest]]
+        stat[rest[dead]] = CODE_D
+
+        #死ななかったら、次の症状にランダムに移行
+        rest = rest[~dead]
+        tran_rate = np.array(prm.tran_rate)
+        tran = self.rng.random(rest.size) < tran_rate[serious[rest]]
+        serious[rest[tran]] += 1
+
+        #今回感染した人
+        stat[new_inf] = CODE_I
+        serious[new_inf] = CODE_N
+        i_history[new_inf] = now_cycle
+
+    def infect(self, inf_idx):
+        """新規感染者の判定
+
+         ArrayEngine.infect()と同じ方法で、全レプリカの新規感染
+         者をまとめて判定する。セルの番号にレプリカの行の番号を含
+         めるため、別のレプリカの人とは近くにならない。
+
+        Args:
+            inf_idx[](int):感染者の番号(１次元に並べた位置)の配列
+        Returns:新たに感染する人の番号(１次元に並べた位置)の配列(ndarray)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        field_size = prm.field_size
+        infection_r = prm.infection_r
+        x = self.x.ravel()
+        y = self.y.ravel()
+        sus_idx = np.flatnonzero(self.stat.ravel() == CODE_S)
+        if 0 == sus_idx.size or infection_r <= 0:
+            return sus_idx[:0]
+
+        #セルの大きさはInfectionGridと同じ
+        #未感染者を(行,セル)順に並べ、感染者の周囲のセルにいる未感染者を探す
+        n = max(1, int(field_size // infection_r))
+        cell_w = field_size / n
+        sus_row = sus_idx // self.count_all
+        sus_cells = (sus_row*n + (x[sus_idx] / cell_w).astype(np.int64) % n) * n   \
+            + (y[sus_idx] / cell_w).astype(np.int64) % n
+        order = np.argsort(sus_cells, kind="stable")
+        sus_sorted = sus_idx[order]
+        sus_cells = sus_cells[order]
+        #セル数が少ない場合は、セル毎の人数と開始位置の表を作る（探さずに表を引く）
+        table = None
+        if n*n <= BATCH_CELL_RATE*self.count_all:
+            table = np.bincount(sus_cells, minlength=self.stat.shape[0]*n*n)
+            start = np.cumsum(table) - table
+        inf_row = inf_idx // self.count_all
+        inf_cx = (x[inf_idx] / cell_w).astype(np.int64) % n
+        inf_cy = (y[inf_idx] / cell_w).astype(np.int64) % n
+
+        #周囲８セル（セル数が少ない場合は重複を除く）
+        offsets = {(dx % n, dy % n) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        near_list = []
+        for dx, dy in offsets:
+            ncell = (inf_row*n + (inf_cx + dx) % n)*n + (inf_cy + dy) % n
+            if table is None:
+                lo = np.searchsorted(sus_cells, ncell, "left")
+                cnt = np.searchsorted(sus_cells, ncell, "right") - lo
+            else:
+                lo = start[ncell]
+                cnt = table[ncell]
+            total = int(cnt.sum())
+            if 0 == total:
+                continue
+            #(未感染者,感染者)のペアを展開
+            pair_i = np.repeat(inf_idx, cnt)
+            pair_s = sus_sorted[np.arange(total) + np.repeat(lo - (np.cumsum(cnt) - cnt), cnt)]
+            d2 = (x[pair_s] - x[pair_i])**2 + (y[pair_s] - y[pair_i])**2
+            near_list.append(pair_s[prm.infection_r2 > d2])
+        if 0 == len(near_list):
+            return sus_idx[:0]
+        #未感染者ごとの、近くの感染者の人数(k)
+        near_s, k = np.unique(np.concatenate(near_list), return_counts=True)
+        if 0 == near_s.size:
+            return near_s
+        #１人１回、確率 1-(1-感染確率)^k で判定（表を引く）
+        prm.infection_p(int(k.max()))
+        lut = np.array(prm.infection_lut)
+        return near_s[self.rng.random(near_s.size) < lut[k]]
+
+    def counts(self):
+        """人数カウント
+
+         レプリカ毎に、ステータス（重篤度）別の人数を数える
+
+        Args:なし
+        Returns:
+            人数の配列(ndarray)(レプリカ数,6)
+            ※列は[s,i_n,i_l,i_h,r,d]
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        rows = self.stat.shape[0]
+        key = self.group() + 6*np.arange(rows)[:, None]
+        return np.bincount(key.ravel(), minlength=rows*6).reshape(rows, 6)
+
+    def movesum(self):
+        """移動距離の合計
+
+         レプリカ毎に、今回サイクルで全員が移動した距離の合計を
+         求める（経済活動の計算用）
+
+        Args:なし
+        Returns:移動距離の合計の配列(ndarray)(レプリカ数)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.r.sum(axis=1)
+
+    def drop(self, keep):
+        """終了したレプリカの除去
+
+         終了したレプリカの行を、すべての配列から取り除く
+
+        Args:
+            keep[](bool):行毎の、残す(終了していない)かどうか
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        for key in ("rep", "x", "y", "degree", "stat", "serious", "r", "i_history"):
+            setattr(self, key, getattr(self, key)[keep])
+
+class CanvasRenderer():
+    """CanvasRenderer【シミュレーション画面描画クラス】
+
+        シミュレーション用キャンバスに、対象者を描画するクラスで
+        す。エンジン(PersonEngine/ArrayEngine)の、全員の位置とグ
+        ループ番号(drawdata()の結果)を受け取り、前回の描画から変わ
+        った人だけを描き直します。
+        ・色は、グループ（状態）が変わった人だけ変更する
+        ・位置は、表示上の位置(ドット)が変わった人だけ移動する
+          （死亡者や、移動しなかった人は何もしない）
+        ・図形は、タグではなく図形IDで指定する
+        また、１回の描画で呼び出す描画メソッドの回数に上限(budget)
+        を設けています。上限を超えた分は、次回以降に描画します（位
+        置は絶対座標で指定するため、遅れても正しい位置になります）。
+
+    Attributes:
+        canvas(Canvas):描画するキャンバス
+        rate(float):シミュレーション座標と表示キャンバスの比率
+        budget(int):１回の描画で呼び出す描画メソッドの上限
+        item_ids[](int):図形ID(エンジンの対象者の順)
+        groups[](int):描画済みのグループ番号
+        px[](int):描画済みのx座標(表示キャンバス)
+        py[](int):描画済みのy座標(表示キャンバス)
+        cursor(int):次回、移動を始める対象者の番号
+                ※上限で打ち切った場合に、続きから描画するため
+        calls(int):前回の描画で呼び出した描画メソッドの回数
+    """
+    def __init__(self, canvas, budget=RENDER_BUDGET):
+        """コンストラクタ
+
+         インスタンスの構築を行う
+
+        Args:
+            canvas(Canvas):描画するキャンバス
+            budget(int,optional):１回の描画で呼び出す描画メソッ
+                    ドの上限(デフォルトRENDER_BUDGET)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.canvas = canvas
+        self.budget = budget
+        self.rate = 1.0
+        self.clear(self.rate)
+
+    def clear(self, rate):
+        """描画済みの情報のクリア
+
+         描画済みの情報をクリアし、比率を設定する
+         (キャンバスの図形の削除は、呼び出し元で行う)
+
+        Args:
+            rate(float):シミュレーション座標と表示キャンバスの比率
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.rate = rate
+        self.item_ids = []
+        self.groups = []
+        self.px = []
+        self.py = []
+        self.cursor = 0
+        self.calls = 0
+
+    def refresh(self, data):
+        """全員の描画
+
+         全員の図形を作成する（初期描画）
+
+        Args:
+            data(tuple):描画用データ(エンジンのdrawdata()の結果)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        xs, ys, grps = data
+        canvas = self.canvas
+        self.clear(self.rate)
+        for x, y, g in zip(xs, ys, grps):
+            px = int(x*self.rate)
+            py = int(y*self.rate)
+            self.item_ids.append(canvas.create_oval(px, py, px+SIM_PERSONS_R, py+SIM_PERSONS_R, fill=GROUP_CLR[g]))
+            self.px.append(px)
+            self.py.append(py)
+        self.groups = list(grps)
+        self.calls = len(self.item_ids)
+
+    def drow(self, data):
+        """変わった人の描画
+
+         前回の描画から、グループまたは表示上の位置が変わった人
+         だけ描き直す。色の変更を先に行い、残りの回数で移動する。
+
+        Args:
+            data(tuple):描画用データ(エンジンのdrawdata()の結果)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            未描画の場合（人数が違う場合）は、全員を描画する
+        """
+        xs, ys, grps = data
+        count_all = len(grps)
+        if count_all != len(self.item_ids):
+            self.refresh(data)
+            return
+        canvas = self.canvas
+        rate = self.rate
+        budget = self.budget
+        item_ids = self.item_ids
+        groups = self.groups
+        px = self.px
+        py = self.py
+        calls = 0
+
+        #色の変更（状態が変わった人）
+        for i, g in enumerate(grps):
+            if g != groups[i]:
+                if calls >= budget:
+                    break
+                canvas.itemconfig(item_ids[i], fill=GROUP_CLR[g])
+                groups[i] = g
+                calls += 1
+
+        #移動（前回打ち切った人から）
+        i = self.cursor
+        for k in range(count_all):
+            x = int(xs[i]*rate)
+            y = int(ys[i]*rate)
+            if x != px[i] or y != py[i]:
+                if calls >= budget:
+                    break
+                canvas.coords(item_ids[i], x, y, x+SIM_PERSONS_R, y+SIM_PERSONS_R)
+                px[i] = x
+                py[i] = y
+                calls += 1
+            i += 1
+            if i == count_all:
+                i = 0
+        self.cursor = i
+        self.calls = calls
+
+class RasterRenderer():
+    """RasterRenderer【シミュレーション画面描画クラス(画像)】
+
+        シミュレーション用キャンバスに、全員を１枚の画像(Photo
+        Image)として描画するクラスです。人数が多い場合に、１人ず
+        つの図形(CanvasRenderer)の代わりに使用します。インター
+        フェース(clear/refresh/drow)は、CanvasRendererと同じです。
+        ・描画毎に、全画素の色を作成し、１回のput()で画像を更新す
+          る（図形の数・描画メソッドの回数は、人数によらず１つ）
+        ・人数が画素数以下の場合は、１人をRASTER_DOTの大きさの点
+          で描画する（重なった場合は、RASTER_PRIORITYの順位が上の
+          グループの色）
+        ・人数が画素数を超える場合は、画素毎の人数を濃さで表示す
+          る(ヒートマップ)。色は、その画素にいる人の、順位が一番
+          上のグループの色
+        色は、CanvasRendererと同じ色(GROUP_CLR)を使用します。
+        NumPyがある場合は、画素毎の人数・一番上のグループを、全員
+        分まとめて配列で求めます（無い場合は１人ずつ求めます）。
+
+    Attributes:
+        canvas(Canvas):描画するキャンバス
+        width(int):画像の幅
+        height(int):画像の高さ
+        rate(float):シミュレーション座標と表示キャンバスの比率
+        image(PhotoImage):描画する画像(未作成時はNone)
+        item_id(int):画像の図形ID
+        heatmap(bool):ヒートマップで描画しているか
+        colors[](str):グループ番号毎の色(#rrggbb)
+                (最後の要素は背景色)
+        shades[][](str):グループ番号毎の、濃さ(RASTER_LEVELS段
+                階)毎の色(#rrggbb)
+        calls(int):前回の描画で呼び出した描画メソッドの回数
+        np_pri(ndarray):グループ番号毎の順位(RASTER_PRIORITY)
+                ※NumPyがある場合のみ
+        np_top(ndarray):順位毎のグループ番号(順位0は背景(colorsの
+                最後の要素))　※NumPyがある場合のみ
+        np_colors(ndarray):colorsの配列　※NumPyがある場合のみ
+        np_shades(ndarray):shadesを１列に並べ、最後に背景色を加え
+                た配列(グループ番号*RASTER_LEVELS+濃さの位置)
+                ※NumPyがある場合のみ
+    """
+    def __init__(self, canvas, width, height):
+        """コンストラクタ
+
+         インスタンスの構築を行う
+
+        Args:
+            canvas(Canvas):描画するキャンバス
+            width(int):画像の幅
+            height(int):画像の高さ
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.image = None
+        self.item_id = None
+        self.heatmap = False
+
+        #色名を#rrggbbに変換（画像の画素は、色名より速い）
+        rgbs = [[v >> 8 for v in canvas.winfo_rgb(clr)] for clr in GROUP_CLR]
+        back = [v >> 8 for v in canvas.winfo_rgb(CANVAS_BACK_CLR)]
+        self.colors = ["#%02x%02x%02x" % tuple(rgb) for rgb in rgbs + [back]]
+        self.shades = []
+        for rgb in rgbs:
+            shade = []
+            for lv in range(1, RASTER_LEVELS+1):
+                shade.append("#%02x%02x%02x" % tuple(b + (c-b)*lv//RASTER_LEVELS for c, b in zip(rgb, back)))
+            self.shades.append(shade)
+        if import_np():
+            self.np_pri = np.array(RASTER_PRIORITY, dtype=np.int8)
+            self.np_top = np.zeros(len(RASTER_PRIORITY), dtype=np.intp)
+            for g, pri in enumerate(RASTER_PRIORITY):
+                self.np_top[pri] = g
+            self.np_colors = np.array(self.colors)
+            self.np_shades = np.array([clr for shade in self.shades for clr in shade] + [self.colors[-1]])
+        self.rate = 1.0
+        self.clear(self.rate)
+
+    def clear(self, rate):
+        """描画済みの情報のクリア
+
+         描画済みの情報をクリアし、比率を設定する
+         (キャンバスの図形の削除は、呼び出し元で行う)
+
+        Args:
+            rate(float):シミュレーション座標と表示キャンバスの比率
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.rate = rate
+        self.item_id = None
+        self.calls = 0
+
+    def refresh(self, data):
+        """全員の描画
+
+         画像を作成し、全員を描画する（初期描画）
+
+        Args:
+            data(tuple):描画用データ(エンジンのdrawdata()の結果)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.image = tkinter.PhotoImage(width=self.width, height=self.height)
+        self.item_id = self.canvas.create_image(0, 0, image=self.image, anchor=tkinter.NW)
+        self.drow(data)
+
+    def drow(self, data):
+        """全員の描画
+
+         全員を描画した画素を作成し、画像を更新する
+
+        Args:
+            data(tuple):描画用データ(エンジンのdrawdata()の結果)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            未描画の場合は、画像を作成する
+        """
+        if self.item_id is None:
+            self.refresh(data)
+            return
+        xs, ys, grps = data
+        width = self.width
+        height = self.height
+        rate = self.rate
+        pri = RASTER_PRIORITY
+        self.heatmap = len(grps) > width*height
+        if np is not None:
+            pixels = self.nppixels(xs, ys, grps)
+            self.put(pixels)
+            return
+
+        #画素毎の、一番上のグループ番号(-1は背景)
+        top = [-1] * (width*height)
+        if self.heatmap:
+            #ヒートマップ（画素毎の人数を数える）
+            cnt = [0] * (width*height)
+            for x, y, g in zip(xs, ys, grps):
+                px = min(int(x*rate), width-1)
+                py = min(int(y*rate), height-1)
+                p = py*width + px
+                cnt[p] += 1
+                if pri[g] > pri[top[p]]:
+                    top[p] = g
+            #濃さは、人数の平方根で段階に分ける（最も多い画素が最も濃い）
+            scale = RASTER_LEVELS / math.sqrt(max(cnt))
+            shades = self.shades
+            back = self.colors[-1]
+            pixels = [shades[g][min(int(math.sqrt(c)*scale), RASTER_LEVELS-1)] if c else back  \
+                for g, c in zip(top, cnt)]
+        else:
+            #点（RASTER_DOTの大きさ）
+            dot = RASTER_DOT
+            for x, y, g in zip(xs, ys, grps):
+                px = min(int(x*rate), width-dot)
+                py = min(int(y*rate), height-dot)
+                pg = pri[g]
+                for dy in range(dot):
+                    p = (py+dy)*width + px
+                    for q in range(p, p+dot):
+                        if pg > pri[top[q]]:
+                            top[q] = g
+            colors = self.colors
+            pixels = [colors[g] for g in top]
+        self.put(pixels)
+
+    def nppixels(self, xs, ys, grps):
+        """全画素の色の作成(NumPy)
+
+         drow()と同じ色を、全員分まとめて配列で求める
+
+        Args:
+            xs[](float):x座標
+            ys[](float):y座標
+            grps[](int):グループ番号
+        Returns:全画素の色(#rrggbb)のリスト(行の順)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            重なった場合の色は、RASTER_PRIORITYの順位の最大値
+            (np.maximum.at)で決める（順位0は背景）
+        """
+        width = self.width
+        height = self.height
+        size = width*height
+        xs = np.asarray(xs, dtype=np.float64)*self.rate
+        ys = np.asarray(ys, dtype=np.float64)*self.rate
+        pri = self.np_pri[np.asarray(grps, dtype=np.intp)]
+        best = np.zeros(size, dtype=np.int8)
+        if self.heatmap:
+            #ヒートマップ（画素毎の人数と、一番上の順位）
+            pix = np.minimum(ys.astype(np.intp), height-1)*width + np.minimum(xs.astype(np.intp), width-1)
+            cnt = np.bincount(pix, minlength=size)
+            np.maximum.at(best, pix, pri)
+            #濃さは、人数の平方根で段階に分ける（最も多い画素が最も濃い）
+            scale = RASTER_LEVELS / math.sqrt(int(cnt.max()))
+            level = np.minimum((np.sqrt(cnt)*scale).astype(np.intp), RASTER_LEVELS-1)
+            idx = self.np_top[best]*RASTER_LEVELS + level
+            idx[cnt == 0] = len(self.np_shades)-1
+            return self.np_shades[idx].tolist()
+        #点（RASTER_DOTの大きさ。左上の画素から、縦横にRASTER_DOTずつ）
+        dot = RASTER_DOT
+        base = np.minimum(ys.astype(np.intp), height-dot)*width + np.minimum(xs.astype(np.intp), width-dot)
+        for dy in range(dot):
+            for dx in range(dot):
+                np.maximum.at(best, base + (dy*width + dx), pri)
+        return self.np_colors[self.np_top[best]].tolist()
+
+    def put(self, pixels):
+        """画像の更新
+
+         全画素の色で、１回のput()で画像全体を更新する
+
+        Args:
+            pixels[](str):全画素の色(#rrggbb)のリスト(行の順)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        width = self.width
+        height = self.height
+        #１回のput()で画像全体を更新する（行毎に{色 色 ...}）
+        rows = []
+        for r in range(0, width*height, width):
+            rows.append("{" + " ".join(pixels[r:r+width]) + "}")
+        self.image.put(" ".join(rows), to=(0, 0))
+        self.calls = 1
+
+class HistoryGraph():
+    """HistoryGraph【履歴グラフ描画クラス】
+
+        グラフ表示用キャンバスに、シミュレーションの履歴グラフ（人
+        数の積み上げグラフと経済活動の折れ線）を描画するクラスで
+        す。サイクル毎に、最新のサイクルの列だけを追加で描画します
+        （全体を描き直さない）。
+        横軸は、横幅にspanサイクル分を表示し、サイクルがspanを越
+        えた時だけ、spanを２倍にして全体を描き直します。
+        複数のサイクルが同じ列(ドット)になる場合は、列の中の最大
+        値・最小値で描画します（間引き）。積み上げグラフは各境界の
+        最大値（短いピークが消えないように）、経済活動は最小値〜最
+        大値の縦線で描きます。そのため、１サイクルあたりの描画量は、
+        サイクル数によらず一定です。
+        全体の描き直し用に、サイクルをstepサイクル毎にまとめた集計
+        (バケツ)を、横幅×GRAPH_BUCKET_RATE個まで保持します（越え
+        たら隣同士をまとめて、stepを２倍にします）。シミュレーショ
+        ン履歴の全体は参照しません。
+
+    Attributes:
+        canvas(Canvas):描画するキャンバス
+        width(int):キャンバスの幅
+        height(int):キャンバスの高さ
+        total(int):人数(縦軸の最大値)
+        span(int):横幅に表示するサイクル数
+        col_x(int):描画中の列のx座標(開始)(未描画時はNone)
+        col_x1(int):描画中の列のx座標(終了)
+        col_max[](float):描画中の列の、積み上げ人数(境界)の最大値
+                (D,R,S,I_n,I_l,I_hの順)
+        eco_first(float):描画中の列の、最初の経済活動(%)
+        eco_min(float):描画中の列の、経済活動(%)の最小値
+        eco_max(float):描画中の列の、経済活動(%)の最大値
+        eco_last(float):描画中の列の、最後の経済活動(%)
+        prev_eco[x,y](float,float):前の列の経済活動の点(座標)
+        col_drawn(bool):描画中の列を描画済みか
+        rows(int):描画済みのサイクル数
+        buckets[][]:描き直し用の集計(バケツ)のリスト
+                [最初のサイクル, 最後のサイクル, 積み上げ人数(境界)
+                の最大値[], 最初・最小・最大・最後の経済活動(%)]
+        step(int):１つのバケツにまとめるサイクル数(２のべき乗)
+    """
+    def __init__(self, canvas, width, height):
+        """コンストラクタ
+
+         インスタンスの構築を行う
+
+        Args:
+            canvas(Canvas):描画するキャンバス
+            width(int):キャンバスの幅
+            height(int):キャンバスの高さ
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.total = 1
+        self.span = GRAPH_SPAN_MIN
+        self.buckets = []
+        self.step = 1
+        self.reset()
+
+    def reset(self):
+        """描画中の列のクリア
+
+         描画中の列の情報をクリアする
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.col_x = None
+        self.col_x1 = 0
+        self.col_max = [0,0,0,0,0,0]
+        self.eco_first = 0.0
+        self.eco_min = 0.0
+        self.eco_max = 0.0
+        self.eco_last = 0.0
+        self.prev_eco = None
+        self.col_drawn = False
+        self.rows = 0
+
+    def clear(self, total):
+        """グラフのクリア
+
+         グラフを消去し、縦軸の最大値を設定する
+
+        Args:
+            total(int):人数(縦軸の最大値)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.total = total
+        self.span = GRAPH_SPAN_MIN
+        self.buckets = []
+        self.step = 1
+        self.canvas.delete("all")
+        self.canvas.create_rectangle(0,0,self.width,self.height,fill=CANVAS_BACK_CLR)
+        self.reset()
+
+    def append(self, histories, end):
+        """最新サイクルまでの描画
+
+         シミュレーション履歴の、まだ描画していないサイクルから
+         endまでを、グラフに追加する。横軸が足りない場合は、横軸
+         を縮めて全体を描き直す。
+
+        Args:
+            histories(HistBuffer):シミュレーション履歴
+            end(int):描画するサイクル数(historiesの先頭からの件数)
+                ※historiesは、シミュレーションスレッドが追加中の
+                ため、endより後は見ない
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            履歴から捨てられた（リングバッファから溢れた）サイクル
+            は描画しない
+        """
+        if end <= self.rows:
+            return
+        cols = [self.tobucket(histories[i]) for i in range(max(self.rows, histories.first), end)]
+        for col in cols:
+            self.collect(list(col))
+        self.rows = end
+        if 0 == len(cols):
+            return
+        cycle = cols[-1][1]
+        if cycle >= self.span:
+            while cycle >= self.span:
+                self.span *= 2
+            self.redraw()
+        else:
+            for col in cols[:-1]:
+                self.addcol(col, draw=False)
+            self.addcol(cols[-1], draw=True)
+
+    def redraw(self):
+        """全体の描き直し
+
+         保持している集計(バケツ)から、全体を描き直す（列毎に１回
+         だけ描画する）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        rows = self.rows
+        self.canvas.delete("all")
+        self.canvas.create_rectangle(0,0,self.width,self.height,fill=CANVAS_BACK_CLR)
+        self.reset()
+        for bucket in self.buckets:
+            self.addcol(bucket, draw=False)
+        if self.col_x is not None:
+            self.drawcol()
+        self.rows = rows
+
+    @staticmethod
+    def tobucket(row):
+        """１サイクル分の集計
+
+         １サイクル分の履歴を、集計(バケツ)の形にする
+
+        Args:
+            row(sim_history):１サイクル分の履歴
+        Returns:集計(バケツ) ※bucketsを参照
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #積み上げ人数(境界) D→R→S→I(n→l→h)
+        bounds = [sum(row[1:7]), sum(row[1:6]), sum(row[1:5]), sum(row[2:5]), sum(row[3:5]), row[4]]
+        eco = row[8]
+        return [row[0], row[0], bounds, eco, eco, eco, eco]
+
+    @staticmethod
+    def merge(bucket, other):
+        """集計の併合
+
+         集計(バケツ)に、後ろの集計を加える
+
+        Args:
+            bucket(list):加えられる集計(バケツ)
+            other(list):後ろの集計(バケツ)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        bucket[1] = other[1]
+        bucket[2] = [max(a, b) for a, b in zip(bucket[2], other[2])]
+        bucket[4] = min(bucket[4], other[4])
+        bucket[5] = max(bucket[5], other[5])
+        bucket[6] = other[6]
+
+    def collect(self, col):
+        """描き直し用の集計
+
+         １サイクル分の集計を、描き直し用の集計(バケツ)に加える。
+         バケツの数が上限を越えたら、隣同士をまとめる
+
+        Args:
+            col(list):１サイクル分の集計(バケツ)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.buckets and self.buckets[-1][0]//self.step == col[0]//self.step:
+            self.merge(self.buckets[-1], col)
+        else:
+            self.buckets.append(col)
+        if len(self.buckets) > self.width*GRAPH_BUCKET_RATE:
+            self.step *= 2
+            buckets = []
+            for bucket in self.buckets:
+                if buckets and buckets[-1][0]//self.step == bucket[0]//self.step:
+                    self.merge(buckets[-1], bucket)
+                else:
+                    buckets.append(bucket)
+            self.buckets = buckets
+
+    def addcol(self, col, draw):
+        """集計の追加
+
+         集計(１サイクル分、またはバケツ)を、該当する列に加える。
+         別の列になった場合は、前の列を確定する。
+
+        Args:
+            col(list):集計(バケツ) ※bucketsを参照
+            draw(bool):
+                True:追加した列をすぐに描画する
+                False:列が確定した時に描画する(全体の描き直し用)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            バケツが２つの列にまたがる場合は、最初のサイクルの列
+            に加える
+        """
+        first_cycle, last_cycle, bounds, eco_first, eco_min, eco_max, eco_last = col
+        x0 = int(first_cycle*self.width/self.span)
+        x1 = int((last_cycle+1)*self.width/self.span)
+
+        if x0 != self.col_x:
+            #前の列を確定
+            if self.col_x is not None:
+                if not self.col_drawn:
+                    self.drawcol()
+                self.prev_eco = [self.col_x, self.ecoy(self.eco_last)]
+            self.col_x = x0
+            self.col_max = list(bounds)
+            self.eco_first = eco_first
+            self.eco_min = eco_min
+            self.eco_max = eco_max
+            self.col_drawn = False
+        else:
+            self.col_max = [max(a, b) for a, b in zip(self.col_max, bounds)]
+            self.eco_min = min(self.eco_min, eco_min)
+            self.eco_max = max(self.eco_max, eco_max)
+        self.col_x1 = max(x0+1, x1)
+        self.eco_last = eco_last
+
+        if draw:
+            self.drawcol()
+
+    def ecoy(self, eco):
+        """経済活動(%)のy座標
+
+        Args:
+            eco(float):経済活動(%)
+        Returns:y座標(float)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.height - eco*self.height/100
+
+    def drawcol(self):
+        """列の描画
+
+         描画中の列を描画する（描画済みの場合は、その列の図形を消
+         して描き直す）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        canvas = self.canvas
+        tag = "c{}".format(self.col_x)
+        if self.col_drawn:
+            canvas.delete(tag)
+        y_exp_rate = self.height/self.total
+
+        #積み上げグラフ（上の方から重ねていく）
+        for bound, color in zip(self.col_max, GRAPH_LAYER_CLR):
+            canvas.create_rectangle(self.col_x, self.height-(bound*y_exp_rate), self.col_x1, self.height,   \
+                fill=color, outline="", tags=tag)
+
+        #経済活動（前の列の点から、最初→最小→最大→最後の点）
+        pts = []
+        if self.prev_eco is not None:
+            pts += self.prev_eco
+        else:
+            pts += [self.col_x, self.ecoy(self.eco_first)]
+        for eco in (self.eco_first, self.eco_min, self.eco_max, self.eco_last):
+            pts += [self.col_x, self.ecoy(eco)]
+        canvas.create_line(pts, fill=PERSON_ECO_CLR, width=2, tags=(tag, "eco"))
+        canvas.tag_raise("eco")
+        self.col_drawn = True
+
+class Prm_entry():
+    """Prm_entry【パラメータ入力クラス】
+
+        パラメータ入力用wedgitを構築します。
+        項目名を示すラベル(label)と入力域(entry)をセットで構築
+        します。(項目名：左側、入力域：右側)
+        データの入出力は、パラメータとして渡されるUserPrmクラス
+        内の、StiringVarクラス(Tkinter)を介して行われます。
+        入力なし（データ表示のみ）の場合は、入力域(entry)のかわ
+        りにラベル(label)を使ってデータを表示します。
+
+    Attributes:
+        parent(Frame):wedgitを配置する親フレーム
+        row(int):配置する行数
+        userprm(UserPrm):データ格納用クラス
+        lb(Label):項目表示用のラベル(label)wedgit
+        entry(Entory or Label):データ入力域wedgit
+                ※入力なし（データ表示のみ）の場合は、ラベルwedgit
+    """
+    def __init__(self, parent, row, userprm):
+        """コンストラクタ
+        
+         インスタンスの構築を行う
+
+        Args:
+            parent(Frame):wedgitを配置する親フレーム
+            row(int):配置する行数
+            userprm(UserPrm):データ格納用クラス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.parent = parent    #wedgitを配置する親
+        self.row = row    #配置する行数
+        self.userprm=userprm
+        self.lb = tkinter.Label(self.parent, text=self.userprm.gettitle(), anchor=tkinter.W, font=("", PRM_FONT_SIZE))
+        self.lb.grid(row=self.row, column=0, columnspan=1,sticky=tkinter.W + tkinter.E)
+
+        if self.userprm.getuitype() == MAKE_ENTRY:
+            self.entry = tkinter.Entry(self.parent, textvariable=self.userprm.makesv(),  \
+                width=TXT_ENTRY_W, justify=tkinter.RIGHT,   \
+                validate = 'key', validatecommand = self.userprm.vcmd(self.parent),   \
+                font=("", PRM_FONT_SIZE))
+            self.entry.grid(row=self.row, column=1, columnspan=1,sticky=tkinter.W + tkinter.E)
+        else:       #MAKE_LABEL
+            self.entry = tkinter.Label(self.parent, textvariable=self.userprm.makesv(), anchor=tkinter.E, font=("", PRM_FONT_SIZE))
+            self.entry.grid(row=self.row, column=1, columnspan=1,sticky=tkinter.W + tkinter.E)
+
+class ResultSummry():
+    """ResultSummry【サマリ表示ウインドウクラス】
+
+        サマリ表示ウインドウを構築します。
+        独立したウインドウとして構築し、複数行テキスト入力
+        域(text)に、渡された文字列（複数行）を表示します。
+        複数行テキスト入力域では編集が可能ですが、保存はできません。
+
+    Attributes:
+        frame_smry(Frame):外側のフレーム。
+        textbox(Text):サマリデータ表示用複数行テキスト入力域
+        button(Button):「閉じる」ボタン
+    """
+    def __init__(self,sectences):
+        """コンストラクタ
+        
+         サマリ表示ウインドウの構築を行う
+
+        Args:
+            sectences(str[]):
+                    表示する文字列のリスト(文字列末尾に"\n"を自動付加)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        master=tkinter.Toplevel()
+        master.geometry(RESULT_GIO)
+        master.title("シミュレーション結果サマリ")
+        
+        #フレーム（外側）を作成
+        self.frame_smry = tkinter.Frame(master)
+        self.frame_smry.pack()
+        self.textbox = tkinter.Text(self.frame_smry, height=len(sectences))
+        self.textbox.pack()
+        self.button = tkinter.Button(self.frame_smry,text="閉じる",command=master.destroy)
+        self.button.pack()
+        
+        i=1
+        for strline in sectences:
+            self.textbox.insert(str(i)+".0",strline+"\n")
+            i += 1
+
+class HelpWindow():
+    """HelpWindow【ヘルプウインドウクラス】
+
+        ヘルプウインドウを構築します。
+        ヘルプの内容は、本ソースのDocString(__dic__)です。
+
+    Attributes:
+        frame_help(Frame):外側のフレーム。
+        textbox(ScrolledText):
+                ヘルプ用スクロールバー付複数行テキスト入力域
+        button(Button):「閉じる」ボタン
+    """
+    def __init__(self):
+        """コンストラクタ
+        
+         ヘルプウインドウの構築を行う
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        master=tkinter.Toplevel()
+        master.geometry(HELP_GIO)
+        master.title("ヘルプ")
+        
+        #フレーム（外側）を作成
+        self.frame_help = tkinter.Frame(master)
+        self.frame_help.pack()
+        self.button = tkinter.Button(self.frame_help,text="閉じる",command=master.destroy)
+        self.button.grid(row=0,column=0,sticky=tkinter.W)
+
+        self.textbox = tkinter.scrolledtext.ScrolledText(self.frame_help,width=HELP_WIDTH)
+        self.textbox.grid(row=1,column=0,sticky=tkinter.W + tkinter.E)
+
+        self.textbox.insert("1.0",__doc__)
+        self.textbox.insert(tkinter.END,"\n□□□ 以下クラス説明 □□□\n")
+        self.textbox.insert(tkinter.END,MainApp.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Simulation.__doc__+"\n")
+        self.textbox.insert(tkinter.END,CycleRecord.__doc__+"\n")
+        self.textbox.insert(tkinter.END,BatchSimulation.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Ensemble.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Sweep.__doc__+"\n")
+        self.textbox.insert(tkinter.END,RunStore.__doc__+"\n")
+        self.textbox.insert(tkinter.END,ResultCache.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Fork.__doc__+"\n")
+        self.textbox.insert(tkinter.END,ForkWindow.__doc__+"\n")
+        self.textbox.insert(tkinter.END,ReplayWindow.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Person.__doc__+"\n")
+        self.textbox.insert(tkinter.END,SimRandom.__doc__+"\n")
+        self.textbox.insert(tkinter.END,InfectionGrid.__doc__+"\n")
+        self.textbox.insert(tkinter.END,PersonEngine.__doc__+"\n")
+        self.textbox.insert(tkinter.END,EventEngine.__doc__+"\n")
+        self.textbox.insert(tkinter.END,ArrayEngine.__doc__+"\n")
+        self.textbox.insert(tkinter.END,BatchEngine.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Checkpoint.__doc__+"\n")
+        self.textbox.insert(tkinter.END,HistBuffer.__doc__+"\n")
+        self.textbox.insert(tkinter.END,HistSink.__doc__+"\n")
+        self.textbox.insert(tkinter.END,TrajRecorder.__doc__+"\n")
+        self.textbox.insert(tkinter.END,TrajReader.__doc__+"\n")
+        self.textbox.insert(tkinter.END,CanvasRenderer.__doc__+"\n")
+        self.textbox.insert(tkinter.END,RasterRenderer.__doc__+"\n")
+        self.textbox.insert(tkinter.END,HistoryGraph.__doc__+"\n")
+        self.textbox.insert(tkinter.END,UserPrm.__doc__+"\n")
+        self.textbox.insert(tkinter.END,UsrPrms.__doc__+"\n")
+        self.textbox.insert(tkinter.END,PrmSnap.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Prm_entry.__doc__+"\n")
+        self.textbox.insert(tkinter.END,Total4dncty.__doc__+"\n")
+        self.textbox.insert(tkinter.END,FieldSize.__doc__+"\n")
+        self.textbox.insert(tkinter.END,ResultSummry.__doc__+"\n")
+        self.textbox.insert(tkinter.END,HelpWindow.__doc__+"\n")
+        self.textbox.insert(tkinter.END,TimeRec.__doc__+"\n")
+        self.textbox.insert(tkinter.END,StopWatch.__doc__+"\n")
+        
+class Checkpoint():
+    """Checkpoint【チェックポイントファイルクラス】
+
+        シミュレーションの途中の状態（チェックポイント）を、バイ
+        ナリファイルに読み書きするクラスです（インスタンスは作ら
+        ず、静的メソッドだけを持ちます）。
+        ファイルは、以下の形式です。
+        ・先頭：CHECKPOINT_MAGIC(8バイト)、版数・ヘッダの長さ
+          (4バイト×2、リトルエンディアン)
+        ・ヘッダ：状態の辞書と、配列の一覧（型・個数・位置）(json)
+        ・配列：各配列の中身をそのまま並べたもの（開始位置は
+          CHECKPOINT_ALIGNの境界）
+        読込みは、ファイルをメモリマップ(コピーオンライト)し、配
+        列はコピーせずにmemoryviewで返します（読込みは、人数によ
+        らずすぐに終わります）。書込みは、一時ファイルに書いてか
+        ら置き換えるため、書込み中にプロセスが終了しても、前回の
+        チェックポイントは壊れません。
+
+    Attributes:なし
+    """
+    @staticmethod
+    def write(path, header, arrays):
+        """チェックポイントの書込み
+
+         状態の辞書と配列を、ファイルに書き込む
+
+        Args:
+            path(str):ファイルのパス
+            header(dic):状態の辞書(jsonに変換できる値)
+            arrays(dic):配列の辞書
+                key(str):配列の名前
+                value(array.array or ndarray):配列(１次元)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        table = {}
+        views = []
+        offset = 0
+        for name, a in arrays.items():
+            mv = memoryview(a)
+            table[name] = [mv.format, len(mv), offset]
+            views.append(mv.cast("B"))
+            offset += -(-mv.nbytes // CHECKPOINT_ALIGN) * CHECKPOINT_ALIGN
+        header = dict(header, arrays=table, byteorder=sys.byteorder)
+        hb = json.dumps(header).encode("utf-8")
+        head = CHECKPOINT_MAGIC + struct.pack("<II", CHECKPOINT_VERSION, len(hb)) + hb
+        head += bytes(-len(head) % CHECKPOINT_ALIGN)
+
+        tmp = path + ".tmp"
+        a = open(tmp, "wb")
+        a.write(head)
+        for mv in views:
+            a.write(mv)
+            a.write(bytes(-mv.nbytes % CHECKPOINT_ALIGN))
+        a.close()
+        os.replace(tmp, path)
+
+    @staticmethod
+    def read(path):
+        """チェックポイントの読込み
+
+         ファイルをメモリマップし、状態の辞書と配列を返す
+
+        Args:
+            path(str):ファイルのパス
+        Returns:
+            (状態の辞書, 配列の辞書)
+            ※配列は、メモリマップ上のmemoryview(書換え可能。書き
+            換えてもファイルは変わらない)
+        Raises:
+            ValueError:チェックポイントファイルではない・版数やバ
+                    イト順が違う
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        b = open(path, "rb")
+        mm = mmap.mmap(b.fileno(), 0, access=mmap.ACCESS_COPY)
+        b.close()
+        size = len(CHECKPOINT_MAGIC)
+        if mm[:size] != CHECKPOINT_MAGIC:
+            raise ValueError("チェックポイントファイルではありません: {}".format(path))
+        version, hlen = struct.unpack("<II", mm[size:size+8])
+        if version != CHECKPOINT_VERSION:
+            raise ValueError("チェックポイントファイルの版数が違います: {}".format(version))
+        header = json.loads(mm[size+8:size+8+hlen].decode("utf-8"))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("チェックポイントファイルのバイト順が違います: {}".format(header["byteorder"]))
+
+        base = size + 8 + hlen
+        base += -base % CHECKPOINT_ALIGN
+        whole = memoryview(mm)
+        arrays = {}
+        for name, (fmt, count, offset) in header["arrays"].items():
+            start = base + offset
+            arrays[name] = whole[start:start + count*struct.calcsize(fmt)].cast(fmt)
+        return header, arrays
+
+class HistSink():
+    """HistSink【履歴のストリーム出力クラス】
+
+        シミュレーション履歴を、サイクル毎にファイルへ追記するク
+        ラスです。HIST_FLUSH_ROWS行毎にまとめて書き込みます（異常
+        終了しても、それまでに書き込んだ行は残ります）。
+        ファイルの形式は、拡張子で決めます。
+        ・.csv：結果保存(writehistory())と同じcsv
+        ・その他：バイナリ。先頭にHIST_MAGIC(8バイト)と版数・項目
+          数(4バイト×2、リトルエンディアン)、続いて１行ずつ項目数
+          分の実数(8バイト、リトルエンディアン)
+
+    Attributes:
+        path(str):出力先のパス
+        binary(bool):True:バイナリ/False:csv
+        file(file):出力先のファイル(閉じた後はNone)
+        csvout(csv.writer):csv出力用
+        pending[](sim_history):まだ書き込んでいない行
+    """
+    def __init__(self, path, offset=None):
+        """コンストラクタ
+        
+         出力先のファイルを開く
+
+        Args:
+            path(str):出力先のパス
+            offset(int,optional):続きから書く場合の位置（チェック
+                    ポイントから再開する場合）。ファイルをこの位置ま
+                    でに切り詰めて、後ろに追記する。
+                    Noneの場合は、新しく作る
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.path = path
+        self.binary = not path.lower().endswith(".csv")
+        self.pending = []
+        if self.binary:
+            if offset is None:
+                self.file = open(path, "wb")
+                self.file.write(HIST_MAGIC + struct.pack("<II", HIST_VERSION, HIST_COLS))
+            else:
+                self.file = open(path, "r+b")
+            self.csvout = None
+        else:
+            if offset is None:
+                self.file = open(path, "w", newline="")
+            else:
+                self.file = open(path, "r+", newline="")
+            self.csvout = csv.writer(self.file)
+            if offset is None:
+                self.csvout.writerow([titles[0] for titles in DSP_TITLES_DIC])
+        if offset is not None:
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write(self, row):
+        """１行の追加
+
+         １サイクル分の履歴を追加する（HIST_FLUSH_ROWS行たまった
+         ら書き込む）
+
+        Args:
+            row(sim_history):１サイクル分の履歴
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.pending.append(row)
+        if len(self.pending) >= HIST_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """書込み
+
+         まだ書き込んでいない行を書き込む
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.file is None:
+            return
+        if self.pending:
+            if self.binary:
+                values = array.array("d", [v for row in self.pending for v in row])
+                if sys.byteorder != "little":
+                    values.byteswap()
+                self.file.write(values.tobytes())
+            else:
+                self.csvout.writerows(self.pending)
+            self.pending = []
+        self.file.flush()
+
+    def tell(self):
+        """書込み位置
+
+         まだ書き込んでいない行を書き込み、ファイルの末尾の位置を
+         返す（チェックポイント用）
+
+        Args:なし
+        Returns:書込み位置(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.flush()
+        return self.file.tell()
+
+    def close(self):
+        """ファイルを閉じる
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    @staticmethod
+    def readrows(path):
+        """出力したファイルの読込み
+
+         ストリーム出力したファイル(csv・バイナリ)から、１行ずつ
+         履歴を返す
+
+        Args:
+            path(str):ファイルのパス
+        Returns:なし
+        Raises:
+            ValueError:バイナリの版数・項目数が違う
+        Yields:
+            １サイクル分の履歴(sim_history)
+        Examples:なし
+        Note:なし
+        """
+        b = open(path, "rb")
+        head = b.read(len(HIST_MAGIC))
+        if head != HIST_MAGIC:
+            b.close()
+            b = open(path, newline="")
+            rows = csv.reader(b)
+            next(rows)
+            for row in rows:
+                yield [int(v) for v in row[:HIST_INT_COLS]] + [float(v) for v in row[HIST_INT_COLS:]]
+            b.close()
+            return
+        version, cols = struct.unpack("<II", b.read(8))
+        if version != HIST_VERSION or cols != HIST_COLS:
+            b.close()
+            raise ValueError("履歴ファイルの形式が違います: {}".format(path))
+        while True:
+            chunk = b.read(HIST_FLUSH_ROWS*HIST_COLS*8)
+            if not chunk:
+                break
+            values = array.array("d")
+            values.frombytes(chunk[:len(chunk) - len(chunk) % (HIST_COLS*8)])
+            if sys.byteorder != "little":
+                values.byteswap()
+            for i in range(0, len(values), HIST_COLS):
+                row = values[i:i+HIST_COLS].tolist()
+                yield [int(v) for v in row[:HIST_INT_COLS]] + row[HIST_INT_COLS:]
+        b.close()
+
+class HistBuffer():
+    """HistBuffer【シミュレーション履歴クラス】
+
+        シミュレーション履歴(sim_historyのリスト)を、実数の配列
+        (array.array)にまとめて保持するクラスです。リストと同じよ
+        うに、len()・添字・forで参照でき、１行は新しいリストとして
+        返します（先頭HIST_INT_COLS項目は整数）。
+        保持する行数(capacity)を指定した場合は、リングバッファと
+        なり、最新のcapacity行だけを保持します（ストリーム出力す
+        る場合用。全体はファイルで参照します）。
+        結果サマリ用に、項目毎の最小値（とそのサイクル）・合計は、
+        捨てた行も含めて計算しておきます。
+
+    Attributes:
+        capacity(int):保持する行数(Noneの場合はすべて保持)
+        data(array):履歴の値(行×HIST_COLS)
+        count(int):追加した行数
+        first(int):保持している最初の行の番号
+        colmin[](float):項目毎の最小値
+        argmin[](int):項目毎の、最小値になった最初のサイクル
+        colsum[](float):項目毎の合計
+        sink(HistSink):ストリーム出力先(Noneの場合は出力しない)
+    """
+    def __init__(self, capacity=None, sink=None):
+        """コンストラクタ
+        
+         インスタンスの構築を行う
+
+        Args:
+            capacity(int,optional):保持する行数(省略時はすべて保持)
+            sink(HistSink,optional):ストリーム出力先
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.capacity = capacity
+        self.sink = sink
+        self.clear()
+
+    def clear(self):
+        """クリア
+
+         保持している行と集計をクリアする
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.capacity is None:
+            self.data = array.array("d")
+        else:
+            self.data = array.array("d", bytes(8*HIST_COLS*self.capacity))
+        self.count = 0
+        self.first = 0
+        self.colmin = [0.0]*HIST_COLS
+        self.argmin = [0]*HIST_COLS
+        self.colsum = [0.0]*HIST_COLS
+
+    def append(self, row):
+        """１行の追加
+
+         １サイクル分の履歴を追加する（ストリーム出力する場合は、
+         出力先にも追加する）
+
+        Args:
+            row(sim_history):１サイクル分の履歴
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.count == 0:
+            self.colmin = list(row)
+            self.argmin = [row[0]]*HIST_COLS
+        else:
+            for i, v in enumerate(row):
+                if v < self.colmin[i]:
+                    self.colmin[i] = v
+                    self.argmin[i] = row[0]
+        for i, v in enumerate(row):
+            self.colsum[i] += v
+        if self.capacity is None:
+            self.data.extend(row)
+        else:
+            pos = self.count % self.capacity * HIST_COLS
+            self.data[pos:pos+HIST_COLS] = array.array("d", row)
+            self.first = max(0, self.count + 1 - self.capacity)
+        self.count += 1
+        if self.sink is not None:
+            self.sink.write(row)
+
+    def extend(self, rows):
+        """複数行の追加
+
+         複数サイクル分の履歴を、順に追加する
+
+        Args:
+            rows(iterable):サイクル毎の履歴(sim_history)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        """行数
+
+        Args:なし
+        Returns:追加した行数(捨てた行も含む)(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.count
+
+    def __getitem__(self, idx):
+        """行の参照
+
+        Args:
+            idx(int or slice):行の番号(サイクル)。負の場合は後ろから
+        Returns:
+            １サイクル分の履歴(sim_history)
+            ※sliceの場合は、そのリスト
+        Raises:
+            IndexError:範囲外、またはリングバッファから捨てた行
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self.count))]
+        if idx < 0:
+            idx += self.count
+        if idx < self.first or idx >= self.count:
+            raise IndexError("history row {} is not in memory".format(idx))
+        if self.capacity is None:
+            pos = (idx - self.first) * HIST_COLS
+        else:
+            pos = idx % self.capacity * HIST_COLS
+        row = self.data[pos:pos+HIST_COLS].tolist()
+        return [int(v) for v in row[:HIST_INT_COLS]] + row[HIST_INT_COLS:]
+
+    def __iter__(self):
+        """保持している行の参照
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:
+            １サイクル分の履歴(sim_history)（古い順）
+        Examples:なし
+        Note:なし
+        """
+        for i in range(self.first, self.count):
+            yield self[i]
+
+    def __eq__(self, other):
+        """比較
+
+         リストと同じように、保持している行を比べる
+
+        Args:
+            other(HistBuffer or list):比べる履歴
+        Returns:
+            True:行数と、保持しているすべての行が同じ
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if isinstance(other, HistBuffer):
+            return self.count == other.count and list(self) == list(other)
+        if isinstance(other, list):
+            return self.first == 0 and list(self) == other
+        return NotImplemented
+
+    def close(self):
+        """ストリーム出力の終了
+
+         ストリーム出力先を閉じる（出力先のパスは残す）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.sink is not None:
+            self.sink.close()
+
+    def getstate(self):
+        """状態の取得
+
+         チェックポイント用に、集計と保持している行を返す
+
+        Args:なし
+        Returns:
+            (状態の辞書, 保持している行の値(array.array))
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ストリーム出力する場合は、出力先のパスと書込み位置も
+            返す（まだ書き込んでいない行は、書き込む）
+        """
+        state = {"capacity": self.capacity, "count": self.count, "colmin": self.colmin,   \
+            "argmin": self.argmin, "colsum": self.colsum, "sink": None}
+        if self.sink is not None:
+            state["sink"] = [self.sink.path, self.sink.tell()]
+        values = array.array("d")
+        for row in self:
+            values.extend(row)
+        return state, values
+
+    def setstate(self, state, values, stream=True):
+        """状態の復元
+
+         getstate()で取得した状態を復元する（ストリーム出力する場
+         合は、出力先を保存時の位置から開き直す）
+
+        Args:
+            state(dic):状態の辞書
+            values[](float):保持している行の値
+            stream(bool,optional):False:ストリーム出力していた場
+                    合も、出力先を開かない（以降はすべてメモリに保持
+                    する。捨てた行は参照できない）
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if stream:
+            self.capacity = state["capacity"]
+        else:
+            self.capacity = None
+        self.clear()
+        rows = len(values) // HIST_COLS
+        self.count = state["count"]
+        self.first = self.count - rows
+        if self.capacity is None:
+            self.data = array.array("d", values)
+        else:
+            for i in range(rows):
+                pos = (self.first + i) % self.capacity * HIST_COLS
+                self.data[pos:pos+HIST_COLS] = array.array("d", values[i*HIST_COLS:(i+1)*HIST_COLS])
+        self.colmin = state["colmin"]
+        self.argmin = state["argmin"]
+        self.colsum = state["colsum"]
+        if state["sink"] is None or not stream:
+            self.sink = None
+        else:
+            self.sink = HistSink(state["sink"][0], state["sink"][1])
+
+class TrajRecorder():
+    """TrajRecorder【軌跡記録クラス】
+
+        全員の位置・ステータス・重篤度を、サイクル毎に１フレーム
+        として、ファイルに記録するクラスです（事後の分析用）。
+        ファイルは、最初に最大の大きさ(フレーム数の上限分)で作り、
+        メモリマップして書き込みます。終了時に、記録した分に切り
+        詰めます。
+        ファイルは、以下の形式です（すべてリトルエンディアン）。
+        ・ヘッダ(TRAJ_HEAD_SIZEバイト)：TRAJ_HEADを参照
+        ・フレーム：固定長。先頭は、そのサイクルの人数など(sim_history)
+          (実数8バイト×HIST_COLS)。キーフレームは続けて、座標
+          (x,y)をフィールド全体でTRAJ_LEVELS段階に量子化した値
+          (2バイト×人数×2)、差分フレームは続けて、前のフレーム
+          からの座標の差を「差分の単位」で割った値(1バイト×人数
+          ×2)。最後に、ステータスコード・重篤度コード(1バイト×
+          人数×2)
+        フィールドは、壁にあたると反対側から出てくるため、座標の
+        差も、フィールドの1辺で折り返して近い方向の差にします（フィ
+        ールドサイズの位置は、0として記録します）。
+        差分で記録する場合は、TRAJ_KEY_EVERYフレーム毎にキーフレー
+        ムとし、その間は差分フレームにします（差分で記録しない場
+        合は、すべてキーフレーム）。フレームが固定長のため、任意の
+        サイクルの位置は計算で求まります（TrajReader）。
+        差分は、前のフレームの「復元される座標」との差を記録するた
+        め、丸めの誤差は次のフレームに持ち越されて溜まりません（誤
+        差は差分の単位の半分まで。１サイクルの移動が大きすぎて1バ
+        イトに入らない場合は、残りを次のフレームに持ち越します）。
+        NumPyがある場合は、NumPyでまとめて変換します。
+
+    Attributes:
+        path(str):記録先のパス
+        persons(int):人数
+        capacity(int):フレーム数の上限
+        frames(int):記録したフレーム数
+        key_every(int):キーフレームの間隔(1の場合は差分なし)
+        dstep(int):差分の単位(量子化した座標の単位)
+        field_size(float):フィールドサイズ
+        scale(float):座標の倍率(TRAJ_LEVELS/フィールドサイズ)
+        file(file):記録先のファイル
+        mm(mmap):記録先のメモリマップ
+        recon[](int):x,y毎の、前のフレームの復元される座標(量子化
+                した値)のリスト(NumPyがある場合はndarray)
+    """
+    def __init__(self, path, persons, capacity, field_size, move_r, delta=True, frames=None):
+        """コンストラクタ
+        
+         記録先のファイルを作り（続きから記録する場合は開き）、メ
+         モリマップする
+
+        Args:
+            path(str):記録先のパス
+            persons(int):人数
+            capacity(int):フレーム数の上限
+            field_size(float):フィールドサイズ
+            move_r(float):平均移動距離(差分の単位を決める)
+            delta(bool,optional):True:差分で記録する
+            frames(int,optional):続きから記録する場合の、記録済み
+                    のフレーム数（チェックポイントから再開する場合）。
+                    Noneの場合は新しく作る
+        Returns:なし
+        Raises:
+            ValueError:続きから記録するファイルの人数などが違う
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.path = path
+        #NumPyがあれば、まとめて変換する（どのエンジンでも）
+        import_np()
+        if frames is None:
+            self.persons = persons
+            self.capacity = capacity
+            self.frames = 0
+            self.field_size = float(field_size)
+            self.scale = TRAJ_LEVELS / self.field_size
+            if delta:
+                self.key_every = TRAJ_KEY_EVERY
+                #１サイクルの移動(x,y毎)が、1バイト(±127)に入る単位
+                self.dstep = max(1, math.ceil((move_r + TRAJ_MOVE_MARGIN) * self.scale / 127))
+            else:
+                self.key_every = 1
+                self.dstep = 1
+            self.file = open(path, "w+b")
+            self.file.truncate(self.offset(capacity))
+        else:
+            reader = TrajReader(path)
+            if reader.persons != persons or reader.frames < frames:
+                reader.close()
+                raise ValueError("軌跡ファイルが違います: {}".format(path))
+            self.persons, self.capacity = reader.persons, max(capacity, reader.capacity)
+            self.key_every, self.dstep = reader.key_every, reader.dstep
+            self.field_size, self.scale = reader.field_size, reader.scale
+            self.frames = frames
+            #前のフレームの復元される座標
+            if frames % self.key_every != 0:
+                self.recon = reader.quantized(frames - 1)
+            reader.close()
+            self.file = open(path, "r+b")
+            self.file.truncate(self.offset(capacity))
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.writehead()
+
+    def offset(self, frame):
+        """フレームの位置
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:ファイルの先頭からの位置(バイト)(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return TRAJ_HEAD_SIZE + trajoffset(frame, self.persons, self.key_every)
+
+    def writehead(self):
+        """ヘッダの書込み
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.mm[:TRAJ_HEAD.size] = TRAJ_HEAD.pack(TRAJ_MAGIC, TRAJ_VERSION, self.persons, self.capacity,   \
+            self.frames, self.key_every, self.dstep, 0, self.field_size, self.scale)
+
+    def record(self, frame, data, row):
+        """フレームの記録
+
+         １サイクル分の全員の位置・ステータス・重篤度と、人数など
+         を記録する
+
+        Args:
+            frame(int):フレーム番号(サイクル)。記録したフレーム数と
+                    同じであること（順に記録する）
+            data(tuple):(x座標, y座標, ステータスコード, 重篤度コード)
+                    ※エンジンのframe()の結果
+            row(sim_history):１サイクル分の履歴
+        Returns:なし
+        Raises:
+            ValueError:フレーム番号が順番ではない
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if frame != self.frames:
+            raise ValueError("frame {} cannot be recorded (recorded {})".format(frame, self.frames))
+        if frame >= self.capacity:
+            #最大のサイクル数が途中で増えた場合は、ファイルを広げる
+            self.grow(max(frame+1, self.capacity*2))
+        n = self.persons
+        pos = self.offset(frame)
+        key = 0 == frame % self.key_every
+        xs, ys, stats, serious = data
+        struct.pack_into(TRAJ_ROW_FMT, self.mm, pos, *row)
+        pos += TRAJ_ROW_SIZE
+        if np is not None:
+            #NumPyでまとめて変換する
+            mm = self.mm
+            #量子化した座標は、uint16の桁あふれでフィールドの1辺で折り返す
+            qs = []
+            for v in (xs, ys):
+                q = np.asarray(v, dtype=np.float64) * self.scale
+                q += 0.5
+                qs.append(q.astype(np.int32).astype(np.uint16))
+            if key:
+                for q in qs:
+                    np.frombuffer(mm, dtype="<u2", count=n, offset=pos)[:] = q
+                    pos += 2*n
+                self.recon = qs
+            else:
+                for q, recon in zip(qs, self.recon):
+                    #フィールドの1辺で折り返した差(int16で見る)
+                    d = (q - recon).view(np.int16).astype(np.int32)
+                    d += self.dstep//2
+                    d //= self.dstep
+                    np.clip(d, -127, 127, out=d)
+                    np.frombuffer(mm, dtype=np.int8, count=n, offset=pos)[:] = d
+                    d *= self.dstep
+                    recon += d.astype(np.uint16)
+                    pos += n
+            np.frombuffer(mm, dtype=np.uint8, count=n, offset=pos)[:] = np.asarray(stats)
+            np.frombuffer(mm, dtype=np.uint8, count=n, offset=pos+n)[:] = np.asarray(serious)
+        else:
+            scale = self.scale
+            qs = [[int(v*scale + 0.5) % TRAJ_LEVELS for v in vs] for vs in (xs, ys)]
+            if key:
+                for q in qs:
+                    a = array.array("H", q)
+                    if sys.byteorder != "little":
+                        a.byteswap()
+                    self.mm[pos:pos+2*n] = a.tobytes()
+                    pos += 2*n
+                self.recon = qs
+            else:
+                dstep = self.dstep
+                half = TRAJ_LEVELS//2
+                for q, recon in zip(qs, self.recon):
+                    d = [min(127, max(-127, ((v - r + half) % TRAJ_LEVELS - half + dstep//2)//dstep))   \
+                        for v, r in zip(q, recon)]
+                    self.mm[pos:pos+n] = array.array("b", d).tobytes()
+                    for i, v in enumerate(d):
+                        recon[i] = (recon[i] + v*dstep) % TRAJ_LEVELS
+                    pos += n
+            self.mm[pos:pos+n] = bytes(stats)
+            self.mm[pos+n:pos+2*n] = bytes(serious)
+        self.frames += 1
+        #記録したフレーム数を更新(途中で止まっても読めるように)
+        struct.pack_into("<I", self.mm, 20, self.frames)
+
+    def grow(self, capacity):
+        """フレーム数の上限の拡張
+
+         ファイルを広げて、メモリマップし直す
+
+        Args:
+            capacity(int):新しいフレーム数の上限
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.mm.flush()
+        self.mm.close()
+        self.capacity = capacity
+        self.file.truncate(self.offset(capacity))
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.writehead()
+
+    def close(self):
+        """記録の終了
+
+         ヘッダに記録したフレーム数を書き込み、ファイルを記録した
+         分に切り詰めて閉じる
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.mm is None:
+            return
+        self.writehead()
+        self.mm.flush()
+        self.mm.close()
+        self.mm = None
+        self.file.truncate(self.offset(self.frames))
+        self.file.close()
+
+def trajoffset(frame, persons, key_every):
+    """軌跡ファイルのフレームの位置
+
+     フレームの位置（ヘッダの後ろからのバイト数）を求める。キー
+     フレームと差分フレームの並びは決まっているので、計算で求まる
+
+    Args:
+        frame(int):フレーム番号(サイクル)
+        persons(int):人数
+        key_every(int):キーフレームの間隔
+    Returns:位置(バイト)(int)
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:
+        キーフレームは履歴＋6バイト×人数、差分フレームは履歴＋4バ
+        イト×人数
+    """
+    key_size = TRAJ_ROW_SIZE + 6*persons
+    delta_size = TRAJ_ROW_SIZE + 4*persons
+    group, within = divmod(frame, key_every)
+    pos = group*(key_size + (key_every-1)*delta_size)
+    if within > 0:
+        pos += key_size + (within-1)*delta_size
+    return pos
+
+class TrajReader():
+    """TrajReader【軌跡読込みクラス】
+
+        TrajRecorderで記録した軌跡ファイルを読み込むクラスです。
+        ファイルをメモリマップし、任意のサイクルのフレームを、先頭
+        から読まずに取り出します（差分で記録した場合は、直前のキー
+        フレームから復元します）。
+
+    Attributes:
+        path(str):ファイルのパス
+        persons(int):人数
+        capacity(int):フレーム数の上限
+        frames(int):記録したフレーム数
+        key_every(int):キーフレームの間隔(1の場合は差分なし)
+        dstep(int):差分の単位(量子化した座標の単位)
+        field_size(float):フィールドサイズ
+        scale(float):座標の倍率(TRAJ_LEVELS/フィールドサイズ)
+        mm(mmap):ファイルのメモリマップ(読込み専用)
+        cache[frame,qs]:直前に復元したフレームの、量子化した座標
+                （続けて読む場合は、キーフレームからではなく、ここ
+                から復元する）
+    """
+    def __init__(self, path):
+        """コンストラクタ
+        
+         ファイルを開いて、メモリマップする
+
+        Args:
+            path(str):ファイルのパス
+        Returns:なし
+        Raises:
+            ValueError:軌跡ファイルではない・版数が違う
+        Yields:なし
+        Examples:なし
+        Note:
+            記録中のファイルも、それまでに記録したフレームを読める
+        """
+        self.path = path
+        import_np()
+        b = open(path, "rb")
+        self.mm = mmap.mmap(b.fileno(), 0, access=mmap.ACCESS_READ)
+        b.close()
+        magic, version, self.persons, self.capacity, self.frames, self.key_every, self.dstep, reserve,   \
+            self.field_size, self.scale = TRAJ_HEAD.unpack(self.mm[:TRAJ_HEAD.size])
+        if magic != TRAJ_MAGIC:
+            self.mm.close()
+            raise ValueError("軌跡ファイルではありません: {}".format(path))
+        if version != TRAJ_VERSION:
+            self.mm.close()
+            raise ValueError("軌跡ファイルの版数が違います: {}".format(version))
+        self.cache = None
+
+    def __len__(self):
+        """フレーム数
+
+        Args:なし
+        Returns:記録したフレーム数(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.frames
+
+    def offset(self, frame):
+        """フレームの位置
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:ファイルの先頭からの位置(バイト)(int)
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if frame < 0 or frame >= self.frames:
+            raise IndexError("frame {} is not recorded".format(frame))
+        return TRAJ_HEAD_SIZE + trajoffset(frame, self.persons, self.key_every)
+
+    def quantized(self, frame):
+        """量子化した座標の復元
+
+         フレームの、量子化した座標を復元する（直前のキーフレーム
+         に、差分を足していく）。直前に復元したフレームの後ろの場
+         合は、そこから続けて復元する（再生用）
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:
+            [x座標, y座標](量子化した値)
+            ※NumPyがある場合はndarray(uint16)、無い場合はリスト
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:なし
+        Note:
+            返した値は、呼び出し元で変更しないこと（次の復元に使う）
+        """
+        if frame < 0 or frame >= self.frames:
+            raise IndexError("frame {} is not recorded".format(frame))
+        n = self.persons
+        key = frame - frame % self.key_every
+        pos = self.offset(key) + TRAJ_ROW_SIZE
+        if self.cache is not None and key <= self.cache[0] <= frame:
+            start, qs = self.cache
+            qs = list(qs)
+        elif np is not None:
+            start = key
+            qs = [np.frombuffer(self.mm, dtype="<u2", count=n, offset=pos+i*2*n).astype(np.uint16)   \
+                for i in (0, 1)]
+        else:
+            start = key
+            qs = []
+            for i in (0, 1):
+                a = array.array("H")
+                a.frombytes(self.mm[pos+i*2*n:pos+(i+1)*2*n])
+                if sys.byteorder != "little":
+                    a.byteswap()
+                qs.append(a.tolist())
+        for f in range(start+1, frame+1):
+            pos = self.offset(f) + TRAJ_ROW_SIZE
+            for i in (0, 1):
+                if np is not None:
+                    d = np.frombuffer(self.mm, dtype=np.int8, count=n, offset=pos+i*n).astype(np.int32)
+                    d *= self.dstep
+                    qs[i] = qs[i] + d.astype(np.uint16)
+                else:
+                    d = array.array("b", self.mm[pos+i*n:pos+(i+1)*n])
+                    qs[i] = [(q + v*self.dstep) % TRAJ_LEVELS for q, v in zip(qs[i], d)]
+        self.cache = (frame, qs)
+        return qs
+
+    def codes(self, frame):
+        """ステータスコード・重篤度コードの取得
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:
+            (ステータスコード, 重篤度コード)
+            ※NumPyがある場合はndarray(uint8)、無い場合はリスト
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        n = self.persons
+        pos = self.offset(frame) + TRAJ_ROW_SIZE
+        if 0 == frame % self.key_every:
+            pos += 4*n
+        else:
+            pos += 2*n
+        if np is not None:
+            return (np.frombuffer(self.mm, dtype=np.uint8, count=n, offset=pos).copy(),   \
+                np.frombuffer(self.mm, dtype=np.uint8, count=n, offset=pos+n).copy())
+        return list(self.mm[pos:pos+n]), list(self.mm[pos+n:pos+2*n])
+
+    def frame(self, frame):
+        """フレームの取得
+
+         指定したサイクルの、全員の位置・ステータスコード・重篤度
+         コードを返す
+
+        Args:
+            frame(int):フレーム番号(サイクル)。負の場合は後ろから
+        Returns:
+            (x座標, y座標, ステータスコード, 重篤度コード)
+            ※座標はフィールドの座標(量子化の誤差を含む)。NumPyがあ
+            る場合はndarray、無い場合はリスト
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:
+            TrajReader("run.traj").frame(100)
+        Note:なし
+        """
+        if frame < 0:
+            frame += self.frames
+        qx, qy = self.quantized(frame)
+        stats, serious = self.codes(frame)
+        if np is not None:
+            return qx/self.scale, qy/self.scale, stats, serious
+        return [q/self.scale for q in qx], [q/self.scale for q in qy], stats, serious
+
+    def drawdata(self, frame):
+        """描画用データの取得
+
+         指定したサイクルの、全員の位置とグループ番号を返す
+         （エンジンのdrawdata()と同じ形。再生用）
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:
+            (x座標のリスト, y座標のリスト, グループ番号のリスト)
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        xs, ys, stats, serious = self.frame(frame)
+        if np is not None:
+            grps = np.array(GROUP_LUT, dtype=np.int8)[stats.astype(np.intp)*4 + serious]
+            return xs.tolist(), ys.tolist(), grps.tolist()
+        return xs, ys, [GROUP_LUT[st*4 + se] for st, se in zip(stats, serious)]
+
+    def row(self, frame):
+        """１サイクル分の履歴の取得
+
+        Args:
+            frame(int):フレーム番号(サイクル)
+        Returns:１サイクル分の履歴(sim_history)
+            ※サイクル・人数は整数(HIST_INT_COLS)
+        Raises:
+            IndexError:記録されていないサイクル
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        row = list(struct.unpack_from(TRAJ_ROW_FMT, self.mm, self.offset(frame)))
+        row[:HIST_INT_COLS] = [int(v) for v in row[:HIST_INT_COLS]]
+        return row
+
+    def histories(self):
+        """シミュレーション履歴の取得
+
+         全フレームの履歴を、シミュレーション履歴にする（グラフ表
+         示用）
+
+        Args:なし
+        Returns:シミュレーション履歴(HistBuffer)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        histories = HistBuffer()
+        for f in range(self.frames):
+            histories.append(self.row(f))
+        return histories
+
+    def close(self):
+        """ファイルを閉じる
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.cache = None
+        self.mm.close()
+
+class CycleRecord():
+    """CycleRecord【サイクル毎の記録クラス】
+
+        simulate()が、サイクル毎に返す記録です。sim_historyと同じ
+        項目を属性として持ちます（読取り専用）。指定した場合は、全
+        員の配列（位置・ステータス・重篤度）も持ちます。
+        記録は小さく、前後のサイクルの記録を参照しないため、受け
+        取った側で、必要な分だけ残したり集計したりできます。
+
+    Attributes:
+        no(int):サイクル
+        s(int):未感染者数
+        i_n(int):感染者(症状なし)数
+        i_l(int):感染者(軽症)数
+        i_h(int):感染者(重症)数
+        r(int):免疫保持者数
+        d(int):死亡者数
+        repro(float):実行再生産数
+        eco(float):経済活動(%)
+        agents(tuple):全員の配列(Noneの場合は持たない)
+                (x座標, y座標, ステータスコード, 重篤度コード)
+                ※読取り専用。ArrayEngineの場合は、エンジンの配列の
+                ビュー（コピーしない）のため、次の記録を受け取ると
+                値が変わる（残す場合はコピーすること）
+    """
+    __slots__ = ("no", "s", "i_n", "i_l", "i_h", "r", "d", "repro", "eco", "agents")
+
+    def __init__(self, sim_history, frame=None):
+        """コンストラクタ
+
+         sim_historyと、全員の配列から記録を作る
+
+        Args:
+            sim_history[](int,float):１サイクル分の履歴
+            frame(tuple,optional):全員の配列(エンジンのframe()の結果)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        for key, value in zip(self.__slots__, sim_history):
+            object.__setattr__(self, key, value)
+        if frame is not None:
+            frame = tuple(self.readonly(a) for a in frame)
+        object.__setattr__(self, "agents", frame)
+
+    @staticmethod
+    def readonly(a):
+        """読取り専用の配列
+
+         配列を、書き換えられない形にする
+
+        Args:
+            a(ndarray or list):配列
+        Returns:
+            読取り専用のビュー(ndarray)、またはタプル(listの場合)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if isinstance(a, list):
+            return tuple(a)
+        view = a.view()
+        view.flags.writeable = False
+        return view
+
+    def row(self):
+        """sim_historyの取得
+
+         記録を、sim_historyと同じ並びのリストにして返す
+
+        Args:なし
+        Returns:１サイクル分の履歴(sim_history)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return [getattr(self, key) for key in self.__slots__[:HIST_COLS]]
+
+    def infected(self):
+        """感染者数(合計)
+
+        Args:なし
+        Returns:感染者数(症状なし＋軽症＋重症)(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.i_n + self.i_l + self.i_h
+
+    def __repr__(self):
+        """文字列表現
+
+        Args:なし
+        Returns:文字列(str)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return "CycleRecord({})".format(", ".join("{}={}".format(key, getattr(self, key))   \
+            for key in self.__slots__[:HIST_COLS]))
+
+    def __setattr__(self, key, value):
+        """値の変更（不可）
+
+         読取り専用のため、値の変更は例外とする
+
+        Args:
+            key(str):属性名
+            value:値
+        Returns:なし
+        Raises:
+            AttributeError:常に発生する
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        raise AttributeError("CycleRecord is read-only ({})".format(key))
+
+class Simulation():
+    """Simulation【シミュレーションクラス】
+
+        シミュレーションの実行（画面表示以外）を行うクラスです。
+        対象者（エンジン）や履歴、結果サマリを保持し、サイクルの
+        実行を行います。tkinterを使用しないため、画面なしでも実
+        行できます（コマンドラインからの実行）。
+        対象者・パラメータ・乱数・履歴は、すべてこのオブジェクト
+        （とエンジン）が持ち、モジュールのグローバル変数は参照しま
+        せん。そのため、１つのプロセスに複数のシミュレーションを作
+        り、別々に（スレッドでも）実行できます。
+        MainAppクラスは、このクラスのオブジェクトを１つ持ち、その
+        状態を画面に表示します。
+
+    Attributes:
+        *感染者数が最大となったタイミングの記録
+        i_t_max[人数,サイクル](int,int):全体
+        i_n_max[人数,サイクル](int,int):症状なし
+        i_l_max[人数,サイクル](int,int):軽症 
+        i_h_max[人数,サイクル](int,int):重症
+        i_lh_max[人数,サイクル](int,int):軽症＋重症
+                ※サイクル毎に更新する（同じ人数の場合は後のサイクル）
+        now_cycle(int):現在サイクル(現在表示中のサイクル番号)
+        sim_history[
+                サイクル(int),
+                未感染者数(int),
+                感染者(症状なし)数(int),
+                感染者(軽症)数(int),
+                感染者(重症)数(int),
+                免疫保持者数(int),
+                死亡者数(int),
+                実行再生産数(float),
+                経済活動(%)(float)]:サイクル毎の人数（グラフ表示用）
+        sim_histories(HistBuffer):
+                シミュレーション履歴(sim_historyのリストとして参照)
+                ※ストリーム出力する場合は、最新のHIST_RING_ROWS
+                サイクル分だけを保持する
+        hist_path(str):シミュレーション履歴のストリーム出力先
+                (Noneの場合は出力せず、すべてメモリに保持する)
+                ※セットアップ前に設定する。HistSinkを参照
+        hist_keep(bool):True:シミュレーション履歴をすべてメモリに保持する
+                False:直近のサイクルの分だけを保持する
+                (ストリーム出力しない場合。simulate()で使用)
+                ※セットアップ前に設定する
+        cache(ResultCache):実行結果のキャッシュ(Noneの場合は使わない)
+                ※run()で使う。loadcache()を参照
+        traj_path(str):全員の軌跡の記録先
+                (Noneの場合は記録しない)
+                ※セットアップ前に設定する。TrajRecorderを参照
+        traj_delta(bool):True:軌跡を差分で記録する
+        traj(TrajRecorder):軌跡の記録(記録しない場合はNone)
+        engine(PersonEngine or ArrayEngine or EventEngine):
+                シミュレーションエンジン（対象者の保持と移動・感
+                染判定を行う）
+        sentences[](str):サマリ表示文字列(1行)のリスト
+        up(UsrPrms):ユーザーパラメータの保持
+        prm(PrmSnap):実行中のパラメータ(スナップショット)
+                ※移動・感染判定は、upではなくこちらを参照する
+        next_prm(PrmSnap):次のサイクルから使うパラメータ
+                (変更が無い場合はNone)
+        seed(int):実行中のシミュレーションの乱数シード
+                ※パラメータのシードが0の場合は、セットアップ時
+                にランダムに決めたシード
+        ecoact(float):本来の経済活動規模(分母)
+        ecoeffect(float):実際の経済活動規模(分子)
+        tr(TimeRec):実行時間計測用オブジェクト
+        engine_kind(str):シミュレーションエンジンの種類(ENGINE_*)
+        ckpt_path(str):チェックポイントの保存先(Noneの場合は保存しない)
+        ckpt_every(int):チェックポイントを保存するサイクルの間隔
+                (0の場合は保存しない)
+                ※セットアップ時に、パラメータの値を設定する
+    """
+    def __init__(self, up=None):
+        """コンストラクタ
+        
+         シミュレーションデータの構築を行う
+
+        Args:
+            up(UsrPrms,optional):ユーザーパラメータ
+                （MainAppでは、画面構築時に設定する）
+                Noneの場合は、デフォルトのパラメータで実行する
+                (defaultprm())
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:
+            sim = Simulation()
+            sim.run()
+        Note:
+            構築時には、対象者は作らない（セットアップ時に作る）
+        """
+        ###実行用変数（オブジェクト）
+        #最大感染者数（人数、サイクル）　※感染者数が最大となったタイミングの記録
+        self.i_t_max = [0,0]        #全体
+        self.i_n_max = [0,0]        #症状なし（移動制限なし）
+        self.i_l_max = [0,0]        #軽症（隔離） 
+        self.i_h_max = [0,0]        #重症（入院）
+        self.i_lh_max = [0,0]       #軽症＋重症
+        
+        self.now_cycle = 0       #現在サイクル　※現在表示中のサイクル番号
+        
+        #シミュレーション履歴　※サイクル毎の人数（グラフ表示用）、リストとして参照
+        self.sim_histories = HistBuffer()
+        self.hist_path = None
+        self.hist_keep = True
+        #実行結果のキャッシュ　※同じ条件の実行は、保存した結果を使う
+        self.cache = None
+        #軌跡の記録　※全員の位置・ステータス（事後の分析用）
+        self.traj_path = None
+        self.traj_delta = True
+        self.traj = None
+        #no,s,i_n,i_l,i_h,r,d,R,ECO
+        self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
+        
+        #シミュレーションエンジン　※対象者はエンジンで管理
+        self.engine = None
+        
+        #サマリ表示データのリスト
+        self.sentences=[]
+
+        #ユーザーパラメータ
+        self.up=up
+        self.prm=None
+        self.next_prm=None
+        self.seed=None
+        self.engine_kind=None
+
+        #チェックポイント
+        self.ckpt_path=None
+        self.ckpt_every=0
+
+        #時間計測
+        self.tr=TimeRec()
+
+    def setup(self, engine=ENGINE_PERSON):
+        """シミュレーションデータのセットアップ
+        
+         シミュレーションデータの初期化・セットアップを行う
+
+        Args:
+            engine(str,optional):シミュレーションエンジン。以下のいずれか
+                ENGINE_PERSON:PersonEngine(デフォルト)
+                ENGINE_ARRAY:ArrayEngine(NumPy)
+                ENGINE_EVENT:EventEngine(病状をイベント駆動で判定)
+        Returns:なし
+        Raises:
+            ValueError:配列版エンジンで、NumPyがインストールされていない
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if engine == ENGINE_ARRAY and not import_np():
+            raise ValueError("NumPyがインストールされていないため、配列版エンジンは使用できません")
+        #すべての要素を一度削除
+        self.engine = None
+        #ヒストリーデータのクリア（ストリーム出力する場合は、出力先を作る）
+        self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
+        self.newhistories()
+        #サマリ表示データのクリア
+        self.sentences.clear()
+        #最大感染者数のクリア
+        self.i_t_max = [0,0]
+        self.i_n_max = [0,0]
+        self.i_l_max = [0,0]
+        self.i_h_max = [0,0]
+        self.i_lh_max = [0,0]
+
+        #パラメータのスナップショット
+        if self.up is None:
+            self.prm=defaultprm()
+        else:
+            self.prm=self.up.compile()
+        self.next_prm=None
+
+        #経済活動割合（分母）の再計算 ※経済活動は移動距離の総計で決める
+        self.ecoact=self.prm.total_persons_count*self.prm.move_r
+        self.ecoeffect=0.0
+
+        self.now_cycle=0
+
+        #乱数シード（0の場合はランダムに決める。結果サマリに記録する）
+        if self.prm.seed == 0:
+            self.seed=SimRandom.newseed()
+        else:
+            self.seed=self.prm.seed
+    
+        self.ckpt_every=self.prm.checkpoint_cycle
+    
+        #初期インスタンスの生成
+        self.engine_kind = engine
+        if engine == ENGINE_ARRAY:
+            self.engine = ArrayEngine(self.prm, self.seed)
+        elif engine == ENGINE_EVENT:
+            self.engine = EventEngine(self.prm, self.seed)
+        else:
+            self.engine = PersonEngine(self.prm, self.seed)
+
+        #軌跡の記録先
+        self.closetraj()
+        if self.traj_path is not None:
+            self.opentraj()
+
+    def newhistories(self):
+        """シミュレーション履歴の作成
+
+         シミュレーション履歴を空にする（ストリーム出力する場合は、
+         出力先を作る）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.sim_histories.close()
+        if self.hist_path is None and self.hist_keep:
+            self.sim_histories = HistBuffer()
+        elif self.hist_path is None:
+            #保持しない場合も、実行再生産数の計算に前のサイクルを使う
+            self.sim_histories = HistBuffer(1)
+        else:
+            self.sim_histories = HistBuffer(HIST_RING_ROWS, HistSink(self.hist_path))
+
+    def setprm(self, prm):
+        """パラメータの変更
+        
+         実行中のパラメータを変更する。変更は、次のサイクルの最
+         初にまとめて反映する（サイクルの途中では変わらない）。
+         (一時停止からの再開時に呼ばれる)
+
+        Args:
+            prm(PrmSnap):新しいパラメータ
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.next_prm=prm
+
+    def sim_cycle(self):
+        """シミュレーション１サイクル実行
+        
+         現在サイクルの移動・感染判定を行い、人数をカウントして
+         ヒストリーに追加する（画面表示は行わない）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #パラメータの変更をサイクルの最初に反映
+        if self.next_prm is not None:
+            self.prm=self.next_prm
+            self.engine.prm=self.prm
+            self.next_prm=None
+
+        #移動
+        #実行時間計測
+        self.tr.movetime.reset()
+        self.tr.movetime.start()
+
+        self.engine.move()
+    
+        #実行時間計測
+        self.tr.movetime.stop()
+        self.tr.addmovetime(self.tr.movetime.getelapsedtime())
+
+        #判定
+        #実行時間計測
+        self.tr.renewtime.reset()
+        self.tr.renewtime.start()
+
+        self.engine.stat_renew(self.now_cycle)
+    
+        #件数カウント
+        # no,s,i_n,i_l,i_h,r,d,R
+        self.sim_history[0] = self.now_cycle
+        self.sim_history[1:7] = self.engine.count()
+        self.ecoeffect = self.engine.movesum()
+
+        #最大感染者数の更新
+        i_n, i_l, i_h = self.sim_history[2:5]
+        for i_max, cnt in ((self.i_t_max, i_n+i_l+i_h), (self.i_n_max, i_n),   \
+                (self.i_l_max, i_l), (self.i_h_max, i_h), (self.i_lh_max, i_l+i_h)):
+            if cnt >= i_max[0]:
+                i_max[0] = cnt
+                i_max[1] = self.now_cycle
+
+        #実行再生産数：直近の免疫獲得サイクルので計測
+        if self.now_cycle > 0 :
+            bf_his = self.sim_histories[self.now_cycle-1]
+            bf_his_i = sum(bf_his[2:5])
+            now_i = sum(self.sim_history[2:5])
+            
+            if bf_his_i > 1 and now_i > 0:
+                self.sim_history[7] =round( math.log(now_i,bf_his_i),4)
+            else:
+                self.sim_history[7] = 0.0
+
+                       
+        #経済活動割合
+        self.sim_history[8] = round(self.ecoeffect/ self.ecoact*100,2)
+
+        #ヒストリーに追加
+        self.sim_histories.append(self.sim_history) 
+
+        #軌跡の記録
+        if self.traj is not None:
+            self.traj.record(self.now_cycle, self.engine.frame(), self.sim_history)
+
+        #実行時間計測
+        self.tr.renewtime.stop()
+        self.tr.addrenewtime(self.tr.renewtime.getelapsedtime())
+
+    def isend(self):
+        """終了判定
+        
+         シミュレーションが終了したか判定する
+         （打ち切りサイクルを越えたか、感染者がゼロになった）
+
+        Args:なし
+        Returns:
+            True:終了した
+            False:終了していない
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.now_cycle > self.prm.cycle_max or 0 == (sum(self.sim_history[2:5]))
+
+    def nextcycle(self):
+        """次のサイクルへ
+        
+         サイクルを進め、カウンタをクリアする
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #次のサイクル
+        self.now_cycle += 1
+        #カウンタクリア
+        self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
+
+    def run(self, engine=ENGINE_PERSON):
+        """シミュレーションの実行（画面なし）
+        
+         セットアップを行い、シミュレーションが終了するまで
+         サイクルを実行する。終了後にサマリを作成する。
+         画面なしの実行用のため、サイクル速度(cycle_speed)
+         による待ちは行わない。
+
+        Args:
+            engine(str,optional):シミュレーションエンジン。
+                    ※setup()を参照
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #実行時間計測
+        self.tr.clearsimrec()
+        self.tr.buildsimtime.start()
+        #同じ条件の結果がキャッシュにあれば、実行しない
+        if self.loadcache(engine):
+            self.tr.buildsimtime.stop()
+            return
+        self.setup(engine)
+        self.tr.buildsimtime.stop()
+
+        self.runloop()
+        self.savecache()
+
+    def usecache(self):
+        """キャッシュを使うかの判定
+
+         キャッシュがあり、軌跡・チェックポイントを保存しない（実
+         行しないと作れないものが無い）場合に、キャッシュを使う
+
+        Args:なし
+        Returns:
+            True:キャッシュを使う
+            False:キャッシュを使わない
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return self.cache is not None and self.traj_path is None and self.ckpt_path is None
+
+    def loadcache(self, engine):
+        """キャッシュからの結果の読込み
+
+         同じパラメータ・乱数シード・エンジンの結果がキャッシュに
+         あれば、読み込んで実行が終了した状態にする（履歴・サマリ・
+         最大感染者数）
+
+        Args:
+            engine(str):シミュレーションエンジン
+        Returns:
+            True:読み込んだ（実行しなくてよい）
+            False:キャッシュに無い、またはキャッシュを使わない
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            乱数シードが0（ランダムに決める）の場合は、読み込まない。
+            エンジン(engine)は作らない（None）
+        """
+        if not self.usecache():
+            return False
+        if self.up is None:
+            prm = defaultprm()
+        else:
+            prm = self.up.compile()
+        if prm.seed == 0:
+            return False
+        key = ResultCache.key(prm.getdic(), prm.seed, engine)
+        value = self.cache.get(key)
+        if value is None:
+            return False
+
+        self.prm = prm
+        self.next_prm = None
+        self.seed = prm.seed
+        self.engine_kind = engine
+        self.engine = None
+        self.closetraj()
+        self.newhistories()
+        self.sim_histories.extend(value["rows"])
+        self.sim_histories.close()
+        self.sim_history = self.sim_histories[-1]
+        self.now_cycle = value["now_cycle"]
+        for name, i_max in value["peaks"].items():
+            setattr(self, name, i_max)
+        self.sentences = ["結果キャッシュから読込み(キー={})".format(key[:16])] + value["sentences"]
+        return True
+
+    def savecache(self):
+        """キャッシュへの結果の保存
+
+         実行が終了した結果（履歴・サマリ・最大感染者数）を、キャ
+         ッシュに保存する
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            乱数シードは、実際に使ったシードをキーにする
+        """
+        if not self.usecache():
+            return
+        key = ResultCache.key(self.prm.getdic(), self.seed, self.engine_kind)
+        self.cache.put(key, {"rows": list(self.allhistories()), "now_cycle": self.now_cycle,   \
+            "peaks": {name: getattr(self, name) for name in ("i_t_max", "i_n_max", "i_l_max", "i_h_max", "i_lh_max")},   \
+            "sentences": self.sentences})
+
+    def resume(self, path):
+        """シミュレーションの再開（画面なし）
+        
+         チェックポイントから状態を復元し、シミュレーションが終了
+         するまでサイクルを実行する。終了後にサマリを作成する。
+
+        Args:
+            path(str):チェックポイントファイルのパス
+        Returns:なし
+        Raises:
+            ValueError:チェックポイントファイルではない
+                    ※Checkpoint.read()を参照
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #実行時間計測
+        self.tr.clearsimrec()
+        self.tr.buildsimtime.start()
+        self.loadcheckpoint(path)
+        self.tr.buildsimtime.stop()
+
+        self.runloop()
+
+    def runloop(self):
+        """サイクルの実行（画面なし）
+        
+         シミュレーションが終了するまでサイクルを実行し、サマリを
+         作成する。チェックポイントの間隔毎に、チェックポイントを
+         保存する。
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.tr.allsimtime.start()
+        while True:
+            self.sim_cycle()
+            if self.isend():
+                break
+            self.nextcycle()
+            self.autocheckpoint()
+        self.tr.allsimtime.stop()
+
+        self.hist_summry()
+        self.sim_histories.close()
+        self.closetraj()
+
+    def opentraj(self, frames=None):
+        """軌跡の記録の開始
+
+         軌跡の記録先(traj_path)に、サイクル0〜最大のサイクル数+1
+         の分のファイルを確保する（isend()を参照）
+
+        Args:
+            frames(int,optional):続きから記録する場合の、記録済み
+                    のフレーム数（TrajRecorderを参照）
+        Returns:なし
+        Raises:
+            ValueError:続きから記録するファイルが違う
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm = self.prm
+        persons = prm.s_persons_count + prm.i_persons_count + prm.r_persons_count + prm.d_persons_count
+        self.traj = TrajRecorder(self.traj_path, persons, prm.cycle_max+2, prm.field_size, prm.move_r,   \
+            self.traj_delta, frames)
+
+    def closetraj(self):
+        """軌跡の記録の終了
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.traj is not None:
+            self.traj.close()
+            self.traj = None
+
+    def autocheckpoint(self, force=False):
+        """チェックポイントの自動保存
+        
+         チェックポイントの間隔のサイクルであれば、チェックポイン
+         トを保存する（サイクルの間(nextcycle()の後)に呼び出す）
+
+        Args:
+            force(bool,optional):True:サイクルによらず保存する
+                    （一時停止時）
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            保存先(ckpt_path)が無い場合は保存しない。間隔
+            (ckpt_every)が0の場合は、forceの場合だけ保存する
+        """
+        if self.ckpt_path is None:
+            return
+        if force or (self.ckpt_every > 0 and 0 == self.now_cycle % self.ckpt_every):
+            self.savecheckpoint(self.ckpt_path)
+
+    def savecheckpoint(self, path):
+        """チェックポイントの保存
+        
+         シミュレーションの途中の状態（パラメータ・エンジンの状態・
+         乱数の状態・履歴など）を、ファイルに保存する
+
+        Args:
+            path(str):保存先のパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            サイクルの間(nextcycle()の後)に呼び出す。保存した状態
+            から再開すると、中断しなかった場合と同じ結果になる
+        """
+        state, arrays = self.engine.getstate()
+        #履歴は(保持しているサイクル数×HIST_COLS)の実数の配列で保存する
+        hist_state, histories = self.sim_histories.getstate()
+        arrays = dict(arrays, histories=histories)
+        if self.next_prm is None:
+            next_prm = None
+        else:
+            next_prm = self.next_prm.getdic()
+        #軌跡は記録先だけを保存する（再開時に、続きから記録する）
+        if self.traj is None:
+            traj = None
+        else:
+            traj = {"path": self.traj.path, "delta": self.traj.key_every > 1}
+        header = {"engine": self.engine_kind, "prm": self.prm.getdic(), "next_prm": next_prm,   \
+            "seed": self.seed, "now_cycle": self.now_cycle, "sim_history": self.sim_history,   \
+            "ecoact": self.ecoact, "ecoeffect": self.ecoeffect,   \
+            "i_max": [self.i_t_max, self.i_n_max, self.i_l_max, self.i_h_max, self.i_lh_max],   \
+            "hist_state": hist_state, "traj": traj, "engine_state": state}
+        Checkpoint.write(path, header, arrays)
+
+    def loadcheckpoint(self, path, stream=True):
+        """チェックポイントの読込み
+        
+         チェックポイントから、シミュレーションの途中の状態を復元
+         する（setup()の代わりに呼び出す）。ユーザーパラメータ(up)
+         にも、保存時のパラメータを設定する。
+
+        Args:
+            path(str):チェックポイントファイルのパス
+            stream(bool,optional):False:履歴をストリーム出力して
+                    いた場合・軌跡を記録していた場合も、続きを出力
+                    しない（分岐実行用）
+                    ※HistBuffer.setstate()を参照
+        Returns:なし
+        Raises:
+            ValueError:チェックポイントファイルではない
+                    ※Checkpoint.read()を参照。配列版エンジンで、
+                    NumPyがインストールされていない場合・軌跡ファ
+                    イルが違う場合も
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        header, arrays = Checkpoint.read(path)
+        if header["engine"] == ENGINE_ARRAY and not import_np():
+            raise ValueError("NumPyがインストールされていないため、配列版エンジンは使用できません")
+
+        #パラメータ
+        if self.up is None:
+            self.up = UsrPrms()
+            self.up.loaddefault()
+        for key, value in header["prm"].items():
+            self.up.ups_dic[key].set(value)
+        self.prm = PrmSnap(header["prm"])
+        if header["next_prm"] is None:
+            self.next_prm = None
+        else:
+            self.next_prm = PrmSnap(header["next_prm"])
+        self.ckpt_every = self.prm.checkpoint_cycle
+
+        #シミュレーションの状態
+        self.seed = header["seed"]
+        self.now_cycle = header["now_cycle"]
+        self.sim_history = header["sim_history"]
+        self.ecoact = header["ecoact"]
+        self.ecoeffect = header["ecoeffect"]
+        self.i_t_max, self.i_n_max, self.i_l_max, self.i_h_max, self.i_lh_max = header["i_max"]
+        self.sentences.clear()
+        #履歴（ストリーム出力していた場合は、保存時の位置から続ける）
+        self.sim_histories.close()
+        self.sim_histories = HistBuffer()
+        self.sim_histories.setstate(header["hist_state"], arrays["histories"].tolist(), stream)
+        if self.sim_histories.sink is None:
+            self.hist_path = None
+        else:
+            self.hist_path = self.sim_histories.sink.path
+        #軌跡（記録していた場合は、保存時のサイクルから続ける）
+        self.closetraj()
+        traj = header.get("traj")
+        if stream and traj is not None:
+            self.traj_path = traj["path"]
+            self.traj_delta = traj["delta"]
+            self.opentraj(self.now_cycle)
+        else:
+            self.traj_path = None
+
+        #エンジン
+        self.engine_kind = header["engine"]
+        if self.engine_kind == ENGINE_ARRAY:
+            self.engine = ArrayEngine.__new__(ArrayEngine)
+        elif self.engine_kind == ENGINE_EVENT:
+            self.engine = EventEngine.__new__(EventEngine)
+        else:
+            self.engine = PersonEngine.__new__(PersonEngine)
+        self.engine.setstate(self.prm, self.seed, header["engine_state"], arrays)
+
+    def hist_summry(self):
+        """サマリ作成
+        
+         ヒストリーを集計してサマリを作成する。
+         サマリはサマリ表示用リストに格納する。
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #表示
+        self.sentences.append("画面初期構築時間(ms)={}".format(self.tr.buildtime.getelapsedtime()))
+        self.sentences.append("シミュレーションセットアップ時間(ms)={}".format(self.tr.buildsimtime.getelapsedtime()))
+        self.sentences.append("シミュレーション総実行時間(ms)={}".format(self.tr.allsimtime.getelapsedtime()))
+        self.sentences.append("　移動実行時間(ms)={}".format(self.tr.allmovetime))
+        self.sentences.append("　判定実行時間(ms)={}".format(self.tr.allrenewtime))
+        self.sentences.append("　画面描写時間(ms)={}".format(self.tr.alldrawtime))
+        self.sentences.append("乱数シード={}".format(self.seed))
+        if self.ckpt_path is not None:
+            self.sentences.append("チェックポイント={}".format(os.path.abspath(self.ckpt_path)))
+        self.sentences.append("-"*50)
+
+        #人数カウント
+        s_cnt, r_cnt, d_cnt, i_n_cnt, i_l_cnt, i_h_cnt = self.engine.final_counts()
+        i_cnt=r_cnt+d_cnt
+    
+        self.sentences.append("収束までのサイクル={}".format(self.now_cycle))    
+        self.sentences.append("非感染者人数={} 非感染率(対人口)={}%".format(s_cnt,round(s_cnt/self.prm.total_persons_count*100,2)))
+        self.sentences.append("回復者人数={} 回復率(対感染者)={}%".format(r_cnt,round(r_cnt/i_cnt*100,2)))
+        self.sentences.append("死亡者人数={} 死亡率(対人口)={}%".format(d_cnt,round(d_cnt/self.prm.total_persons_count*100,2)))
+        self.sentences.append("死亡者人数={} 死亡率(対感染者)={}%".format(d_cnt,round(d_cnt/i_cnt*100,2)))
+        self.sentences.append("症状なし人数={} 発生率(対感染者)={}%".format(i_n_cnt,round(i_n_cnt/i_cnt*100,2)))
+        self.sentences.append("軽症人数={} 発生率(対感染者)={}%".format(i_l_cnt,round(i_l_cnt/i_cnt*100,2)))
+        self.sentences.append("重症人数={} 発生率(対感染者)={}%".format(i_h_cnt,round(i_h_cnt/i_cnt*100,2)))
+
+        #ピーク時感染者数（合計）・感染者数（軽症＋重症）
+        self.sentences.append("ピーク時感染者(合計)：サイクル={} 人数={}".format(self.i_t_max[1],self.i_t_max[0]))
+        self.sentences.append("ピーク時感染者(軽症＋重症)：サイクル={} 人数={}".format(self.i_lh_max[1],self.i_lh_max[0]))
+        self.sentences.append("ピーク時感染者(症状なし)：サイクル={} 人数={}".format(self.i_n_max[1],self.i_n_max[0]))
+        self.sentences.append("ピーク時感染者(軽症)：サイクル={} 人数={}".format(self.i_l_max[1],self.i_l_max[0]))
+        self.sentences.append("ピーク時感染者(重症)：サイクル={} 人数={}".format(self.i_h_max[1],self.i_h_max[0]))
+
+        #最大経済影響・平均経済影響
+        #（ストリーム出力する場合も全サイクルで集計するため、履歴の集計を使う）
+        his = self.sim_histories
+        self.sentences.append("最大経済影響：サイクル={} 割合={}%".format(his.argmin[8],his.colmin[8]))
+        avr_eco = his.colsum[8]/len(his)
+        self.sentences.append("平均経済影響：{}%".format(round(avr_eco,2)))
+
+    def allhistories(self):
+        """全サイクルの履歴
+
+         全サイクル分のシミュレーション履歴を返す
+
+        Args:なし
+        Returns:
+            シミュレーション履歴(sim_historyのリストとして参照できる
+            もの)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ストリーム出力している場合は、出力したファイルから読む
+            （HistSink.readrows()。１行ずつ読むため、メモリに溜め
+            ない）
+        """
+        sink = self.sim_histories.sink
+        if sink is None:
+            return self.sim_histories
+        sink.flush()
+        return HistSink.readrows(sink.path)
+
+    def writehistory(self, out_f):
+        """シミュレーション結果保存(ファイル指定)
+        
+         シミュレーション結果を指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ストリーム出力している場合は、出力したファイルから全サ
+            イクルを読んで保存する（出力先と同じcsvの場合は何もし
+            ない）
+        """
+        sink = self.sim_histories.sink
+        if sink is not None and os.path.exists(out_f) and os.path.samefile(sink.path, out_f):
+            sink.flush()
+            return
+        rows = self.allhistories()
+        csv_title = [titles[0] for titles in DSP_TITLES_DIC]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        csvout.writerows(rows)
+        a.close()
+
+class BatchSimulation():
+    """BatchSimulation【レプリカ一括実行クラス】
+
+        同じパラメータで、乱数シードだけを変えたシミュレーション
+        （レプリカ）を、BatchEngineでまとめて実行し、レプリカ毎の
+        シミュレーション履歴を作るクラスです。画面なしで実行しま
+        す（Ensembleから、エンジンにENGINE_BATCHを指定した場合に
+        使用します）。
+        終了判定（Simulation.isend()）は、レプリカ毎に行います。
+        終了したレプリカはエンジンから取り除き、全レプリカが終了し
+        たら実行を終えます。
+
+    Attributes:
+        up(UsrPrms):ユーザーパラメータ
+        seeds[](int):レプリカ毎の乱数シード
+        prm(PrmSnap):パラメータ
+        engine(BatchEngine):シミュレーションエンジン
+        now_cycle(int):現在サイクル
+        ecoact(float):経済活動割合（分母）
+        last_i[](int):実行中のレプリカ毎の、前サイクルの感染者数
+                (engine.repと同じ並び)
+        blocks[](ndarray,ndarray):サイクル毎の(レプリカ番号,履歴)
+                ※実行中のレプリカの分だけ。run()の最後に
+                sim_historiesにまとめる
+        sim_histories[](HistBuffer):レプリカ毎のシミュレーション履歴
+    """
+    def __init__(self, up, seeds):
+        """コンストラクタ
+
+         インスタンスの構築を行う
+
+        Args:
+            up(UsrPrms):ユーザーパラメータ(Noneの場合はデフォルト値)
+            seeds[](int):レプリカ毎の乱数シード
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.up = up
+        self.seeds = list(seeds)
+        self.prm = None
+        self.engine = None
+        self.now_cycle = 0
+        self.ecoact = 0.0
+        self.last_i = None
+        self.blocks = []
+        self.sim_histories = []
+
+    def setup(self):
+        """シミュレーションデータのセットアップ
+
+         全レプリカのシミュレーションデータを初期化する
+
+        Args:なし
+        Returns:なし
+        Raises:
+            ValueError:NumPyがインストールされていない
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if not import_np():
+            raise ValueError("NumPyがインストールされていないため、一括実行エンジンは使用できません")
+        if self.up is None:
+            self.prm = defaultprm()
+        else:
+            self.prm = self.up.compile()
+        self.ecoact = self.prm.total_persons_count*self.prm.move_r
+        self.now_cycle = 0
+        self.engine = BatchEngine(self.prm, self.seeds)
+        self.last_i = np.zeros(len(self.seeds), dtype=np.int64)
+        self.blocks = []
+        self.sim_histories = []
+
+    def sim_cycle(self):
+        """シミュレーション１サイクル実行
+
+         実行中の全レプリカの移動・感染判定を行い、レプリカ毎に
+         人数をカウントして履歴を作る（Simulation.sim_cycle()と
+         同じ項目）
+
+        Args:なし
+        Returns:
+            レプリカ毎の感染者数の配列(ndarray)(engine.repと同じ並び)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        engine = self.engine
+        engine.move()
+        engine.stat_renew(self.now_cycle)
+
+        # no,s,i_n,i_l,i_h,r,d,R,ECO
+        cnt = engine.counts()
+        now_i = cnt[:, 1:4].sum(axis=1)
+        rows = np.zeros((cnt.shape[0], HIST_COLS))
+        rows[:, 0] = self.now_cycle
+        rows[:, 1:7] = cnt
+
+        #実行再生産数：直近の免疫獲得サイクルので計測
+        if self.now_cycle > 0:
+            calc = (self.last_i > 1) & (now_i > 0)
+            rows[calc, 7] = np.round(np.log(now_i[calc]) / np.log(self.last_i[calc]), 4)
+
+        #経済活動割合
+        rows[:, 8] = np.round(engine.movesum() / self.ecoact*100, 2)
+
+        self.blocks.append((engine.rep, rows))
+        return now_i
+
+    def run(self):
+        """シミュレーションの実行（画面なし）
+
+         セットアップを行い、全レプリカが終了するまでサイクルを実
+         行する。終了後に、レプリカ毎の履歴を作る。
+
+        Args:なし
+        Returns:なし
+        Raises:
+            ValueError:NumPyがインストールされていない
+        Yields:なし
+        Examples:なし
+        Note:
+            終了判定はSimulation.isend()と同じ（打ち切りサイクルを
+            越えたか、感染者がゼロになった）
+        """
+        self.setup()
+        while True:
+            now_i = self.sim_cycle()
+            #終了したレプリカ（打ち切りサイクルは全レプリカ共通）
+            if self.now_cycle > self.prm.cycle_max:
+                break
+            keep = now_i > 0
+            if not keep.any():
+                break
+            if not keep.all():
+                self.engine.drop(keep)
+            self.last_i = now_i[keep]
+            self.now_cycle += 1
+
+        #サイクル毎の履歴を、レプリカ毎に並べ直す（同じレプリカはサイクル順）
+        reps = np.concatenate([rep for rep, rows in self.blocks])
+        rows = np.concatenate([rows for rep, rows in self.blocks])
+        order = np.argsort(reps, kind="stable")
+        bounds = np.searchsorted(reps[order], np.arange(len(self.seeds)+1))
+        rows = rows[order]
+        self.blocks = []
+        self.sim_histories = []
+        for k in range(len(self.seeds)):
+            histories = HistBuffer()
+            for row in rows[bounds[k]:bounds[k+1]].tolist():
+                row[:HIST_INT_COLS] = [int(v) for v in row[:HIST_INT_COLS]]
+                histories.append(row)
+            self.sim_histories.append(histories)
+
+    def metrics(self):
+        """結果サマリの指標
+
+         レプリカ毎に、結果サマリの指標を求める（replicametric()
+         と同じ）
+
+        Args:なし
+        Returns:指標の辞書(ENSEMBLE_METRICS)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ピーク時感染者が同じ人数のサイクルが複数ある場合は、後
+            のサイクルとする（Simulation.sim_cycle()と同じ）
+        """
+        result = []
+        for histories in self.sim_histories:
+            peak_i, peak_cycle = 0, 0
+            for row in histories:
+                if sum(row[2:5]) >= peak_i:
+                    peak_i, peak_cycle = sum(row[2:5]), row[0]
+            result.append({"peak_i":peak_i, "peak_cycle":peak_cycle, "dead":histories[-1][6],   \
+                "min_eco":histories.colmin[8],   \
+                "avr_eco":histories.colsum[8]/len(histories), "cycles":histories[-1][0]})
+        return result
+
+class Ensemble():
+    """Ensemble【アンサンブル実行クラス】
+
+        同じパラメータで、乱数シードだけを変えたシミュレーション
+        （レプリカ）を複数回実行し、結果を集計するクラスです。
+        １回のシミュレーションは乱数によって結果が大きく変わるた
+        め、サイクル毎の人数の平均と5%/50%/95%点（バンド）、結果
+        サマリの指標のばらつきを求めます。
+        各レプリカは、別プロセス（ProcessPoolExecutor）で並列に
+        実行します（runreplica()）。エンジンがENGINE_BATCHの場合
+        は、BATCH_ELEMENTSの大きさ毎にレプリカをまとめ、まとめた
+        単位で並列に実行します（runbatch()）。
+
+    Attributes:
+        up(UsrPrms):ユーザーパラメータ
+        count(int):レプリカの数
+        engine(str):シミュレーションエンジン
+        workers(int):並列数(プロセス数)
+        seed(int):元になる乱数シード
+        seeds[](int):レプリカ毎の乱数シード(重複しない)
+        histories[](sim_histories):レプリカ毎のシミュレーション履歴
+        metrics[](dic):レプリカ毎の結果サマリの指標
+                key(str):指標のキー(ENSEMBLE_METRICS)
+                value(int or float):値
+        band[][](float):サイクル毎の集計結果
+                [サイクル, 項目毎の(平均,5%,50%,95%)...]
+                ※項目はBAND_COLUMNSの順
+        sentences[](str):サマリ表示文字列(1行)のリスト
+        cache_dir(str):実行結果のキャッシュのディレクトリ
+                (Noneの場合はキャッシュを使わない)
+        alltime(StopWatch):実行時間計測用
+    """
+    def __init__(self, up, count, engine=ENGINE_PERSON, workers=None, cache_dir=None):
+        """コンストラクタ
+        
+         アンサンブル実行の準備を行う
+
+        Args:
+            up(UsrPrms):ユーザーパラメータ
+            count(int):レプリカの数
+            engine(str,optional):シミュレーションエンジン。
+                    ※Simulation.setup()を参照。ENGINE_BATCHも指定できる
+            workers(int,optional):並列数。省略時はCPUのコア数
+            cache_dir(str,optional):実行結果のキャッシュのディレクトリ
+                    (ResultCache)(省略時はキャッシュを使わない)
+        Returns:なし
+        Raises:
+            ValueError:レプリカの数が1未満
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if count < 1:
+            raise ValueError("アンサンブル回数は1以上にしてください: {}".format(count))
+        self.up = up
+        self.count = count
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.seed = None
+        self.seeds = []
+        self.histories = []
+        self.metrics = []
+        self.band = []
+        self.sentences = []
+        self.alltime = StopWatch()
+
+    def run(self):
+        """アンサンブル実行
+        
+         レプリカを並列に実行し、結果を集計する
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.alltime.start()
+        prm_dic = self.up.getdic()
+
+        #レプリカ毎のシード（元のシードが同じなら、同じシードの列）
+        if prm_dic["seed"] == 0:
+            self.seed = SimRandom.newseed()
+        else:
+            self.seed = prm_dic["seed"]
+        self.seeds = SimRandom(self.seed).sample(range(1, 2**31), self.count)
+
+        if self.engine == ENGINE_BATCH:
+            #一括実行（BATCH_ELEMENTSの大きさ毎に、まとめて１プロセスで実行）
+            persons = prm_dic["s_persons_count"] + prm_dic["i_persons_count"]   \
+                + prm_dic["r_persons_count"] + prm_dic["d_persons_count"]
+            size = max(1, BATCH_ELEMENTS // max(1, persons))
+            blocks = [self.seeds[i:i+size] for i in range(0, self.count, size)]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(self.workers, len(blocks))) as executor:
+                results = [r for rs in executor.map(runbatch, [prm_dic]*len(blocks), blocks,   \
+                    [self.cache_dir]*len(blocks)) for r in rs]
+        else:
+            #並列実行（まとめて渡して、プロセス間のやりとりを減らす）
+            chunksize = max(1, self.count // (self.workers*4))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(runreplica, [prm_dic]*self.count, [self.engine]*self.count,  \
+                    self.seeds, [None]*self.count, [self.cache_dir]*self.count, chunksize=chunksize))
+        #キャッシュの大きさの調整は、全レプリカが終わってから１回だけ行う
+        if self.cache_dir is not None:
+            ResultCache(self.cache_dir).evict()
+        self.histories = [r[0] for r in results]
+        self.metrics = [r[1] for r in results]
+
+        self.aggregate()
+        self.alltime.stop()
+        self.summry()
+
+    def aggregate(self):
+        """サイクル毎の集計
+        
+         レプリカの履歴を、サイクル毎・項目毎に集計する（平均と
+         5%/50%/95%点）
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            先に終了したレプリカは、終了時の状態のまま続いてい
+            るものとして（最後のサイクルの値で）集計する
+        """
+        self.band = []
+        length = max(len(h) for h in self.histories)
+        for cycle in range(length):
+            rows = [h[min(cycle, len(h)-1)] for h in self.histories]
+            band_row = [cycle]
+            for pos, title in BAND_COLUMNS:
+                if pos < 0:
+                    values = sorted(sum(row[2:5]) for row in rows)
+                else:
+                    values = sorted(row[pos] for row in rows)
+                band_row.append(round(sum(values)/len(values), 4))
+                for q in BAND_QUANTILES:
+                    band_row.append(round(quantile(values, q), 4))
+            self.band.append(band_row)
+
+    def bandcol(self, title):
+        """集計結果（項目別）の取得
+        
+         指定した項目の、サイクル毎の(平均,5%,50%,95%)を返す
+
+        Args:
+            title(str):項目のタイトル(BAND_COLUMNS)
+        Returns:(平均,5%,50%,95%)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:
+            ens.bandcol("感染(計)")
+        Note:なし
+        """
+        idx = [t for p, t in BAND_COLUMNS].index(title)*len(BAND_STATS) + 1
+        return [row[idx:idx+len(BAND_STATS)] for row in self.band]
+
+    def summry(self):
+        """サマリ作成
+        
+         結果サマリの指標のばらつき（平均と5%/50%/95%点）を、サ
+         マリ表示用リストに格納する
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.sentences.clear()
+        self.sentences.append("アンサンブル回数={} 並列数={}".format(self.count, self.workers))
+        self.sentences.append("乱数シード={}".format(self.seed))
+        self.sentences.append("アンサンブル総実行時間(ms)={}".format(self.alltime.getelapsedtime()))
+        self.sentences.append("-"*50)
+        for key, title in ENSEMBLE_METRICS:
+            values = sorted(m[key] for m in self.metrics)
+            self.sentences.append("{}：平均={} {}={} {}={} {}={}".format(title, round(sum(values)/len(values), 2),  \
+                *[x for q, st in zip(BAND_QUANTILES, BAND_STATS[1:]) for x in (st, round(quantile(values, q), 2))]))
+
+    def store(self, store):
+        """実行結果の保存
+
+         レプリカ毎の実行結果を、実行結果の保存先に追加する
+
+        Args:
+            store(RunStore):実行結果の保存先
+        Returns:追加した実行の番号(run_id)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        prm_dic = self.up.getdic()
+        return [store.add(prm_dic, seed, metric, histories, "ensemble", self.engine)   \
+            for seed, metric, histories in zip(self.seeds, self.metrics, self.histories)]
+
+    def writeband(self, out_f):
+        """集計結果保存(ファイル指定)
+        
+         サイクル毎の集計結果を指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        csv_title = [DSP_TITLES_DIC[0][0]] + ["{}({})".format(t, st) for p, t in BAND_COLUMNS for st in BAND_STATS]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        csvout.writerows(self.band)
+        a.close()
+
+class Sweep():
+    """Sweep【パラメータスイープクラス】
+
+        指定したパラメータを変化させ、その組合せ（グリッド）毎に
+        シミュレーションを実行するクラスです。組合せ毎の結果サマ
+        リの指標と、サイクル毎の人数を保持します。
+        各組合せは、プロセスプール（ProcessPoolExecutor）で並列
+        に実行します。プールは全組合せで共通のため、プロセスの起
+        動は最初の１回だけです。
+
+    Attributes:
+        up(UsrPrms):元にするユーザーパラメータ
+        spec(dic):変化させるパラメータと値のリスト
+                key(str):パラメータのタグ名(UsrPrms.ups_dicのキー)
+                value[](int or float):値のリスト
+        engine(str):シミュレーションエンジン
+        workers(int):並列数(プロセス数)
+        seed(int):元になる乱数シード
+        points[](dic):組合せ毎のパラメータ値(変化させるものだけ)
+        seeds[](int):組合せ毎の乱数シード(全組合せで同じ)
+        histories[](sim_histories):組合せ毎のシミュレーション履歴
+                ※ストリーム出力する場合は、すべてNone
+        metrics[](dic):組合せ毎の結果サマリの指標
+                ※Ensemble.metricsを参照
+        hist_path(str):サイクル毎の人数(csv)の保存先
+                (Noneの場合は、履歴をメモリに保持する)
+                ※指定した場合は、組合せ毎に、履歴を一時ファイル
+                （hist_path.番号.part）にストリーム出力する
+        cache_dir(str):実行結果のキャッシュのディレクトリ
+                (Noneの場合はキャッシュを使わない)
+        alltime(StopWatch):実行時間計測用
+    """
+    def __init__(self, up, spec, engine=ENGINE_PERSON, workers=None, hist_path=None, cache_dir=None):
+        """コンストラクタ
+        
+         組合せ（グリッド）を展開する
+
+        Args:
+            up(UsrPrms):元にするユーザーパラメータ
+            spec(dic):変化させるパラメータと範囲
+                key(str):パラメータのタグ名
+                value:値のリスト、または範囲の辞書
+                    {"start":開始値, "stop":終了値, "step":増分}
+                    ※終了値を含む
+                    ※人口密度(density)は、フィールドサイズに変換する
+                    (pointdic()を参照)
+            engine(str,optional):シミュレーションエンジン。
+                    ※Simulation.setup()を参照
+            workers(int,optional):並列数。省略時はCPUのコア数
+            hist_path(str,optional):サイクル毎の人数(csv)の保存先
+                    （履歴をストリーム出力する）
+            cache_dir(str,optional):実行結果のキャッシュのディレクトリ
+                    (ResultCache)(省略時はキャッシュを使わない)
+        Returns:なし
+        Raises:
+            KeyError:存在しないパラメータ、または変化させられない
+                    パラメータ(SWEEP_FIXED_KEYS)が指定された
+            ValueError:範囲の指定が間違っている（人口密度が0以下・
+                    人口密度とフィールドサイズを両方変化させた）
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.up = up
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.spec = {}
+        for key, values in spec.items():
+            if key not in up.ups_dic:
+                raise KeyError("unknown parameter: {}".format(key))
+            if key in SWEEP_FIXED_KEYS:
+                raise KeyError("parameter cannot be swept: {}".format(key))
+            self.spec[key] = self.expand(up.ups_dic[key], values)
+        #人口密度は、フィールドサイズに変換して変化させる
+        if "density" in self.spec:
+            if "field_size" in self.spec:
+                raise ValueError("density and field_size cannot be swept together")
+            if min(self.spec["density"]) <= 0:
+                raise ValueError("density must be positive: {}".format(self.spec["density"]))
+        self.points = [dict(zip(self.spec.keys(), p)) for p in itertools.product(*self.spec.values())]
+        self.seed = None
+        self.seeds = []
+        self.histories = []
+        self.metrics = []
+        self.hist_path = hist_path
+        self.cache_dir = cache_dir
+        self.alltime = StopWatch()
+
+    @staticmethod
+    def expand(userprm, values):
+        """範囲の展開
+        
+         範囲の指定を、値のリストに展開する
+
+        Args:
+            userprm(UserPrm):対象のパラメータ(値のタイプの判定用)
+            values:値のリスト、または範囲の辞書
+                    {"start":開始値, "stop":終了値, "step":増分}
+        Returns:値のリスト
+        Raises:
+            ValueError:範囲の指定が間違っている
+        Yields:なし
+        Examples:
+            {"start":0.0, "stop":0.3, "step":0.1} → [0.0, 0.1, 0.2, 0.3]
+        Note:なし
+        """
+        if isinstance(values, dict):
+            start, stop, step = values["start"], values["stop"], values["step"]
+            if step <= 0 or stop < start:
+                raise ValueError("bad range for {}: {}".format(userprm.gettag(), values))
+            #小数の誤差で終了値が抜けないように、個数を先に求める
+            count = int(round((stop - start) / step)) + 1
+            values = [round(start + i*step, 10) for i in range(count)]
+        if 0 == len(values):
+            raise ValueError("no values for {}".format(userprm.gettag()))
+        if userprm.valuetype == VAL_INT:
+            values = [int(round(v)) for v in values]
+        return list(values)
+
+    def run(self, progress=None):
+        """パラメータスイープ実行
+        
+         全組合せを並列に実行する
+
+        Args:
+            progress(function,optional):進捗通知用の関数
+                    progress(終了数, 全体数, 経過時間(秒))
+                    ※組合せが１つ終わる度に呼ばれる
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            全組合せで同じ乱数シードを使う（組合せ間で、乱数の違
+            いではなくパラメータの違いを比べられるように）
+        """
+        self.alltime.start()
+        prm_dic = self.up.getdic()
+        if prm_dic["seed"] == 0:
+            self.seed = SimRandom.newseed()
+        else:
+            self.seed = prm_dic["seed"]
+        self.seeds = [self.seed]*len(self.points)
+
+        results = [None]*len(self.points)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for i, point in enumerate(self.points):
+                point_dic = self.pointdic(prm_dic, point)
+                futures[executor.submit(runreplica, point_dic, self.engine, self.seeds[i], self.partpath(i),   \
+                    self.cache_dir)] = i
+            done = 0
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+                done += 1
+                if progress is not None:
+                    progress(done, len(self.points), time.time() - self.alltime.getstarttime())
+        self.histories = [r[0] for r in results]
+        self.metrics = [r[1] for r in results]
+        if self.cache_dir is not None:
+            ResultCache(self.cache_dir).evict()
+        self.alltime.stop()
+
+    def pointdic(self, prm_dic, point):
+        """組合せのパラメータ値
+
+         元のパラメータ値に、組合せの値を反映する。人口密度を変化
+         させる場合は、その密度になるフィールドサイズ（整数に丸め
+         る）にする。計算値（初期人数の合計・人口密度）は、反映し
+         た値から計算し直す（UsrPrms.recalc()と同じ）
 
-        パラメータ入力用wedgitを構築します。
-        項目名を示すラベル(label)と入力域(entry)をセットで構築
-        します。(項目名：左側、入力域：右側)
-        データの入出力は、パラメータとして渡されるUserPrmクラス
-        内の、StiringVarクラス(Tkinter)を介して行われます。
-        入力なし（データ表示のみ）の場合は、入力域(entry)のかわ
-        りにラベル(label)を使ってデータを表示します。
+        Args:
+            prm_dic(dic):元のパラメータ値の辞書(UsrPrms.getdic())
+            point(dic):組合せのパラメータ値(pointsの要素)
+        Returns:組合せのパラメータ値の辞書(dic)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        point_dic = dict(prm_dic)
+        point_dic.update(point)
+        total = point_dic["s_persons_count"] + point_dic["i_persons_count"]   \
+            + point_dic["r_persons_count"] + point_dic["d_persons_count"]
+        if "density" in point:
+            #人口密度 = 総人数÷フィールド面積×DENCTY_CELL^2 (Total4dncty)
+            point_dic["field_size"] = max(1, int(round(math.sqrt(total/point["density"])*DENCTY_CELL)))
+        point_dic["total_persons_count"] = total
+        point_dic["density"] = total/point_dic["field_size"]**2*(DENCTY_CELL**2)
+        return point_dic
+
+    def writesummary(self, out_f):
+        """結果保存(ファイル指定)
+        
+         組合せ毎に１行、変化させたパラメータの値と結果サマリの
+         指標を、指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        csv_title = ["No"] + list(self.spec.keys()) + ["seed"] + [title for key, title in ENSEMBLE_METRICS]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        for i, point in enumerate(self.points):
+            csvout.writerow([i] + list(point.values()) + [self.seeds[i]] +   \
+                [self.metrics[i][key] for key, title in ENSEMBLE_METRICS])
+        a.close()
+
+    def store(self, store):
+        """実行結果の保存
+
+         組合せ毎の実行結果を、実行結果の保存先に追加する
+
+        Args:
+            store(RunStore):実行結果の保存先
+        Returns:追加した実行の番号(run_id)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ストリーム出力した場合は、組合せ毎の一時ファイルから読
+            む（writehistories()より前に呼び出すこと）
+        """
+        prm_dic = self.up.getdic()
+        run_ids = []
+        for i, point in enumerate(self.points):
+            point_dic = self.pointdic(prm_dic, point)
+            histories = self.histories[i]
+            if histories is None:
+                histories = HistSink.readrows(self.partpath(i))
+            run_ids.append(store.add(point_dic, self.seeds[i], self.metrics[i], histories, "sweep", self.engine))
+        return run_ids
+
+    def partpath(self, i):
+        """組合せ毎の履歴の一時ファイル
+
+        Args:
+            i(int):組合せ番号
+        Returns:
+            一時ファイルのパス(str)(ストリーム出力しない場合はNone)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        if self.hist_path is None:
+            return None
+        return "{}.{}.part".format(self.hist_path, i)
+
+    def writehistories(self, out_f):
+        """シミュレーション履歴保存(ファイル指定)
+        
+         組合せ毎のシミュレーション履歴を、先頭に組合せ番号を付け
+         て、指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ストリーム出力した場合は、組合せ毎の一時ファイルを順に
+            つなげて、一時ファイルは消す
+        """
+        csv_title = ["No"] + [titles[0] for titles in DSP_TITLES_DIC]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        for i, histories in enumerate(self.histories):
+            if histories is None:
+                histories = HistSink.readrows(self.partpath(i))
+            csvout.writerows([i] + row for row in histories)
+            if self.hist_path is not None:
+                os.remove(self.partpath(i))
+        a.close()
+
+class RunStore():
+    """RunStore【実行結果の保存先クラス】
+
+        シミュレーションの結果を、パラメータと結び付けて、SQLite
+        のファイル（データベース）に保存するクラスです。保存した
+        結果は、パラメータや結果サマリの指標の範囲で検索できます。
+        以下の３つの表を持ちます（実行毎の番号run_idで結び付く）。
+        ・params:実行毎のパラメータ（パラメータ毎の列。乱数シード
+          は、実際に使ったシード）と、実行の種類(kind)・エンジン・
+          保存日時
+        ・summary:実行毎の結果サマリの指標(ENSEMBLE_METRICS)
+        ・history:サイクル毎の人数（sim_historyの項目の列）
+        paramsとsummaryは、すべての列に索引を作ります（範囲の検索
+        用）。historyは、(run_id,サイクル)の順に並べて保持します
+        （WITHOUT ROWID。実行毎・サイクルの範囲で読み出せる）。
+        サイクル毎の人数は、実行毎に１回のトランザクションでまと
+        めて追加します（行数が多くても、メモリに溜めずに順に追加
+        します）。
 
     Attributes:
-        parent(Frame):wedgitを配置する親フレーム
-        row(int):配置する行数
-        userprm(UserPrm):データ格納用クラス
-        lb(Label):項目表示用のラベル(label)wedgit
-        entry(Entory or Label):データ入力域wedgit
-                ※入力なし（データ表示のみ）の場合は、ラベルwedgit
+        path(str):データベースファイルのパス
+        conn(sqlite3.Connection):データベースへの接続
+    """
+    #パラメータの列（PrmSnapの項目。計算済みの値は除く）
+    PRM_KEYS = tuple(key for key in PrmSnap.__slots__ if key not in PrmSnap.DERIVED)
+    #結果サマリの指標の列
+    METRIC_KEYS = tuple(key for key, title in ENSEMBLE_METRICS)
+    #サイクル毎の人数の列（sim_historyの並び）
+    HIST_KEYS = CycleRecord.__slots__[:HIST_COLS]
+    #実行の種類・エンジン・保存日時の列
+    RUN_KEYS = ("run_id", "kind", "engine", "created")
+    #検索条件の比較演算子
+    OPS = ("<=", ">=", "!=", "<", ">", "=")
+
+    def __init__(self, path):
+        """コンストラクタ
+
+         データベースファイルを開く（無い場合は作る）
+
+        Args:
+            path(str):データベースファイルのパス
+        Returns:なし
+        Raises:
+            ValueError:版数が違う（このプログラムで作ったファイルではない）
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        #書込み中も読めるように、ログ先行書込み(WAL)にする
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            self.create()
+        elif version != STORE_VERSION:
+            self.conn.close()
+            raise ValueError("{} is not a run store (version {})".format(path, version))
+
+    def create(self):
+        """表の作成
+
+         表と索引を作る
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        with self.conn:
+            self.conn.execute("CREATE TABLE params (run_id INTEGER PRIMARY KEY, kind TEXT, engine TEXT, created TEXT, {})"   \
+                .format(", ".join("{} NUMERIC".format(key) for key in self.PRM_KEYS)))
+            self.conn.execute("CREATE TABLE summary (run_id INTEGER PRIMARY KEY REFERENCES params(run_id), {})"   \
+                .format(", ".join("{} NUMERIC".format(key) for key in self.METRIC_KEYS)))
+            self.conn.execute("CREATE TABLE history (run_id INTEGER NOT NULL REFERENCES params(run_id), {}, {},"   \
+                " PRIMARY KEY (run_id, {})) WITHOUT ROWID".format(   \
+                ", ".join("{} INTEGER NOT NULL".format(key) for key in self.HIST_KEYS[:HIST_INT_COLS]),   \
+                ", ".join("{} REAL".format(key) for key in self.HIST_KEYS[HIST_INT_COLS:]), self.HIST_KEYS[0]))
+            for key in ("kind",) + self.PRM_KEYS:
+                self.conn.execute("CREATE INDEX params_{0} ON params ({0})".format(key))
+            for key in self.METRIC_KEYS:
+                self.conn.execute("CREATE INDEX summary_{0} ON summary ({0})".format(key))
+            self.conn.execute("PRAGMA user_version = {}".format(STORE_VERSION))
+
+    def add(self, prm_dic, seed, metric, rows, kind, engine=ENGINE_PERSON):
+        """実行結果の追加
+
+         １回の実行の、パラメータ・結果サマリの指標・サイクル毎の
+         人数を、１回のトランザクションで追加する
+
+        Args:
+            prm_dic(dic):パラメータ値の辞書(UsrPrms.getdic())
+            seed(int):実際に使った乱数シード
+            metric(dic):結果サマリの指標の辞書(ENSEMBLE_METRICS)
+            rows(iterable):サイクル毎の人数(sim_history)
+                    ※リスト・HistBuffer・HistSink.readrows()など
+            kind(str):実行の種類(コマンド名。"run"・"ensemble"など)
+            engine(str,optional):シミュレーションエンジン
+        Returns:追加した実行の番号(run_id)(int)
+        Raises:なし
+        Yields:なし
+        Examples:
+            store.add(sim.prm.getdic(), sim.seed, replicametric(sim), sim.allhistories(), "run")
+        Note:
+            途中で例外になった場合は、その実行の分は追加しない（ロール
+            バックする）
+        """
+        values = [prm_dic[key] for key in self.PRM_KEYS]
+        values[self.PRM_KEYS.index("seed")] = seed
+        created = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO params (kind, engine, created, {}) VALUES ({})".format(   \
+                ", ".join(self.PRM_KEYS), ", ".join(["?"]*(len(self.PRM_KEYS)+3))), [kind, engine, created] + values)
+            run_id = cur.lastrowid
+            self.conn.execute("INSERT INTO summary VALUES ({})".format(", ".join(["?"]*(len(self.METRIC_KEYS)+1))),   \
+                [run_id] + [metric[key] for key in self.METRIC_KEYS])
+            self.conn.executemany("INSERT INTO history VALUES ({})".format(", ".join(["?"]*(HIST_COLS+1))),   \
+                ([run_id] + list(row) for row in rows))
+        return run_id
+
+    @classmethod
+    def parsecond(cls, text):
+        """検索条件の解析
+
+         "列名 演算子 値"の文字列を、検索条件にする
+
+        Args:
+            text(str):検索条件の文字列
+        Returns:
+            (列名, 演算子, 値)のタプル
+        Raises:
+            ValueError:列名・演算子が間違っている
+        Yields:なし
+        Examples:
+            RunStore.parsecond("infection_rate>=0.5") → ("infection_rate", ">=", 0.5)
+        Note:
+            値は、数値にできる場合は数値、それ以外は文字列とする
+        """
+        for op in cls.OPS:
+            if op in text:
+                key, value = [s.strip() for s in text.split(op, 1)]
+                break
+        else:
+            raise ValueError("no operator in condition: {}".format(text))
+        if key not in cls.RUN_KEYS + cls.PRM_KEYS + cls.METRIC_KEYS:
+            raise ValueError("unknown column: {}".format(key))
+        for conv in (int, float):
+            try:
+                return key, op, conv(value)
+            except ValueError:
+                pass
+        return key, op, value
+
+    def find(self, conds=()):
+        """実行結果の検索
+
+         検索条件にすべて合う実行の、パラメータと結果サマリの指標
+         を返す
+
+        Args:
+            conds[](tuple):検索条件((列名, 演算子, 値)のリスト)
+                    ※parsecond()を参照。省略時はすべて
+        Returns:
+            実行毎の辞書のリスト(run_idの順)
+            key(str):列名(RUN_KEYS・PRM_KEYS・METRIC_KEYS)
+            value:値
+        Raises:
+            ValueError:列名・演算子が間違っている
+        Yields:なし
+        Examples:
+            store.find([("infection_rate", ">=", 0.5), ("peak_i", ">", 80)])
+        Note:なし
+        """
+        keys = self.RUN_KEYS + self.PRM_KEYS + self.METRIC_KEYS
+        where = []
+        args = []
+        for key, op, value in conds:
+            if key not in keys or op not in self.OPS:
+                raise ValueError("bad condition: {} {} {}".format(key, op, value))
+            table = "summary" if key in self.METRIC_KEYS else "params"
+            where.append("{}.{} {} ?".format(table, key, op))
+            args.append(value)
+        sql = "SELECT {} FROM params JOIN summary USING (run_id)".format(   \
+            ", ".join(["params.run_id"] + list(keys[1:])))
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY params.run_id"
+        return [dict(zip(keys, row)) for row in self.conn.execute(sql, args)]
+
+    def history(self, run_id, first=None, last=None):
+        """サイクル毎の人数の読出し
+
+         指定した実行の、サイクル毎の人数を読み出す
+
+        Args:
+            run_id(int):実行の番号
+            first(int,optional):最初のサイクル(省略時は0)
+            last(int,optional):最後のサイクル(省略時は最後まで)
+        Returns:サイクル毎の人数(sim_history)のリスト
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        sql = "SELECT {} FROM history WHERE run_id = ? AND {} >= ?".format(", ".join(self.HIST_KEYS), self.HIST_KEYS[0])
+        args = [run_id, 0 if first is None else first]
+        if last is not None:
+            sql += " AND {} <= ?".format(self.HIST_KEYS[0])
+            args.append(last)
+        sql += " ORDER BY {}".format(self.HIST_KEYS[0])
+        return [list(row) for row in self.conn.execute(sql, args)]
+
+    def close(self):
+        """データベースを閉じる
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.conn.close()
+
+class ResultCache():
+    """ResultCache【実行結果のキャッシュクラス】
+
+        実行結果（サイクル毎の人数と結果サマリ）を、パラメータ・乱
+        数シード・エンジンの版数から求めたキー（ハッシュ値）毎に、
+        ディレクトリ内のファイルに保存しておくクラスです。同じ条件
+        で実行し直す場合は、シミュレーションを実行せずに、保存した
+        結果を使います。
+        キーは、パラメータ値（表示だけのもの(CACHE_IGNORE_KEYS)は除
+        く。値は実数にそろえる）をキーの順に並べたjsonと、乱数シー
+        ド・エンジンの種類と版数(ENGINE_VERSION)のsha256です。
+        ファイルは、以下の形式です。
+        ・先頭：CACHE_MAGIC(8バイト)、中身のsha256(32バイト)
+        ・中身：キーと値の辞書(json)をzlibで圧縮したもの
+        読込み時に、中身のsha256とキーを確かめ、壊れている場合は消
+        して、無かったものとします。書込みは、一時ファイルに書いて
+        から置き換える(os.replace())ため、複数のプロセスから同時に
+        読み書きしても、書きかけのファイルを読むことはありません。
+        大きさの上限を超えた場合は、最後に使った（読み書きした）日
+        時（ファイルの更新日時）が古いものから消します（evict()）。
+
+    Attributes:
+        path(str):キャッシュのディレクトリ
+        max_bytes(int):キャッシュの大きさの上限(バイト)
+    """
+    def __init__(self, path=None, max_bytes=CACHE_MAX_BYTES):
+        """コンストラクタ
+
+         キャッシュのディレクトリを開く（無い場合は作る）
+
+        Args:
+            path(str,optional):キャッシュのディレクトリ
+                    (省略時はCACHE_DIR)
+            max_bytes(int,optional):キャッシュの大きさの上限(バイト)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.path = path or CACHE_DIR
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(prm_dic, seed, engine):
+        """キーの作成
+
+         パラメータ値・乱数シード・エンジンから、キーを求める
+
+        Args:
+            prm_dic(dic):パラメータ値の辞書(UsrPrms.getdic())
+            seed(int or list):乱数シード(一括実行の場合はシードのリスト)
+            engine(str):シミュレーションエンジン
+        Returns:キー(sha256の16進文字列)(str)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            値は実数にそろえる（jsonで1と1.0のように書き方が違っても、
+            同じキーになる）
+        """
+        values = {key: float(value) for key, value in prm_dic.items() if key not in CACHE_IGNORE_KEYS}
+        text = json.dumps({"prm": values, "seed": seed, "engine": engine,   \
+            "version": ENGINE_VERSION[engine]}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def filepath(self, key):
+        """キーのファイルのパス
+
+        Args:
+            key(str):キー
+        Returns:ファイルのパス(str)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        return os.path.join(self.path, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """値の読込み
+
+         キーの値を読み込む
+
+        Args:
+            key(str):キー
+        Returns:
+            値(dic)(無い場合・壊れている場合はNone)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            読み込んだファイルは、更新日時を今にする（最後に使った日時）
+        """
+        path = self.filepath(key)
+        try:
+            b = open(path, "rb")
+            data = b.read()
+            b.close()
+        except FileNotFoundError:
+            return None
+        head = len(CACHE_MAGIC)
+        body = data[head+32:]
+        try:
+            if data[:head] != CACHE_MAGIC or data[head:head+32] != hashlib.sha256(body).digest():
+                raise ValueError("broken cache file")
+            entry = json.loads(zlib.decompress(body).decode("utf-8"))
+            if entry["key"] != key:
+                raise ValueError("cache key mismatch")
+        except (ValueError, KeyError, zlib.error):
+            #壊れている場合は消す（他のプロセスが消した場合もある）
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["value"]
+
+    def put(self, key, value):
+        """値の書込み
+
+         キーの値を書き込む（同じキーがある場合は置き換える）
+
+        Args:
+            key(str):キー
+            value(dic):値(jsonに変換できるもの)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            大きさの上限を超えても、ここでは消さない（evict()を呼
+            び出すこと）
+        """
+        body = zlib.compress(json.dumps({"key": key, "value": value}, separators=(",", ":")).encode("utf-8"))
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as b:
+            b.write(CACHE_MAGIC + hashlib.sha256(body).digest() + body)
+        os.replace(tmp, self.filepath(key))
+
+    def evict(self):
+        """古い値の削除
+
+         キャッシュの大きさが上限を超えている場合は、最後に使った
+         日時が古いものから、上限以下になるまで消す
+
+        Args:なし
+        Returns:消したファイルの数(int)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            他のプロセスが同時に消した場合は、消したものとして数え
+            ない
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.path):
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return removed
+
+class Fork():
+    """Fork【分岐実行クラス】
+
+        一時停止したシミュレーションから、移動制限・外出制限のパラ
+        メータを変えた複数の分岐を実行するクラスです。一時停止ま
+        でのサイクルは実行し直さず、その続きから各分岐を実行し、
+        分岐毎の結果サマリの指標と、サイクル毎の人数を保持します。
+        各分岐は、一時停止した状態をforkで引き継いだ別プロセスで、
+        並列に実行します（runbranch()）。エージェントのデータは、
+        書き換えるまではコピーされません（コピーオンライト）。
+        forkが使えない環境では、一時停止した状態をチェックポイント
+        に保存し、各分岐でそれを読み込みます。
+
+    Attributes:
+        base(Simulation):元になる（一時停止中の）シミュレーション
+        branches[](dic):分岐毎に変更するパラメータ
+                key(str):パラメータのタグ名(FORK_KEYS)
+                value(float):値
+        names[](str):分岐毎の名前
+        keys[](str):いずれかの分岐で変更するパラメータのタグ名
+        workers(int):並列数(プロセス数)
+        fork_cycle(int):分岐したサイクル
+                ※run()の開始時の、元のシミュレーションのサイクル
+        histories[](sim_histories):分岐毎のシミュレーション履歴
+                ※分岐前の履歴を含む
+        metrics[](dic):分岐毎の結果サマリの指標
+                ※Ensemble.metricsを参照
+        sentences[](str):サマリ表示文字列(1行)のリスト
+        alltime(StopWatch):実行時間計測用
+    """
+    def __init__(self, base, branches, workers=None):
+        """コンストラクタ
+        
+         分岐の指定を確認する
+
+        Args:
+            base(Simulation):元になるシミュレーション。サイクルの
+                    間(nextcycle()の後)で止まっていること
+            branches[](dic):分岐毎に変更するパラメータ
+                    "name"は分岐の名前(省略時は番号)
+            workers(int,optional):並列数。省略時はCPUのコア数
+        Returns:なし
+        Raises:
+            KeyError:分岐で変更できないパラメータが指定された
+            ValueError:分岐が無い、または値が数値ではない
+        Yields:なし
+        Examples:
+            Fork(sim, [{"name":"規制強化", "s_move_disable_rate":0.8},
+                    {"name":"規制なし", "s_move_disable_rate":0.0}])
+        Note:なし
+        """
+        if 0 == len(branches):
+            raise ValueError("no branches")
+        self.base = base
+        self.workers = workers or os.cpu_count() or 1
+        self.names = []
+        self.branches = []
+        for i, branch in enumerate(branches):
+            branch = dict(branch)
+            self.names.append(str(branch.pop("name", "分岐{}".format(i+1))))
+            for key, value in branch.items():
+                if key not in FORK_KEYS:
+                    raise KeyError("parameter cannot be changed in a branch: {}".format(key))
+                branch[key] = float(value)
+            self.branches.append(branch)
+        self.keys = [key for key in FORK_KEYS if any(key in b for b in self.branches)]
+        self.fork_cycle = base.now_cycle
+        self.histories = []
+        self.metrics = []
+        self.sentences = []
+        self.alltime = StopWatch()
+
+    @staticmethod
+    def loadjson(in_f):
+        """分岐指定ファイル(json)の読込み
+        
+         分岐指定ファイル(json)から、分岐のリストを読み込む
+
+        Args:
+            in_f(str):分岐指定ファイルのパス
+        Returns:分岐毎に変更するパラメータ(dic)のリスト
+        Raises:
+            KeyError:"branches"が無い
+        Yields:なし
+        Examples:
+            {"branches": [{"name": "規制強化", "s_move_disable_rate": 0.8},
+                          {"name": "規制なし", "s_move_disable_rate": 0.0}]}
+        Note:なし
+        """
+        b = open(in_f)
+        spec = json.load(b)
+        b.close()
+        return spec["branches"]
+
+    def run(self):
+        """分岐実行
+        
+         全分岐を並列に実行し、サマリを作成する
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ・全分岐で乱数の状態も引き継ぐ（分岐間で、乱数の違いで
+            はなく、パラメータの違いを比べられるように）
+            ・１つのプロセスで実行するのは１分岐だけ（maxtasksperchild
+            =1）。分岐毎に、元の状態から新しくforkする
+        """
+        global fork_base
+        self.alltime.start()
+        #分岐するのは、実行する時点の状態
+        self.fork_cycle = self.base.now_cycle
+        if self.base.next_prm is None:
+            prm_dic = self.base.prm.getdic()
+        else:
+            prm_dic = self.base.next_prm.getdic()
+        branch_dics = [dict(prm_dic, **branch) for branch in self.branches]
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("fork")
+            ckpt_path = None
+            fork_base = self.base
+        else:
+            ctx = multiprocessing.get_context()
+            fd, ckpt_path = tempfile.mkstemp(suffix=".ckpt")
+            os.close(fd)
+            self.base.savecheckpoint(ckpt_path)
+        #forkの前にGCの対象から外し、子プロセスでのGCによるコピーを減らす
+        gc.freeze()
+        try:
+            with ctx.Pool(processes=min(self.workers, len(branch_dics)), maxtasksperchild=1) as pool:
+                results = pool.starmap(runbranch, [(d, ckpt_path) for d in branch_dics], chunksize=1)
+        finally:
+            gc.unfreeze()
+            fork_base = None
+            if ckpt_path is not None:
+                os.remove(ckpt_path)
+        self.histories = [r[0] for r in results]
+        self.metrics = [r[1] for r in results]
+        self.alltime.stop()
+        self.summry()
+
+    def summry(self):
+        """サマリ作成
+        
+         分岐毎に、変更したパラメータと結果サマリの指標を、サマリ
+         表示用リストに格納する
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.sentences.clear()
+        self.sentences.append("分岐数={} 分岐したサイクル={} 並列数={}".format(len(self.branches),   \
+            self.fork_cycle, self.workers))
+        self.sentences.append("分岐総実行時間(ms)={}".format(self.alltime.getelapsedtime()))
+        for name, branch, metric in zip(self.names, self.branches, self.metrics):
+            self.sentences.append("-"*50)
+            self.sentences.append("[{}] {}".format(name, " ".join("{}={}".format(k, v) for k, v in branch.items())))
+            self.sentences.append(" ".join("{}={}".format(title, round(metric[key], 2))   \
+                for key, title in ENSEMBLE_METRICS))
+
+    def writesummary(self, out_f):
+        """結果保存(ファイル指定)
+        
+         分岐毎に１行、変更したパラメータの値と結果サマリの指標を、
+         指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            変更しなかったパラメータは、元の値を書き出す
+        """
+        if self.base.next_prm is None:
+            prm = self.base.prm
+        else:
+            prm = self.base.next_prm
+        csv_title = ["No", "name"] + self.keys + [title for key, title in ENSEMBLE_METRICS]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        for i, branch in enumerate(self.branches):
+            csvout.writerow([i, self.names[i]] + [branch.get(key, getattr(prm, key)) for key in self.keys] +   \
+                [self.metrics[i][key] for key, title in ENSEMBLE_METRICS])
+        a.close()
+
+    def writehistories(self, out_f):
+        """シミュレーション履歴保存(ファイル指定)
+        
+         分岐毎のシミュレーション履歴を、先頭に分岐番号を付けて、
+         指定されたファイル(csv)に保存する
+
+        Args:
+            out_f(str):保存するファイルのパス
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            分岐前のサイクルも、分岐毎に書き出す
+        """
+        csv_title = ["No"] + [titles[0] for titles in DSP_TITLES_DIC]
+        a = open(out_f, "w")
+        csvout = csv.writer(a)
+        csvout.writerow(csv_title)
+        for i, histories in enumerate(self.histories):
+            csvout.writerows([i] + row for row in histories)
+        a.close()
+
+class ForkWindow():
+    """ForkWindow【分岐比較ウインドウクラス】
+
+        分岐実行の結果を、１つのグラフで比較するウインドウを構築
+        します。分岐毎に、感染者(合計)を実線で、死亡者を点線で、
+        分岐毎の色(FORK_CLR)で描きます。分岐したサイクルには縦線
+        を引きます。
+
+    Attributes:
+        canvas(Canvas):グラフ表示用キャンバス
+        frame_legend(Frame):凡例（分岐の名前）表示用フレーム
+        button(Button):「閉じる」ボタン
+    """
+    def __init__(self, fork, total):
+        """コンストラクタ
+        
+         分岐比較ウインドウの構築を行う
+
+        Args:
+            fork(Fork):実行済みの分岐実行
+            total(int):人数の合計(グラフの縦軸の最大値)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        master=tkinter.Toplevel()
+        master.title("分岐比較")
+
+        self.canvas = tkinter.Canvas(master, width=GRAPH_CANVAS_W, height=FORK_GRAPH_H)
+        self.canvas.pack()
+        self.canvas.create_rectangle(0,0,GRAPH_CANVAS_W,FORK_GRAPH_H,fill=CANVAS_BACK_CLR)
+        self.frame_legend = tkinter.Frame(master)
+        self.frame_legend.pack(fill=tkinter.X)
+        self.button = tkinter.Button(master,text="閉じる",command=master.destroy)
+        self.button.pack()
+
+        entries_len = max(len(h) for h in fork.histories)
+        if 2 > entries_len:
+            return
+        x_exp_rate = GRAPH_CANVAS_W/(entries_len-1)
+        y_exp_rate = FORK_GRAPH_H/total
+        #分岐したサイクル
+        self.canvas.create_line(fork.fork_cycle*x_exp_rate, 0, fork.fork_cycle*x_exp_rate, FORK_GRAPH_H,   \
+            fill=CANVAS_FONT_CLR, dash=(2,4))
+        for i, histories in enumerate(fork.histories):
+            color = FORK_CLR[i % len(FORK_CLR)]
+            i_pts = []
+            d_pts = []
+            for row in histories:
+                i_pts += [row[0]*x_exp_rate, FORK_GRAPH_H-sum(row[2:5])*y_exp_rate]
+                d_pts += [row[0]*x_exp_rate, FORK_GRAPH_H-row[6]*y_exp_rate]
+            self.canvas.create_line(i_pts, fill=color, width=2)
+            self.canvas.create_line(d_pts, fill=color, dash=(4,2))
+            #凡例
+            legend = tkinter.Label(self.frame_legend, text=fork.names[i], font=("", PRM_FONT_SIZE),   \
+                fg=color, bg=CANVAS_BACK_CLR)
+            legend.grid(row=0, column=i, sticky=tkinter.W + tkinter.E)
+        self.canvas.update()
+
+class ReplayWindow():
+    """ReplayWindow【再生ウインドウクラス】
+
+        記録した軌跡ファイル(TrajReader)を、シミュレーションを実行
+        し直さずに、メインウインドウのシミュレーション用キャンバス・
+        グラフ表示用キャンバスに再生するための、操作ウインドウを構
+        築します。描画は、実行中と同じ描画クラス(CanvasRenderer/
+        RasterRenderer・HistoryGraph)で行います。
+        ・スライダーで、任意のサイクルに移動する（シーク）
+        ・「再生」で、FRAME_MS毎に「再生速度」サイクルずつ進める
+          （移動・感染判定を行わないため、速さは描画だけで決まる）
+        ・「ピークへ」で、感染者数(合計)が最大のサイクルに移動する
+        グラフは、表示中のサイクルまでを描きます（戻る場合は、描き
+        直します）。
+
+    Attributes:
+        app(MainApp):再生先のメインウインドウ
+        reader(TrajReader):再生する軌跡ファイル
+        histories(HistBuffer):軌跡ファイルのシミュレーション履歴
+        peak(int):感染者数(合計)が最大のサイクル
+        cycle(int):表示中のサイクル(未表示時は-1)
+        playing(bool):再生中か
+        jobid(int):次回実行する再生(tick())のID
+        master(Toplevel):ウインドウ
+        cycle_scale(Scale):サイクル(シーク)のスライダー
+        speed_scale(Scale):再生速度のスライダー
+        play_buttom(Button):再生ボタン
+        stop_buttom(Button):停止ボタン
+        peak_buttom(Button):ピークへボタン
+        close_buttom(Button):閉じるボタン
     """
-    def __init__(self, parent, row, userprm):
+    def __init__(self, app, reader):
         """コンストラクタ
         
-         インスタンスの構築を行う
+         再生ウインドウの構築を行い、サイクル0を表示する
 
         Args:
-            parent(Frame):wedgitを配置する親フレーム
-            row(int):配置する行数
-            userprm(UserPrm):データ格納用クラス
+            app(MainApp):再生先のメインウインドウ
+            reader(TrajReader):再生する軌跡ファイル
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ウインドウを閉じると、軌跡ファイルも閉じる
+        """
+        self.app = app
+        self.reader = reader
+        self.histories = reader.histories()
+        peaks = [sum(row[2:5]) for row in self.histories]
+        self.peak = peaks.index(max(peaks))
+        self.cycle = -1
+        self.playing = False
+        self.jobid = None
+
+        self.master = tkinter.Toplevel()
+        self.master.title("再生 " + os.path.basename(reader.path))
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
+        self.cycle_scale = tkinter.Scale(self.master, label="サイクル", from_=0, to=len(reader)-1,   \
+            orient=tkinter.HORIZONTAL, length=GRAPH_CANVAS_W, command=self.seek)
+        self.cycle_scale.grid(row=0, column=0, columnspan=4, sticky=tkinter.W + tkinter.E)
+        self.speed_scale = tkinter.Scale(self.master, label="再生速度(サイクル/画面更新)", from_=1,   \
+            to=REPLAY_SPEED_MAX, orient=tkinter.HORIZONTAL)
+        self.speed_scale.grid(row=1, column=0, columnspan=4, sticky=tkinter.W + tkinter.E)
+        self.play_buttom = tkinter.Button(self.master, text="再生", font=("", PRM_FONT_SIZE), command=self.play)
+        self.play_buttom.grid(row=2, column=0, sticky=tkinter.W + tkinter.E)
+        self.stop_buttom = tkinter.Button(self.master, text="停止", font=("", PRM_FONT_SIZE), command=self.stop)
+        self.stop_buttom.grid(row=2, column=1, sticky=tkinter.W + tkinter.E)
+        self.peak_buttom = tkinter.Button(self.master, text="ピークへ", font=("", PRM_FONT_SIZE), command=self.topeak)
+        self.peak_buttom.grid(row=2, column=2, sticky=tkinter.W + tkinter.E)
+        self.close_buttom = tkinter.Button(self.master, text="閉じる", font=("", PRM_FONT_SIZE), command=self.close)
+        self.close_buttom.grid(row=2, column=3, sticky=tkinter.W + tkinter.E)
+        self.stop_buttom.configure(state = WG_DISABLE)
+
+        self.show(0)
+
+    def show(self, cycle):
+        """サイクルの表示
+
+         指定したサイクルの全員・人数・グラフを、メインウインドウ
+         に表示する
+
+        Args:
+            cycle(int):表示するサイクル
         Returns:なし
         Raises:なし
         Yields:なし
         Examples:なし
         Note:なし
         """
-        self.parent = parent    #wedgitを配置する親
-        self.row = row    #配置する行数
-        self.userprm=userprm
-        self.lb = tkinter.Label(self.parent, text=self.userprm.gettitle(), anchor=tkinter.W, font=("", PRM_FONT_SIZE))
-        self.lb.grid(row=self.row, column=0, columnspan=1,sticky=tkinter.W + tkinter.E)
+        app = self.app
+        #実行時間計測
+        app.sim.tr.drawtime.reset()
+        app.sim.tr.drawtime.start()
 
-        if self.userprm.getuitype() == MAKE_ENTRY:
-            self.entry = tkinter.Entry(self.parent, textvariable=self.userprm.sv,  \
-                width=TXT_ENTRY_W, justify=tkinter.RIGHT,   \
-                validate = 'key', validatecommand = self.userprm.vcmd(self.parent),   \
-                font=("", PRM_FONT_SIZE))
-            self.entry.grid(row=self.row, column=1, columnspan=1,sticky=tkinter.W + tkinter.E)
-        else:       #MAKE_LABEL
-            self.entry = tkinter.Label(self.parent, textvariable=self.userprm.sv, anchor=tkinter.E, font=("", PRM_FONT_SIZE))
-            self.entry.grid(row=self.row, column=1, columnspan=1,sticky=tkinter.W + tkinter.E)
+        app.renderer.drow(self.reader.drawdata(cycle))
 
-class ResultSummry():
-    """ResultSummry【サマリ表示ウインドウクラス】
+        #テキスト表示
+        row = self.histories[cycle]
+        for c_idx, lb in enumerate(app.stat_count):
+            lb.set(str(row[c_idx]))
 
-        サマリ表示ウインドウを構築します。
-        独立したウインドウとして構築し、複数行テキスト入力
-        域(text)に、渡された文字列（複数行）を表示します。
-        複数行テキスト入力域では編集が可能ですが、保存はできません。
+        #グラフ（戻る場合は、描き直す）
+        if cycle < self.cycle:
+            app.graph.clear(self.reader.persons)
+        app.graph.append(self.histories, cycle+1)
 
-    Attributes:
-        frame_smry(Frame):外側のフレーム。
-        textbox(Text):サマリデータ表示用複数行テキスト入力域
-        button(Button):「閉じる」ボタン
-    """
-    def __init__(self,sectences):
-        """コンストラクタ
-        
-         サマリ表示ウインドウの構築を行う
+        self.cycle = cycle
+        self.cycle_scale.set(cycle)
+
+        #実行時間計測
+        app.sim.tr.drawtime.stop()
+        app.sim.tr.adddrawtime(app.sim.tr.drawtime.getelapsedtime())
+
+    def seek(self, value):
+        """シーク
+
+         スライダーで指定したサイクルを表示する
+         (スライダー操作時の処理)
 
         Args:
-            sectences(str[]):
-                    表示する文字列のリスト(文字列末尾に"\n"を自動付加)
+            value(str):スライダーの値(サイクル)
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            表示中のサイクルと同じ場合は何もしない（show()でスライ
+            ダーを動かした場合）
+        """
+        cycle = int(float(value))
+        if cycle != self.cycle:
+            self.show(cycle)
+
+    def play(self):
+        """再生
+
+         表示中のサイクルから再生する（最後のサイクルの場合は、最
+         初から）
+         (「再生ボタン」押下時の処理)
+
+        Args:なし
         Returns:なし
         Raises:なし
         Yields:なし
         Examples:なし
         Note:なし
         """
-        master=tkinter.Toplevel()
-        master.geometry(RESULT_GIO)
-        master.title("シミュレーション結果サマリ")
-        
-        #フレーム（外側）を作成
-        self.frame_smry = tkinter.Frame(master)
-        self.frame_smry.pack()
-        self.textbox = tkinter.Text(self.frame_smry, height=len(sectences))
-        self.textbox.pack()
-        self.button = tkinter.Button(self.frame_smry,text="閉じる",command=master.destroy)
-        self.button.pack()
-        
-        i=1
-        for strline in sectences:
-            self.textbox.insert(str(i)+".0",strline+"\n")
-            i += 1
+        if self.playing:
+            return
+        if self.cycle >= len(self.reader)-1:
+            self.show(0)
+        self.playing = True
+        self.play_buttom.configure(state = WG_DISABLE)
+        self.stop_buttom.configure(state = WG_NORMAL)
+        self.jobid = self.app.root.after(FRAME_MS, self.tick)
 
-class HelpWindow():
-    """HelpWindow【ヘルプウインドウクラス】
+    def tick(self):
+        """再生の１コマ
 
-        ヘルプウインドウを構築します。
-        ヘルプの内容は、本ソースのDocString(__dic__)です。
+         再生速度の分だけサイクルを進めて表示する。FRAME_MS毎に、
+         自分自身で、次の実行をスケジュールする（最後のサイクルで
+         止まる）
 
-    Attributes:
-        frame_help(Frame):外側のフレーム。
-        textbox(ScrolledText):
-                ヘルプ用スクロールバー付複数行テキスト入力域
-        button(Button):「閉じる」ボタン
-    """
-    def __init__(self):
-        """コンストラクタ
-        
-         ヘルプウインドウの構築を行う
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.jobid = None
+        if not self.playing:
+            return
+        last = len(self.reader)-1
+        self.show(min(self.cycle + int(self.speed_scale.get() or 1), last))
+        if self.cycle >= last:
+            self.stop()
+        else:
+            self.jobid = self.app.root.after(FRAME_MS, self.tick)
+
+    def stop(self):
+        """停止
+
+         再生を止める
+         (「停止ボタン」押下時の処理)
 
         Args:なし
         Returns:なし
@@ -1562,78 +8085,75 @@ class HelpWindow():
         Examples:なし
         Note:なし
         """
-        master=tkinter.Toplevel()
-        master.geometry(HELP_GIO)
-        master.title("ヘルプ")
-        
-        #フレーム（外側）を作成
-        self.frame_help = tkinter.Frame(master)
-        self.frame_help.pack()
-        self.button = tkinter.Button(self.frame_help,text="閉じる",command=master.destroy)
-        self.button.grid(row=0,column=0,sticky=tkinter.W)
+        self.playing = False
+        if self.jobid is not None:
+            self.app.root.after_cancel(self.jobid)
+            self.jobid = None
+        self.play_buttom.configure(state = WG_NORMAL)
+        self.stop_buttom.configure(state = WG_DISABLE)
 
-        self.textbox = tkinter.scrolledtext.ScrolledText(self.frame_help,width=HELP_WIDTH)
-        self.textbox.grid(row=1,column=0,sticky=tkinter.W + tkinter.E)
+    def topeak(self):
+        """ピークへ移動
+
+         感染者数(合計)が最大のサイクルを表示する（再生中は、そこ
+         から続ける）
+         (「ピークへボタン」押下時の処理)
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.show(self.peak)
+
+    def close(self):
+        """再生の終了
+
+         再生を止めて、軌跡ファイル・ウインドウを閉じる
+         (「閉じるボタン」押下時の処理)
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.stop()
+        self.reader.close()
+        self.master.destroy()
+        self.app.endreplay()
 
-        self.textbox.insert("1.0",__doc__)
-        self.textbox.insert(tkinter.END,"\n□□□ 以下クラス説明 □□□\n")
-        self.textbox.insert(tkinter.END,MainApp.__doc__+"\n")
-        self.textbox.insert(tkinter.END,Person.__doc__+"\n")
-        self.textbox.insert(tkinter.END,UserPrm.__doc__+"\n")
-        self.textbox.insert(tkinter.END,UsrPrms.__doc__+"\n")
-        self.textbox.insert(tkinter.END,Prm_entry.__doc__+"\n")
-        self.textbox.insert(tkinter.END,Total4dncty.__doc__+"\n")
-        self.textbox.insert(tkinter.END,FieldSize.__doc__+"\n")
-        self.textbox.insert(tkinter.END,ResultSummry.__doc__+"\n")
-        self.textbox.insert(tkinter.END,HelpWindow.__doc__+"\n")
-        self.textbox.insert(tkinter.END,TimeRec.__doc__+"\n")
-        self.textbox.insert(tkinter.END,StopWatch.__doc__+"\n")
-        
 class MainApp():
     """MainApp【アプリメインクラス】
 
         本アプリケーションのメインクラスです。
         画面を構築し、ユーザからの操作を受付ます。
         また、アプリ全体の各種オブジェクトを保持します。
+        シミュレーションの実行は、保持しているSimulationクラスの
+        オブジェクト(sim)で行います（画面は、simの状態を表示する
+        だけです）。
 
     Attributes:
         <シミュレーション制御関連>
-            *感染者数が最大となったタイミングの記録
-            i_t_max[人数,サイクル](int,int):全体
-            i_n_max[人数,サイクル](int,int):症状なし
-            i_l_max[人数,サイクル](int,int):軽症 
-            i_h_max[人数,サイクル](int,int):重症
-        now_cycle(int):現在サイクル(現在表示中のサイクル番号)
-        sim_history[
-                サイクル(int),
-                未感染者数(int),
-                感染者(症状なし)数(int),
-                感染者(軽症)数(int),
-                感染者(重症)数(int),
-                免疫保持者数(int),
-                死亡者数(int),
-                実行再生産数(float),
-                経済活動(%)(float)]:サイクル毎の人数（グラフ表示用）
-        sim_histories[](sim_history):
-                シミュレーション履歴(sim_historyのリスト)
-        persons[](Person):対象者オブジェクトのリスト
-            *グラフ(多角形)生成用の座標リスト
-            s_his[](float):未感染者数(多角形)
-            i_n_his[](float):感染者(症状なし)数(多角形)
-            i_l_his[](float):感染者(軽症)数(多角形)
-            i_h_his[](float):感染者(重症)数(多角形)
-            r_his[](float):免疫保持者数(多角形)
-            d_his[](float):死亡者数(多角形)
-            eco_his[](float):経済活動(%)(折線)
-        sentences[](str):サマリ表示文字列(1行)のリスト
+        sim(Simulation):表示するシミュレーション
+                ※ユーザーパラメータ(up)は、画面と共有する
         stat_count[](int):ステータスカウント用のリスト
-        up(UsrPrms):ユーザーパラメータの保持
         disp_exp_rate(float):
                 シミュレーション座標と表示キャンバスの比率
-        ecoact(float):本来の経済活動規模(分母)
-        ecoeffect(float):実際の経済活動規模(分子)
-        jobid(int):次回実行するシミュレーションスレッドのID
-        tr(TimeRec):実行時間計測用オブジェクト
+        nodsp(bool):実行中の画面更新モード(True:画面更新しない)
+        jobid(int):次回実行する画面更新(poll())のID
+        worker(Thread):シミュレーションスレッド
+        cmdq(Queue):シミュレーションスレッドへのメッセージのキュー
+                (WK_PAUSE/WK_RESUME)
+        snapq(Queue):シミュレーションスレッドからの状態(スナップ
+                ショット)のキュー(長さSNAP_QUEUE_SIZE)
+                ※スナップショットは(sim_history, 描画用データ)
+                のタプル。シミュレーション終了時はNone
+        idle(Event):シミュレーションスレッドが一時停止している
+                （サイクルの間で止まっている）
         run_mode(str):サイクル実行フラグ
             CYC_PAUSE:一時停止中
             CYC_RUN:実行中
@@ -1652,7 +8172,17 @@ class MainApp():
         setup_buttom(Button):セットアップボタン
         nodsp_checkbv(BooleanVar):画面更新モード変数
         nodsp_check(Checkbutton):画面更新モードチェックボタン
+        engine_checkbv(BooleanVar):エンジン選択変数
+                True:ArrayEngine(NumPy)/False:PersonEngine
+        engine_check(Checkbutton):エンジン選択チェックボタン
+        event_checkbv(BooleanVar):イベント駆動エンジン選択変数
+                True:EventEngine(NumPyエンジンを選択していない場合)
+        event_check(Checkbutton):イベント駆動エンジン選択チェックボタン
         run_buttom(Button):実行ボタン
+        ensemble_buttom(Button):アンサンブル実行ボタン
+        load_ckpt_buttom(Button):途中から読込ボタン
+        fork_buttom(Button):分岐実行ボタン
+        replay_buttom(Button):記録を再生ボタン
         pause_buttom(Button):一時停止ボタン
         restart_buttom(Button):再開ボタン
         summry_buttom(Button):サマリ表示ボタン
@@ -1663,7 +8193,17 @@ class MainApp():
         frame_epain(Frame):画面右側の外枠フレーム
         frame_stat(Frame):ステータス(人数)表示用フレーム
         canvas_graph(Canvas):グラフ表示用キャンバス
+        graph(HistoryGraph):グラフ表示用キャンバスの描画
         canvas_sim(Canvas):シミュレーション用キャンバス
+        renderer(CanvasRenderer or RasterRenderer):
+                シミュレーション用キャンバスの描画(実行中のもの)
+                ※人数により、セットアップ時に切り替える
+        item_renderer(CanvasRenderer):描画(図形)
+        raster_renderer(RasterRenderer):描画(画像)
+        ensemble(Ensemble):直近のアンサンブル実行結果
+        replay_win(ReplayWindow):再生ウインドウ(再生中以外はNone)
+            ※チェックポイントの保存先(ckpt_path)は、CACHE_DIRの下
+            のCHECKPOINT_FILE（起動したディレクトリには保存しない）
 
     """
     def __init__(self):
@@ -1678,40 +8218,31 @@ class MainApp():
         Examples:なし
         Note:なし
         """
-        ###実行用変数（オブジェクト）
-        #最大感染者数（人数、サイクル）　※感染者数が最大となったタイミングの記録
-        self.i_t_max = [0,0]        #全体
-        self.i_n_max = [0,0]        #症状なし（移動制限なし）
-        self.i_l_max = [0,0]        #軽症（隔離） 
-        self.i_h_max = [0,0]        #重症（入院）
-        
-        self.now_cycle = 0       #現在サイクル　※現在表示中のサイクル番号
-        
-        #シミュレーション履歴　※サイクル毎の人数（グラフ表示用）、リスト形式
-        self.sim_histories = []
-        #no,s,i_n,i_l,i_h,r,d,R,ECO
-        self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
-        
-        #対象者管理　※対象者オブジェクトをリストで管理
-        self.persons = []
-        
-        #グラフ生成用のリスト
-        self.s_his = []
-        self.i_n_his =[]
-        self.i_l_his =[]
-        self.i_h_his =[]
-        self.r_his =[]
-        self.d_his =[]
-        self.eco_his =[]
-        
-        #サマリ表示データのリスト
-        self.sentences=[]
-        
+        #シミュレーションデータの構築
+        self.sim=Simulation()
+
         #ステータスカウント用のリスト
         self.stat_count=[]
 
-        #時間計測
-        self.tr=TimeRec()
+        #シミュレーションスレッド
+        self.worker=None
+        self.cmdq=queue.Queue()
+        self.snapq=queue.Queue(maxsize=SNAP_QUEUE_SIZE)
+        self.idle=threading.Event()
+
+        #アンサンブル実行結果
+        self.ensemble=None
+
+        #再生ウインドウ
+        self.replay_win=None
+
+        #チェックポイントの保存先（一時停止時・間隔毎に保存）
+        #（ディレクトリを作れない場合は保存しない）
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            self.sim.ckpt_path=os.path.join(CACHE_DIR, CHECKPOINT_FILE)
+        except OSError:
+            self.sim.ckpt_path=None
         
         #構築        
         self.buildapp()
@@ -1729,7 +8260,10 @@ class MainApp():
         Note:なし
         """
         #実行時間計測
-        self.tr.buildtime.start()
+        self.sim.tr.buildtime.start()
+
+        #tkinterの読込み
+        import_tk()
     
         #画面生成   ※これを最初にやらないと、なぜかStringVar()が画面表示されない
         #メインウインドウ
@@ -1737,9 +8271,10 @@ class MainApp():
         self.root.title("感染シミュレーション v0.011")
         self.root.geometry(str(WIN_W)+"x"+str(WIN_H))
         
-        #ユーザーパラメータの構築
+        #ユーザーパラメータの構築（シミュレーションと共有）
         self.up=UsrPrms()
         self.up.loaddefault()
+        self.sim.up=self.up
 
         #シミュレーション座標と表示キャンバスの比率
         self.disp_exp_rate = SIM_CANVAS_BASE_H / self.up.ups_dic["field_size"].getvl()
@@ -1805,11 +8340,34 @@ class MainApp():
         #終了ボタン
         self.close_buttom = tkinter.Button(self.frame_butom, text="終了", font=("", PRM_FONT_SIZE), command=sys.exit)
         self.close_buttom.grid(row=5, column=1, columnspan=1, sticky=tkinter.W + tkinter.E)
-
-        #実行ボタン・一時停止ボタン・再開ボタン・サマリ表示ボタン・結果保存ボタンは最初は非活性
+        #エンジン選択チェックボタン（NumPyが無い場合は非活性）
+        self.engine_checkbv = tkinter.BooleanVar()
+        self.engine_check = tkinter.Checkbutton(self.frame_butom, variable=self.engine_checkbv, text="NumPyエンジン(大人数)",font=("", PRM_FONT_SIZE))
+        self.engine_check.grid(row=6, column=0, columnspan=2, sticky=tkinter.W)
+        if not import_np():
+            self.engine_check.configure(state = WG_DISABLE)
+        #アンサンブル実行ボタン
+        self.ensemble_buttom = tkinter.Button(self.frame_butom, text="アンサンブル実行", font=("", PRM_FONT_SIZE), command=self.runensemble)
+        self.ensemble_buttom.grid(row=7, column=0, columnspan=2, sticky=tkinter.W + tkinter.E)
+        #イベント駆動エンジン選択チェックボタン
+        self.event_checkbv = tkinter.BooleanVar()
+        self.event_check = tkinter.Checkbutton(self.frame_butom, variable=self.event_checkbv, text="イベント駆動(病状)",font=("", PRM_FONT_SIZE))
+        self.event_check.grid(row=8, column=0, columnspan=2, sticky=tkinter.W)
+        #途中から読込ボタン（チェックポイント）
+        self.load_ckpt_buttom = tkinter.Button(self.frame_butom, text="途中から読込", font=("", PRM_FONT_SIZE), command=self.loadckpt)
+        self.load_ckpt_buttom.grid(row=9, column=0, columnspan=2, sticky=tkinter.W + tkinter.E)
+        #分岐実行ボタン（一時停止中のみ活性）
+        self.fork_buttom = tkinter.Button(self.frame_butom, text="分岐実行", font=("", PRM_FONT_SIZE), command=self.forksim)
+        self.fork_buttom.grid(row=10, column=0, columnspan=2, sticky=tkinter.W + tkinter.E)
+        #記録を再生ボタン（軌跡ファイル）
+        self.replay_buttom = tkinter.Button(self.frame_butom, text="記録を再生", font=("", PRM_FONT_SIZE), command=self.replay)
+        self.replay_buttom.grid(row=11, column=0, columnspan=2, sticky=tkinter.W + tkinter.E)
+
+        #実行ボタン・一時停止ボタン・再開ボタン・分岐実行ボタン・サマリ表示ボタン・結果保存ボタンは最初は非活性
         self.run_buttom.configure(state = WG_DISABLE)        
         self.pause_buttom.configure(state = WG_DISABLE)        
         self.restart_buttom.configure(state = WG_DISABLE)
+        self.fork_buttom.configure(state = WG_DISABLE)
         self.summry_buttom.configure(state = WG_DISABLE)
         self.save_csv_buttom.configure(state = WG_DISABLE)        
         
@@ -1826,11 +8384,15 @@ class MainApp():
         self.canvas_graph.pack()
         self.canvas_graph.create_rectangle(0,0,GRAPH_CANVAS_W,GRAPH_CANVAS_H,fill=CANVAS_BACK_CLR)
         self.canvas_graph.update()
+        self.graph = HistoryGraph(self.canvas_graph, GRAPH_CANVAS_W, GRAPH_CANVAS_H)
         #キャンバス（シミュレーション用）を作成    
         self.canvas_sim = tkinter.Canvas(self.frame_epain, width=SIM_CANVAS_W, height=SIM_CANVAS_H)
         self.canvas_sim.pack()
         self.canvas_sim.create_rectangle(0,0,SIM_CANVAS_W,SIM_CANVAS_H,fill=CANVAS_BACK_CLR)
         self.canvas_sim.update()
+        self.item_renderer = CanvasRenderer(self.canvas_sim)
+        self.raster_renderer = RasterRenderer(self.canvas_sim, SIM_CANVAS_W, SIM_CANVAS_H)
+        self.renderer = self.item_renderer
         
         #ステータスフレームにテキスト表示
         c_idx=0
@@ -1847,8 +8409,28 @@ class MainApp():
             c_idx += 1
         
         #実行時間計測
-        self.tr.buildtime.stop()
+        self.sim.tr.buildtime.stop()
+        
+    def selengine(self):
+        """エンジンの選択
         
+         チェックボタンの状態から、シミュレーションエンジンを決める
+
+        Args:なし
+        Returns:
+            シミュレーションエンジン(ENGINE_PERSON/ENGINE_ARRAY/ENGINE_EVENT)
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            両方選択されている場合は、NumPyエンジンを優先する
+        """
+        if self.engine_checkbv.get():
+            return ENGINE_ARRAY
+        if self.event_checkbv.get():
+            return ENGINE_EVENT
+        return ENGINE_PERSON
+
     def buildsim(self):
         """シミュレーション環境のセットアップ
         
@@ -1863,51 +8445,16 @@ class MainApp():
         Note:なし
         """
         #実行時間計測
-        self.tr.clearsimrec()
-        self.tr.buildsimtime.start()
-    
-        #すべての要素を一度削除
-        self.persons.clear()
-        #グラフデータのクリア
-        self.s_his.clear()
-        self.i_n_his.clear()
-        self.i_l_his.clear()
-        self.i_h_his.clear()
-        self.r_his.clear()
-        self.d_his.clear()
-        self.eco_his.clear()
-        #ヒストリーデータのクリア
-        self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
-        self.sim_histories.clear()
-        #サマリ表示データのクリア
-        self.sentences.clear()
+        self.sim.tr.clearsimrec()
+        self.sim.tr.buildsimtime.start()
     
         #シミュレーション座標と表示キャンバスの比率
         self.disp_exp_rate = SIM_CANVAS_BASE_H / self.up.ups_dic["field_size"].getvl()
-        
-        #経済活動割合（分母）の再計算 ※経済活動は移動距離の総計で決める
-        self.ecoact=self.up.ups_dic["total_persons_count"].getvl()*self.up.ups_dic["move_r"].getvl()
-        self.ecoeffect=0.0
 
         self.jobid=None
-        self.now_cycle=0
-    
-        #初期インスタンスの生成
-        total_persons_count =0
-        for i in  range(self.up.ups_dic["s_persons_count"].getvl()):
-            self.persons.append( Person(id=i) )
-        total_persons_count =i+1  #0 origin
     
-        for i in  range(self.up.ups_dic["i_persons_count"].getvl()):
-            self.persons.append( Person(id=(i+total_persons_count), stat=I_STATE, serious=I_RANK_NON ) )
-        total_persons_count +=(i+1)
-        
-        for i in  range(self.up.ups_dic["r_persons_count"].getvl()):
-            self.persons.append( Person(id=(i+total_persons_count), stat=R_STATE ) )
-        total_persons_count +=(i+1)
-        
-        for i in  range(self.up.ups_dic["d_persons_count"].getvl()):
-            self.persons.append( Person(id=(i+total_persons_count), stat=D_STATE ) )
+        #シミュレーションデータのセットアップ(初期インスタンスの生成)
+        self.sim.setup(self.selengine())
         
         #now_cycle==0 は初期表示（初期配置）
         # no,s,i_n,i_l,i_h,r,d,R (最初は無症状の感染者しかいない)
@@ -1917,19 +8464,98 @@ class MainApp():
         
         c_idx=0
         for lb in self.stat_count:
-            lb.set(str(sim_history_ini[c_idx]))
+            lb.set(str(sim_history_ini[c_idx]))
+            c_idx += 1
+    
+        #表示のリフレッシュ
+        self.canvas_sim.delete("all")
+        self.canvas_sim.create_rectangle(0,0,SIM_CANVAS_W,SIM_CANVAS_H,fill=CANVAS_BACK_CLR)
+        #人数が多い場合は、画像で描画する
+        if self.sim.prm.total_persons_count > RASTER_THRESHOLD:
+            self.renderer = self.raster_renderer
+        else:
+            self.renderer = self.item_renderer
+        self.renderer.clear(self.disp_exp_rate)
+        #配列版エンジンで画面更新しない場合は、図形を作らない（大人数のため）
+        if not (self.nodsp_checkbv.get() and isinstance(self.sim.engine, ArrayEngine)):
+            self.renderer.refresh(self.sim.engine.drawdata())
+    
+        #グラフ表示のクリア(グラフ)
+        self.graph.clear(self.sim.prm.total_persons_count)
+
+        #実行ボタンは活性化
+        self.run_buttom.configure(state = WG_NORMAL)        
+        #サマリ表示ボタン・結果保存ボタンは非活性
+        self.summry_buttom.configure(state = WG_DISABLE)
+        self.save_csv_buttom.configure(state = WG_DISABLE)        
+
+        #実行時間計測
+        self.sim.tr.buildsimtime.stop()
+
+    def loadckpt(self):
+        """チェックポイントの読込み
+        
+         チェックポイントを読み込み、保存時の状態（途中のサイクル）
+         を表示する。続きは「実行ボタン」で実行する。
+         読込みファイル選択ダイアログを表示する。
+         (「途中から読込ボタン」押下時の処理)
+
+        Args:なし
+        Returns:
+            False:キャンセルが押された・読み込めなかった
+            True:読込みが行われた
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            パラメータは保存時の値になる。読み込めなかった場合は、
+            サマリウインドウに理由を表示する
+        """
+        # ファイル選択ダイアログの表示
+        fTyp = [("チェックポイント", "*.ckpt")]
+        #最初は、一時停止時に保存する場所を表示する
+        in_f = tkinter.filedialog.askopenfilename(filetypes = fTyp, title='チェックポイントファイルを選択してくだい。',   \
+            initialdir = CACHE_DIR, initialfile = CHECKPOINT_FILE)
+        
+        #キャンセルが押された
+        if 0 == len(in_f):
+            return False
+
+        #実行時間計測
+        self.sim.tr.clearsimrec()
+        self.sim.tr.buildsimtime.start()
+
+        try:
+            self.sim.loadcheckpoint(in_f)
+        except (ValueError, OSError) as e:
+            ResultSummry(["チェックポイントを読み込めません", str(e)])
+            return False
+        self.engine_checkbv.set(self.sim.engine_kind == ENGINE_ARRAY)
+        self.event_checkbv.set(self.sim.engine_kind == ENGINE_EVENT)
+
+        self.disp_exp_rate = SIM_CANVAS_BASE_H / self.sim.prm.field_size
+        self.jobid=None
+
+        #最後に実行したサイクルの人数
+        c_idx=0
+        for lb in self.stat_count:
+            lb.set(str(self.sim.sim_histories[-1][c_idx]))
             c_idx += 1
-    
+
         #表示のリフレッシュ
         self.canvas_sim.delete("all")
         self.canvas_sim.create_rectangle(0,0,SIM_CANVAS_W,SIM_CANVAS_H,fill=CANVAS_BACK_CLR)
-        for p in self.persons:
-            p.drow_p(refresh=MODE_REFRESH)
-    
-        #グラフ表示のクリア(グラフ)
-        self.canvas_graph.delete("all")
-        self.canvas_graph.create_rectangle(0,0,GRAPH_CANVAS_W,GRAPH_CANVAS_H,fill=CANVAS_BACK_CLR)
-        self.canvas_graph.update()
+        if self.sim.prm.total_persons_count > RASTER_THRESHOLD:
+            self.renderer = self.raster_renderer
+        else:
+            self.renderer = self.item_renderer
+        self.renderer.clear(self.disp_exp_rate)
+        if not (self.nodsp_checkbv.get() and isinstance(self.sim.engine, ArrayEngine)):
+            self.renderer.refresh(self.sim.engine.drawdata())
+
+        #グラフ表示(読み込んだ履歴)
+        self.graph.clear(self.sim.prm.total_persons_count)
+        self.graph.append(self.sim.sim_histories, len(self.sim.sim_histories))
 
         #実行ボタンは活性化
         self.run_buttom.configure(state = WG_NORMAL)        
@@ -1938,96 +8564,75 @@ class MainApp():
         self.save_csv_buttom.configure(state = WG_DISABLE)        
 
         #実行時間計測
-        self.tr.buildsimtime.stop()
+        self.sim.tr.buildsimtime.stop()
+        return True
         
-    def makegraph(self):
-        """グラフ作成
+    def replay(self, in_f=None):
+        """記録の再生
         
-         シミュレーションの履歴グラフを作成する
+         軌跡ファイル（「run」コマンドの--trajで記録したもの）を読み
+         込み、再生ウインドウを表示する。再生中は、セットアップ・実
+         行などはできない。
+         読込みファイル選択ダイアログを表示する。
+         (「記録を再生ボタン」押下時の処理)
 
-        Args:なし
-        Returns:なし
+        Args:
+            in_f(str,optional):軌跡ファイル(Noneの場合はダイアログ
+                    で選択する)
+        Returns:
+            False:キャンセルが押された・読み込めなかった
+            True:再生ウインドウを表示した
         Raises:なし
         Yields:なし
         Examples:なし
-        Note:なし
+        Note:
+            読み込めなかった場合は、サマリウインドウに理由を表示す
+            る。再生後は、セットアップからやり直す
         """
-        entries_len = len(self.sim_histories)
-        
-        if 0 == entries_len:
-            return
-        x_exp_rate = GRAPH_CANVAS_W/entries_len
-        y_exp_rate = GRAPH_CANVAS_H/self.up.ups_dic["total_persons_count"].getvl()
-    
-        #グラフの生成(座標は原点)
-        self.s_his = [0,GRAPH_CANVAS_H]
-        self.i_n_his =[0,GRAPH_CANVAS_H]
-        self.i_l_his =[0,GRAPH_CANVAS_H]
-        self.i_h_his =[0,GRAPH_CANVAS_H]
-        self.r_his =[0,GRAPH_CANVAS_H]
-        self.d_his =[0,GRAPH_CANVAS_H]
-        
-        self.eco_his =[0,0]             #%のグラフなので、一番上（１００％）から描く
+        if in_f is None:
+            # ファイル選択ダイアログの表示
+            fTyp = [("軌跡ファイル", "*.traj")]
+            in_f = tkinter.filedialog.askopenfilename(filetypes = fTyp, title='軌跡ファイルを選択してくだい。')
         
-        #履歴を図形化([0]はサイクル番号なので省く)
-        #上の方から描く（重ねていく（上から）D→R→S→I(n→l→h)）
-        
-        for i in range(entries_len):
-    
-            x_point = (self.sim_histories[i][0])*x_exp_rate
-            
-            stack_d = sum(self.sim_histories[i][1:7])
-            stack_r = sum(self.sim_histories[i][1:6])
-            stack_s = sum(self.sim_histories[i][1:5])
-            stack_i_n = sum(self.sim_histories[i][2:5])
-            stack_i_l = sum(self.sim_histories[i][3:5])
-            stack_i_h = self.sim_histories[i][4]
-            
-            self.d_his.append( x_point )  #x
-            self.d_his.append( GRAPH_CANVAS_H-(stack_d*y_exp_rate)) #y
-            self.r_his.append( x_point )  #x
-            self.r_his.append( GRAPH_CANVAS_H-(stack_r*y_exp_rate)) #y
-            self.s_his.append( x_point )  #x
-            self.s_his.append( GRAPH_CANVAS_H-(stack_s*y_exp_rate)) #y
-            self.i_n_his.append( x_point )  #x
-            self.i_n_his.append( GRAPH_CANVAS_H-(stack_i_n*y_exp_rate)) #y
-            self.i_l_his.append( x_point )  #x
-            self.i_l_his.append( GRAPH_CANVAS_H-(stack_i_l*y_exp_rate)) #y
-            self.i_h_his.append( x_point )  #x
-            self.i_h_his.append( GRAPH_CANVAS_H-(stack_i_h*y_exp_rate)) #y
-            
-            self.eco_his.append( x_point )  #x
-            self.eco_his.append( GRAPH_CANVAS_H-(self.sim_histories[i][8]*GRAPH_CANVAS_H/100) ) #y
-        
-        #終端処理用
-        self.d_his.append(x_point)
-        self.d_his.append(GRAPH_CANVAS_H)
-        self.r_his.append(x_point)
-        self.r_his.append(GRAPH_CANVAS_H)
-        self.s_his.append(x_point)
-        self.s_his.append(GRAPH_CANVAS_H)
-        self.i_n_his.append(x_point)
-        self.i_n_his.append(GRAPH_CANVAS_H)
-        self.i_l_his.append(x_point)
-        self.i_l_his.append(GRAPH_CANVAS_H)
-        self.i_h_his.append(x_point)
-        self.i_h_his.append(GRAPH_CANVAS_H)
-       
-        self.canvas_graph.create_polygon(self.d_his,fill=PERSON_D_CLR)
-        self.canvas_graph.create_polygon(self.r_his,fill=PERSON_R_CLR)
-        self.canvas_graph.create_polygon(self.s_his,fill=PERSON_S_CLR)
-        self.canvas_graph.create_polygon(self.i_n_his,fill=PERSON_I_N_CLR)
-        self.canvas_graph.create_polygon(self.i_l_his,fill=PERSON_I_L_CLR)
-        self.canvas_graph.create_polygon(self.i_h_his,fill=PERSON_I_H_CLR)
+        #キャンセルが押された
+        if 0 == len(in_f):
+            return False
+
+        try:
+            reader = TrajReader(in_f)
+        except (ValueError, OSError) as e:
+            ResultSummry(["軌跡ファイルを読み込めません", str(e)])
+            return False
+        if 0 == len(reader):
+            reader.close()
+            ResultSummry(["軌跡ファイルを読み込めません", "記録されたサイクルがありません"])
+            return False
+
+        #ロードボタン・初期値ボタン・セットアップボタン・実行ボタンなどは非活性
+        for buttom in (self.load_json_buttom, self.set_default_buttom, self.setup_buttom, self.run_buttom,   \
+                self.ensemble_buttom, self.load_ckpt_buttom, self.replay_buttom, self.summry_buttom,   \
+                self.save_csv_buttom):
+            buttom.configure(state = WG_DISABLE)
+
+        #表示のリフレッシュ（人数が多い場合は、画像で描画する）
+        self.disp_exp_rate = SIM_CANVAS_BASE_H / reader.field_size
+        self.canvas_sim.delete("all")
+        self.canvas_sim.create_rectangle(0,0,SIM_CANVAS_W,SIM_CANVAS_H,fill=CANVAS_BACK_CLR)
+        if reader.persons > RASTER_THRESHOLD:
+            self.renderer = self.raster_renderer
+        else:
+            self.renderer = self.item_renderer
+        self.renderer.clear(self.disp_exp_rate)
+        self.graph.clear(reader.persons)
 
-        #経済活動（折れ線）グラフで描く
-        self.canvas_graph.create_line(self.eco_his,fill=PERSON_ECO_CLR, width=2)
+        self.replay_win = ReplayWindow(self, reader)
+        return True
 
-    def run_cycle(self):
-        """シミュレーション実行
+    def endreplay(self):
+        """再生の終了
         
-         シミュレーションを１サイクル分実行する
-         一時停止中でなければ、自分自身で、次の実行をスケジュールする
+         再生ウインドウを閉じた後に、ボタンを元に戻す（実行ボタン
+         は、セットアップするまで非活性）
 
         Args:なし
         Returns:なし
@@ -2036,115 +8641,139 @@ class MainApp():
         Examples:なし
         Note:なし
         """
-        if self.run_mode == CYC_PAUSE:
-            return
+        self.replay_win = None
+        for buttom in (self.load_json_buttom, self.set_default_buttom, self.setup_buttom,   \
+                self.ensemble_buttom, self.load_ckpt_buttom, self.replay_buttom):
+            buttom.configure(state = WG_NORMAL)
 
-        #移動
-        #実行時間計測
-        self.tr.movetime.reset()
-        self.tr.movetime.start()
+    def work(self):
+        """シミュレーションスレッド
+        
+         シミュレーションが終了するまで、サイクルを実行する（画面
+         とは別のスレッドで実行する）。サイクル毎に、状態（スナッ
+         プショット）を画面に送る。画面からのメッセージ（一時停止・
+         再開）は、サイクルの間で処理する。
 
-        for i in self.persons:
-            i.move()
-    
-        #実行時間計測
-        self.tr.movetime.stop()
-        self.tr.addmovetime(self.tr.movetime.getelapsedtime())
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ・キューが一杯の場合（画面の表示が追いついていない場
+            合）は、スナップショットを送らない（その分のサイクル
+            は表示しない）。ただし、最後のサイクルは必ず送る
+            ・サイクル速度(cycle_speed)は、１サイクルの周期(計算
+            時間を含む)とする。0の場合は待たない
+            ・終了時（異常終了を含む）は、Noneを送り、idleをセット
+            する（最後のサイクル中に一時停止した場合も、分岐実行が
+            待ち続けない）
+            ・チェックポイントの間隔毎と一時停止時に、チェックポ
+            イントを保存する
+        """
+        try:
+            paused = False
+            while True:
+                #メッセージの処理（一時停止中は、再開を待つ）
+                while paused or not self.cmdq.empty():
+                    cmd = self.cmdq.get()
+                    if cmd[0] == WK_PAUSE:
+                        #一時停止時は、チェックポイントを保存する
+                        if not paused:
+                            self.sim.autocheckpoint(force=True)
+                        paused = True
+                        self.idle.set()
+                    elif cmd[0] == WK_RESUME:
+                        #変更したパラメータは、次のサイクルから反映
+                        self.idle.clear()
+                        self.sim.setprm(cmd[1])
+                        paused = False
+
+                cycle_start = time.time()
+                self.sim.sim_cycle()
+                end = self.sim.isend()
+
+                #状態を画面に送る
+                if end or not self.snapq.full():
+                    if self.nodsp:
+                        data = None
+                    else:
+                        data = self.sim.engine.drawdata()
+                    self.snapq.put((self.sim.sim_history, data))
+                if end:
+                    return
 
-        #判定＋表示
-        #実行時間計測
-        self.tr.renewtime.reset()
-        self.tr.renewtime.start()
+                #次のサイクル
+                self.sim.nextcycle()
+                self.sim.autocheckpoint()
+                wait = self.sim.prm.cycle_speed/1000 - (time.time() - cycle_start)
+                if wait > 0:
+                    time.sleep(wait)
+        finally:
+            #終了時は、サイクルの間で止まっているのと同じ（分岐実行を待たせない）
+            self.idle.set()
+            self.snapq.put(None)
+
+    def poll(self):
+        """画面更新
+        
+         シミュレーションスレッドから届いた状態のうち、最新のもの
+         だけを画面に表示する。FRAME_MS毎に、自分自身で、次の実行
+         をスケジュールする。
 
-        self.ecoeffect=0.0
-        for i in self.persons:
-            i.stat_renew()
-    
-            #件数カウント
-            # no,s,i_n,i_l,i_h,r,d,R
-            self.sim_history[0] = self.now_cycle
-            if i.stat == S_STATE:
-                self.sim_history[1] += 1
-            elif i.stat == I_STATE:
-                if i.serious == I_RANK_NON:
-                    self.sim_history[2] += 1
-                elif i.serious == I_RANK_LOW:
-                    self.sim_history[3] += 1
-                else:       # I_RANK_HIGH
-                    self.sim_history[4] += 1
-            elif i.stat == R_STATE:
-                self.sim_history[5] += 1
-            else:           # D_STATE
-                self.sim_history[6] += 1
-                
-            self.ecoeffect += i.r
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        #届いている状態を全部取り出す（最新のもの以外は表示しない）
+        snap = None
+        finished = False
+        try:
+            while True:
+                item = self.snapq.get_nowait()
+                if item is None:
+                    finished = True
+                else:
+                    snap = item
+        except queue.Empty:
+            pass
 
-        #実行再生産数：直近の免疫獲得サイクルので計測
-        if self.now_cycle > 0 :
-            bf_his = self.sim_histories[self.now_cycle-1]
-            bf_his_i = sum(bf_his[2:5])
-            now_i = sum(self.sim_history[2:5])
-            
-            if bf_his_i > 1 and now_i > 0:
-                self.sim_history[7] =round( math.log(now_i,bf_his_i),4)
-            else:
-                self.sim_history[7] = 0.0
+        if snap is not None:
+            sim_history, data = snap
 
-                       
-        #経済活動割合
-        self.sim_history[8] = round(self.ecoeffect/ self.ecoact*100,2)
+            #実行時間計測
+            self.sim.tr.drawtime.reset()
+            self.sim.tr.drawtime.start()
 
-        #実行時間計測
-        self.tr.renewtime.stop()
-        self.tr.addrenewtime(self.tr.renewtime.getelapsedtime())
+            #表示のリフレッシュ
+            if data is not None:
+                self.renderer.drow(data)
 
-        #実行時間計測
-        self.tr.drawtime.reset()
-        self.tr.drawtime.start()
+            #テキスト表示
+            c_idx=0
+            for lb in self.stat_count:
+                lb.set(str(sim_history[c_idx]))
+                c_idx += 1
 
-        #表示のリフレッシュ
-        if self.nodsp_checkbv.get():
-            pass
-        else:
-            for p in self.persons:
-                p.drow_p(refresh=MODE_MOVE)
-        
-    
-        #ヒストリーに追加
-        self.sim_histories.append(self.sim_history) 
-        
-        #テキスト表示
-        c_idx=0
-        for lb in self.stat_count:
-            lb.set(str(self.sim_history[c_idx]))
-            c_idx += 1
-        
-        #表示のリフレッシュ(グラフ)
-        if self.nodsp_checkbv.get():
-            pass
-        else:
-            self.canvas_graph.delete("all")
-            self.canvas_graph.create_rectangle(0,0,GRAPH_CANVAS_W,GRAPH_CANVAS_H,fill=CANVAS_BACK_CLR)
-            self.makegraph()
-            self.canvas_graph.update()
-        
-    
-        #実行時間計測
-        self.tr.drawtime.stop()
-        self.tr.adddrawtime(self.tr.drawtime.getelapsedtime())
+            #表示のリフレッシュ(グラフ) ※表示済みのサイクルの後だけ追加
+            if data is not None:
+                self.graph.append(self.sim.sim_histories, sim_history[0]+1)
+
+            #実行時間計測
+            self.sim.tr.drawtime.stop()
+            self.sim.tr.adddrawtime(self.sim.tr.drawtime.getelapsedtime())
 
         #終了判定
-        if self.now_cycle > (self.up.ups_dic["cycle_max"].getvl()) or 0 == (sum(self.sim_history[2:5])):
-            if self.jobid is not None:
-                self.root.after_cancel(self.jobid)
-                self.jobId=None
-                self.terminat()
+        if finished:
+            self.worker.join()
+            self.worker=None
+            self.jobid=None
+            self.terminat()
         else:
-            #次のサイクル
-            self.now_cycle += 1
-            #カウンタクリア
-            self.sim_history = [0,0,0,0,0,0,0,0.0,0.0]
-            self.jobid=self.root.after(self.up.ups_dic["cycle_speed"].getvl(),self.run_cycle)
+            self.jobid=self.root.after(FRAME_MS,self.poll)
         
     def runsim(self):
         """シミュレーション開始
@@ -2160,7 +8789,7 @@ class MainApp():
         Note:なし
         """
         #実行時間計測
-        self.tr.allsimtime.start()
+        self.sim.tr.allsimtime.start()
 
         #実行ボタンは非活性化
         self.run_buttom.configure(state = WG_DISABLE)        
@@ -2169,75 +8798,30 @@ class MainApp():
         self.save_json_buttom.configure(state = WG_DISABLE)
         self.set_default_buttom.configure(state = WG_DISABLE)
         self.setup_buttom.configure(state = WG_DISABLE)
+        self.ensemble_buttom.configure(state = WG_DISABLE)
+        self.load_ckpt_buttom.configure(state = WG_DISABLE)
+        self.replay_buttom.configure(state = WG_DISABLE)
         #パラメータ入力エリアも非活性
         for key in self.ent_dic.keys():
             self.ent_dic[key].entry.configure(state = WG_DISABLE)
         #画面更新モードチェックボタンも非活性
         self.nodsp_check.configure(state = WG_DISABLE)
+        self.engine_check.configure(state = WG_DISABLE)
+        self.event_check.configure(state = WG_DISABLE)
         #一時停止ボタンは活性
         self.pause_buttom.configure(state = WG_NORMAL) 
         
         self.run_mode=CYC_RUN
-       
-    
-        self.run_cycle()
-
-    def hist_summry(self):
-        """サマリ作成
-        
-         ヒストリーを集計してサマリを作成する。
-         サマリはサマリ表示用リストに格納する。
-
-        Args:なし
-        Returns:なし
-        Raises:なし
-        Yields:なし
-        Examples:なし
-        Note:なし
-        """
-        #表示
-        self.sentences.append("画面初期構築時間(ms)={}".format(self.tr.buildtime.getelapsedtime()))
-        self.sentences.append("シミュレーションセットアップ時間(ms)={}".format(self.tr.buildsimtime.getelapsedtime()))
-        self.sentences.append("シミュレーション総実行時間(ms)={}".format(self.tr.allsimtime.getelapsedtime()))
-        self.sentences.append("　移動実行時間(ms)={}".format(self.tr.allmovetime))
-        self.sentences.append("　判定実行時間(ms)={}".format(self.tr.allrenewtime))
-        self.sentences.append("　画面描写時間(ms)={}".format(self.tr.alldrawtime))
-        self.sentences.append("-"*50)
-
-        #人数カウント
-        all_stat_lst = [p.stat for p in self.persons]
-        s_cnt=all_stat_lst.count(S_STATE)
-        r_cnt=all_stat_lst.count(R_STATE)
-        d_cnt=all_stat_lst.count(D_STATE)
-        i_cnt=r_cnt+d_cnt
-        all_seri_lst = [p.serious for p in self.persons]
-        i_n_cnt=all_seri_lst.count(I_RANK_NON)
-        i_l_cnt=all_seri_lst.count(I_RANK_LOW)
-        i_h_cnt=all_seri_lst.count(I_RANK_HIGH)
-    
-        self.sentences.append("収束までのサイクル={}".format(self.now_cycle))    
-        self.sentences.append("非感染者人数={} 非感染率(対人口)={}%".format(s_cnt,round(s_cnt/self.up.ups_dic["total_persons_count"].getvl()*100,2)))
-        self.sentences.append("回復者人数={} 回復率(対感染者)={}%".format(r_cnt,round(r_cnt/i_cnt*100,2)))
-        self.sentences.append("死亡者人数={} 死亡率(対人口)={}%".format(d_cnt,round(d_cnt/self.up.ups_dic["total_persons_count"].getvl()*100,2)))
-        self.sentences.append("死亡者人数={} 死亡率(対感染者)={}%".format(d_cnt,round(d_cnt/i_cnt*100,2)))
-        self.sentences.append("症状なし人数={} 発生率(対感染者)={}%".format(i_n_cnt,round(i_n_cnt/i_cnt*100,2)))
-        self.sentences.append("軽症人数={} 発生率(対感染者)={}%".format(i_l_cnt,round(i_l_cnt/i_cnt*100,2)))
-        self.sentences.append("重症人数={} 発生率(対感染者)={}%".format(i_h_cnt,round(i_h_cnt/i_cnt*100,2)))
-
-        #ピーク時感染者数（合計）・感染者数（軽症＋重症）
-        max_i_lst = [(sum(i[2:5]),i[0]) for i in self.sim_histories]
-        max_i = max(max_i_lst)
-        self.sentences.append("ピーク時感染者(合計)：サイクル={} 人数={}".format(max_i[1],max_i[0]))
-        max_i_lh_lst = [(sum(i[3:5]),i[0]) for i in self.sim_histories]
-        max_i_lh = max(max_i_lh_lst)
-        self.sentences.append("ピーク時感染者(軽症＋重症)：サイクル={} 人数={}".format(max_i_lh[1],max_i_lh[0]))
 
-        #最大経済影響・平均経済影響
-        min_eco_lst = [(i[8],i[0]) for i in self.sim_histories]
-        min_eco = min(min_eco_lst)
-        self.sentences.append("最大経済影響：サイクル={} 割合={}%".format(min_eco[1],min_eco[0]))
-        avr_eco = sum( i[8] for i in self.sim_histories )/len(self.sim_histories)
-        self.sentences.append("平均経済影響：{}%".format(round(avr_eco,2)))
+        #シミュレーションスレッドの開始
+        #（画面更新モードは、実行中は変更できないので、最初に読んでおく）
+        self.nodsp=self.nodsp_checkbv.get()
+        self.cmdq=queue.Queue()
+        self.snapq=queue.Queue(maxsize=SNAP_QUEUE_SIZE)
+        self.idle.clear()
+        self.worker=threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+        self.jobid=self.root.after(FRAME_MS,self.poll)
 
     def terminat(self):
         """シミュレーション終了処理
@@ -2252,9 +8836,9 @@ class MainApp():
         Note:なし
         """
         #実行時間計測
-        self.tr.allsimtime.stop()
+        self.sim.tr.allsimtime.stop()
         
-        self.hist_summry()
+        self.sim.hist_summry()
         self.dispsummry()
        
         #ロードボタン・セーブボタン・初期値ボタン・セットアップボタン・サマリ表示ボタンは活性
@@ -2262,16 +8846,24 @@ class MainApp():
         self.save_json_buttom.configure(state = WG_NORMAL)
         self.set_default_buttom.configure(state = WG_NORMAL)
         self.setup_buttom.configure(state = WG_NORMAL)
+        self.ensemble_buttom.configure(state = WG_NORMAL)
+        self.load_ckpt_buttom.configure(state = WG_NORMAL)
+        self.replay_buttom.configure(state = WG_NORMAL)
         self.summry_buttom.configure(state = WG_NORMAL)  
         self.save_csv_buttom.configure(state = WG_NORMAL)
         #画面更新モードチェックボタンも非活性
         self.nodsp_check.configure(state = WG_NORMAL)
+        if np is not None:
+            self.engine_check.configure(state = WG_NORMAL)
+        self.event_check.configure(state = WG_NORMAL)
 
         #パラメータ入力エリアも活性
         for key in self.ent_dic.keys():
             self.ent_dic[key].entry.configure(state = WG_NORMAL)
-        #一時停止ボタンは非活性
+        #一時停止ボタン・再開ボタン・分岐実行ボタンは非活性
         self.pause_buttom.configure(state = WG_DISABLE)     
+        self.restart_buttom.configure(state = WG_DISABLE)
+        self.fork_buttom.configure(state = WG_DISABLE)
             
     def pause(self):
         """シミュレーション一時停止
@@ -2286,9 +8878,9 @@ class MainApp():
         Examples:なし
         Note:なし
         """
-        #サイクルスレッドの一時停止
+        #シミュレーションスレッドの一時停止
         self.run_mode=CYC_PAUSE
-        self.jobid=None
+        self.cmdq.put((WK_PAUSE,))
 
         #パラメータ入力エリアも活性
         self.ent_dic["s_move_limit_rate"].entry.configure(state = WG_NORMAL)
@@ -2303,8 +8895,9 @@ class MainApp():
         self.ent_dic["r_move_disable_rate"].entry.configure(state = WG_NORMAL)
         #一時停止ボタンは非活性
         self.pause_buttom.configure(state = WG_DISABLE)
-        #再開ボタンは活性
-        self.restart_buttom.configure(state = WG_NORMAL) 
+        #再開ボタン・分岐実行ボタンは活性
+        self.restart_buttom.configure(state = WG_NORMAL)
+        self.fork_buttom.configure(state = WG_NORMAL) 
         
     def restart(self):
         """シミュレーション再開
@@ -2332,12 +8925,146 @@ class MainApp():
         self.ent_dic["r_move_disable_rate"].entry.configure(state = WG_DISABLE)
         #一時停止ボタンは活性
         self.pause_buttom.configure(state = WG_NORMAL)
-        #再開ボタンは非活性
+        #再開ボタン・分岐実行ボタンは非活性
         self.restart_buttom.configure(state = WG_DISABLE)     
+        self.fork_buttom.configure(state = WG_DISABLE)
 
-        #サイクルスレッド再開
+        #シミュレーションスレッド再開(変更したパラメータは、次のサイクルから反映)
         self.run_mode=CYC_RUN
-        self.jobid=self.root.after(self.up.ups_dic["cycle_speed"].getvl(),self.run_cycle)
+        self.cmdq.put((WK_RESUME, self.up.compile()))
+
+    def forksim(self):
+        """分岐実行
+        
+         一時停止した状態から、画面のパラメータと、分岐指定ファイル
+         (json)のパラメータで分岐して最後まで実行し、結果を分岐比較
+         ウインドウに表示する。分岐指定ファイル選択ダイアログを表示
+         する。
+         (「分岐実行ボタン」押下時の処理)
+
+        Args:なし
+        Returns:
+            False:キャンセルが押された・分岐指定が間違っている
+            True:分岐実行が行われた
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            ・実行が終わるまで画面は操作できない
+            ・元のシミュレーションは一時停止のまま（「再開ボタン」
+            で続きを実行できる）
+        """
+        # ファイル選択ダイアログの表示
+        fTyp = [("JSONファイル", "*.json")]
+        in_f = tkinter.filedialog.askopenfilename(filetypes = fTyp, title='分岐指定ファイル（json）を選択してくだい。')
+        
+        #キャンセルが押された
+        if 0 == len(in_f):
+            return False
+
+        #シミュレーションスレッドが、サイクルの間で止まるのを待つ
+        #（スレッドが終了している場合は待たない）
+        #※分岐するサイクルが決まるように、分岐を作る前に待つ
+        if self.worker is not None and self.worker.is_alive():
+            self.idle.wait()
+
+        #最初の分岐は画面のパラメータ
+        branch = {"name":"画面の値"}
+        for key in FORK_KEYS:
+            branch[key] = self.up.ups_dic[key].getvl()
+        try:
+            fork = Fork(self.sim, [branch] + Fork.loadjson(in_f))
+        except (KeyError, ValueError, OSError) as e:
+            ResultSummry(["分岐指定が間違っています", str(e)])
+            return False
+
+        self.root.configure(cursor="watch")
+        self.root.update()
+        fork.run()
+        self.root.configure(cursor="")
+
+        ForkWindow(fork, self.sim.prm.total_persons_count)
+        ResultSummry(fork.sentences)
+        return True
+
+    def runensemble(self):
+        """アンサンブル実行
+        
+         アンサンブル実行を行い、結果のばらつきをグラフに表示し、
+         サマリウインドウを表示する
+         (「アンサンブル実行ボタン」押下時の処理)
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:
+            実行が終わるまで画面は操作できない
+        """
+        engine = self.selengine()
+        #同じ条件のレプリカは、キャッシュの結果を使う
+        try:
+            ensemble = Ensemble(self.up, self.up.ups_dic["ensemble_count"].getvl(), engine, cache_dir=CACHE_DIR)
+        except ValueError as e:
+            ResultSummry(["アンサンブル実行できません", str(e)])
+            return
+        self.root.configure(cursor="watch")
+        self.root.update()
+
+        self.ensemble = ensemble
+        self.ensemble.run()
+
+        self.root.configure(cursor="")
+        #グラフをアンサンブル結果で上書きするため、実行にはセットアップが必要
+        self.run_buttom.configure(state = WG_DISABLE)
+        self.makeband()
+        ResultSummry(self.ensemble.sentences)
+
+    def makeband(self):
+        """アンサンブルグラフ作成
+        
+         アンサンブル実行の結果を、グラフ表示用キャンバスに表示
+         する。未感染者・感染者(合計)・免疫保持者・死亡者は、5%〜
+         95%の範囲を帯で、中央値を線で描く。経済活動は中央値のみ。
+
+        Args:なし
+        Returns:なし
+        Raises:なし
+        Yields:なし
+        Examples:なし
+        Note:なし
+        """
+        self.canvas_graph.delete("all")
+        self.canvas_graph.create_rectangle(0,0,GRAPH_CANVAS_W,GRAPH_CANVAS_H,fill=CANVAS_BACK_CLR)
+        entries_len = len(self.ensemble.band)
+        if 2 > entries_len:
+            return
+        x_exp_rate = GRAPH_CANVAS_W/(entries_len-1)
+        y_exp_rate = GRAPH_CANVAS_H/self.up.ups_dic["total_persons_count"].getvl()
+
+        for title, color in (("未感染",PERSON_S_CLR), ("免疫保持",PERSON_R_CLR),   \
+                ("死亡",PERSON_D_CLR), ("感染(計)",PERSON_I_H_CLR)):
+            col = self.ensemble.bandcol(title)
+            #帯(5%の線を行き、95%の線を戻る多角形)
+            band_pts = []
+            for i in range(entries_len):
+                band_pts += [i*x_exp_rate, GRAPH_CANVAS_H-col[i][1]*y_exp_rate]
+            for i in reversed(range(entries_len)):
+                band_pts += [i*x_exp_rate, GRAPH_CANVAS_H-col[i][3]*y_exp_rate]
+            self.canvas_graph.create_polygon(band_pts, fill=color, stipple="gray50")
+            #中央値
+            med_pts = []
+            for i in range(entries_len):
+                med_pts += [i*x_exp_rate, GRAPH_CANVAS_H-col[i][2]*y_exp_rate]
+            self.canvas_graph.create_line(med_pts, fill=color, width=2)
+
+        #経済活動(中央値)
+        eco_pts = []
+        for i, stats in enumerate(self.ensemble.bandcol("経済活動(%)")):
+            eco_pts += [i*x_exp_rate, GRAPH_CANVAS_H-(stats[2]*GRAPH_CANVAS_H/100)]
+        self.canvas_graph.create_line(eco_pts, fill=PERSON_ECO_CLR, width=2)
+        self.canvas_graph.update()
 
     def dispsummry(self):
         """サマリウインドウの表示
@@ -2352,7 +9079,7 @@ class MainApp():
         Examples:なし
         Note:なし
         """
-        ResultSummry(self.sentences)
+        ResultSummry(self.sim.sentences)
         
     def savehistory(self):
         """シミュレーション結果保存
@@ -2375,12 +9102,7 @@ class MainApp():
         if 0 == len(out_f):
             return False
         
-        csv_title = [titles[0] for titles in DSP_TITLES_DIC]
-        a = open(out_f, "w")
-        csvout = csv.writer(a)
-        csvout.writerow(csv_title)
-        csvout.writerows(self.sim_histories)
-        a.close()
+        self.sim.writehistory(out_f)
         
         return True
 
@@ -2399,7 +9121,768 @@ class MainApp():
         """
         HelpWindow()
         
+def simulate(params=None, seed=None, engine=ENGINE_PERSON, agents=False, history=False):
+    """シミュレーションの逐次実行（ジェネレータ）
+
+     画面なしでシミュレーションを実行し、サイクル毎の記録
+     (CycleRecord)を１つずつ返す。サイクルは、次の記録を受け取る
+     時に実行する（受け取らなければ実行しない）。途中で受け取る
+     のをやめる（close()する、forを抜ける）と、実行も終わる。
+
+    Args:
+        params(dic or str,optional):パラメータ値の辞書
+                (UsrPrms.getdic()と同じキー。変更するものだけでよい)、
+                またはパラメータファイル(json)のパス
+                ※省略時はデフォルト値
+        seed(int,optional):乱数シード(省略時はパラメータの値)
+        engine(str,optional):シミュレーションエンジン。
+                ※Simulation.setup()を参照
+        agents(bool,optional):True:記録に全員の配列を含める
+        history(bool,optional):True:シミュレーション履歴を保持する
+                (省略時は、直近のサイクルの分だけを保持する)
+    Returns:
+        最後まで実行した場合は、シミュレーション履歴(HistBuffer)
+        (historyがFalseの場合はNone)
+        ※ジェネレータの戻り値（StopIteration.value、yield from）
+    Raises:
+        ValueError:配列版エンジンで、NumPyがインストールされていない
+    Yields:
+        サイクル毎の記録(CycleRecord)
+    Examples:
+        for rec in simulate({"infection_rate": 0.5}, seed=1):
+            if rec.d > 10:
+                break
+    Note:
+        記録は、終了判定(Simulation.isend())の前に返すため、最後
+        のサイクル（感染者がゼロになったサイクル）の記録も返す
+    """
+    up=UsrPrms()
+    up.loaddefault()
+    if isinstance(params, str):
+        up.loadjson(params)
+    elif params is not None:
+        for key, value in params.items():
+            up.ups_dic[key].set(value)
+    if seed is not None:
+        up.ups_dic["seed"].set(seed)
+    up.recalc()
+
+    sim=Simulation(up)
+    sim.hist_keep=history
+    sim.setup(engine)
+    try:
+        while True:
+            sim.sim_cycle()
+            yield CycleRecord(sim.sim_history, sim.engine.frame() if agents else None)
+            if sim.isend():
+                break
+            sim.nextcycle()
+    finally:
+        #途中でやめた場合も、出力先を閉じる
+        sim.sim_histories.close()
+        sim.closetraj()
+    if history:
+        return sim.sim_histories
+    return None
+
+def runreplica(prm_dic, engine, seed, hist_path=None, cache_dir=None):
+    """レプリカの実行
+    
+     アンサンブル実行の１回分（レプリカ）を、画面なしで実行する。
+     Ensembleから、別プロセスで呼び出される。
+
+    Args:
+        prm_dic(dic):パラメータ値の辞書(UsrPrms.getdic())
+        engine(str):シミュレーションエンジン
+        seed(int):このレプリカの乱数シード
+        hist_path(str,optional):履歴のストリーム出力先
+        cache_dir(str,optional):実行結果のキャッシュのディレクトリ
+                (ResultCache)(省略時はキャッシュを使わない)
+    Returns:
+        (sim_histories, 指標の辞書(ENSEMBLE_METRICS))
+        ※ストリーム出力した場合は、sim_historiesはNone
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    if engine == ENGINE_ARRAY:
+        import_np()
+    up=UsrPrms()
+    up.loaddefault()
+    for key, value in prm_dic.items():
+        up.ups_dic[key].set(value)
+    up.ups_dic["seed"].set(seed)
+    up.recalc()
+
+    sim=Simulation(up)
+    sim.hist_path=hist_path
+    if cache_dir is not None:
+        sim.cache=ResultCache(cache_dir)
+    sim.run(engine)
+
+    if hist_path is not None:
+        return None, replicametric(sim)
+    return sim.sim_histories, replicametric(sim)
+
+def runbatch(prm_dic, seeds, cache_dir=None):
+    """レプリカの一括実行
+    
+     アンサンブル実行の複数回分（レプリカ）を、BatchSimulationで
+     まとめて画面なしで実行する。Ensembleから、別プロセスで呼び出
+     される。
+
+    Args:
+        prm_dic(dic):パラメータ値の辞書(UsrPrms.getdic())
+        seeds[](int):レプリカ毎の乱数シード
+        cache_dir(str,optional):実行結果のキャッシュのディレクトリ
+                (ResultCache)(省略時はキャッシュを使わない)
+    Returns:
+        レプリカ毎の(sim_histories, 指標の辞書(ENSEMBLE_METRICS))
+        のリスト ※runreplica()の結果と同じ
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:
+        レプリカ毎の結果は、一緒に実行したレプリカ（シード）によっ
+        て変わるため、キャッシュのキーは、シードのリストで作る
+    """
+    if cache_dir is not None:
+        cache = ResultCache(cache_dir)
+        key = ResultCache.key(prm_dic, list(seeds), ENGINE_BATCH)
+        value = cache.get(key)
+        if value is not None:
+            results = []
+            for replica in value["replicas"]:
+                histories = HistBuffer()
+                histories.extend(replica["rows"])
+                results.append((histories, replica["metric"]))
+            return results
+
+    import_np()
+    up=UsrPrms()
+    up.loaddefault()
+    for key, value in prm_dic.items():
+        up.ups_dic[key].set(value)
+    up.recalc()
+
+    batch=BatchSimulation(up, seeds)
+    batch.run()
+    results = list(zip(batch.sim_histories, batch.metrics()))
+    if cache_dir is not None:
+        cache.put(key, {"replicas": [{"rows": list(histories), "metric": metric} for histories, metric in results]})
+    return results
+
+def runbranch(prm_dic, ckpt_path):
+    """分岐の実行
+    
+     分岐実行の１つ分（分岐）を、一時停止した状態から、パラメータ
+     を変えて画面なしで最後まで実行する。Forkから、別プロセスで
+     呼び出される。
+
+    Args:
+        prm_dic(dic):この分岐のパラメータ値の辞書(PrmSnap.getdic())
+        ckpt_path(str):元の状態のチェックポイントファイルのパス
+                Noneの場合は、forkで引き継いだfork_baseから続ける
+    Returns:
+        (sim_histories, 指標の辞書(ENSEMBLE_METRICS))
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:
+        fork_baseは、このプロセスだけのコピー（コピーオンライト）
+        のため、書き換えても呼び出し元や他の分岐には影響しない
+    """
+    if ckpt_path is None:
+        sim = fork_base
+    else:
+        sim = Simulation(None)
+        sim.loadcheckpoint(ckpt_path, stream=False)
+    #元のチェックポイントは上書きしない（軌跡も、元の記録を閉じずに記録をやめる）
+    sim.ckpt_path = None
+    sim.traj = None
+    sim.setprm(PrmSnap(prm_dic))
+    sim.sentences = []
+    sim.tr.clearsimrec()
+    sim.runloop()
+
+    return sim.sim_histories, replicametric(sim)
+
+def replicametric(sim):
+    """結果サマリの指標
+    
+     実行が終了したシミュレーションから、結果サマリの指標を求める
+
+    Args:
+        sim(Simulation):実行が終了したシミュレーション
+    Returns:指標の辞書(ENSEMBLE_METRICS)
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    histories = sim.sim_histories
+    return {"peak_i":sim.i_t_max[0], "peak_cycle":sim.i_t_max[1], "dead":histories[-1][6],   \
+        "min_eco":histories.colmin[8],   \
+        "avr_eco":histories.colsum[8]/len(histories), "cycles":sim.now_cycle}
+
+def quantile(values, q):
+    """分位点
+    
+     並べ替え済みの値のリストから、分位点を求める（線形補間）
+
+    Args:
+        values[](int or float):値のリスト(昇順に並べ替え済み)
+        q(float):分位(0.0〜1.0)
+    Returns:分位点の値(float)
+    Raises:なし
+    Yields:なし
+    Examples:
+        quantile([1,2,3,4,5], 0.5) → 3
+    Note:なし
+    """
+    pos = (len(values)-1)*q
+    lo = int(pos)
+    hi = min(lo+1, len(values)-1)
+    return values[lo] + (values[hi]-values[lo])*(pos-lo)
+
+def rungui(traj_path=None):
+    """画面ありの実行
+    
+     メインウインドウを構築し、画面からの操作を受け付ける
+
+    Args:
+        traj_path(str,optional):最初に再生する軌跡ファイル
+                (「replay」コマンド)
+    Returns:なし
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    app=MainApp()
+    if traj_path is not None:
+        app.replay(traj_path)
+    app.root.mainloop()
+
+def runcmd(args):
+    """画面なしの実行（「run」コマンド）
+    
+     パラメータファイル(json)を読み込んで、画面なしでシミュレー
+     ションを最後まで実行し、結果(csv)とサマリ(テキスト)を書き
+     出す。tkinterは読み込まない。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            prm_json(str):パラメータファイル(json)
+            out(str):結果(csv)の保存先(Noneの場合は保存しない)
+            summary(str):サマリの保存先(Noneの場合は標準出力)
+            engine(str):シミュレーションエンジン
+            checkpoint(str):チェックポイントの保存先(Noneの場合は保存しない)
+            every(int):チェックポイントの間隔(Noneの場合はパラメータの値)
+            stream(str):履歴のストリーム出力先(Noneの場合は出力しない)
+            traj(str):軌跡の記録先(Noneの場合は記録しない)
+            traj_raw(bool):True:軌跡を差分にせずに記録する
+            store(str):実行結果の保存先(RunStore)(Noneの場合は保存しない)
+            cache(str):実行結果のキャッシュのディレクトリ(Noneの場合
+                    は使わない)。軌跡・チェックポイントを保存する場合
+                    は使わない
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py run params.json --out history.csv
+        python3 cv19sim.py run params.json --checkpoint run.ckpt --every 100
+        python3 cv19sim.py run params.json --stream history.bin
+        python3 cv19sim.py run params.json --traj run.traj
+    Note:なし
+    """
+    if args.engine == ENGINE_ARRAY and not import_np():
+        print("NumPyがインストールされていないため、配列版エンジンは使用できません", file=sys.stderr)
+        return 1
+
+    #パラメータ（jsonに無い項目はデフォルト値）
+    up=UsrPrms()
+    up.loaddefault()
+    up.loadjson(args.prm_json)
+    if args.every is not None:
+        up.ups_dic["checkpoint_cycle"].set(args.every)
+    if args.checkpoint is not None and up.ups_dic["checkpoint_cycle"].getvl() <= 0:
+        print("チェックポイントの間隔(--every)を指定してください", file=sys.stderr)
+        return 1
+
+    sim=Simulation(up)
+    sim.ckpt_path = args.checkpoint
+    sim.hist_path = args.stream
+    sim.traj_path = args.traj
+    sim.traj_delta = not args.traj_raw
+    if args.cache is not None:
+        sim.cache = ResultCache(args.cache)
+    sim.run(args.engine)
+    if args.cache is not None:
+        sim.cache.evict()
+
+    writeresult(sim, args)
+    return 0
+
+def resumecmd(args):
+    """チェックポイントからの再開（「resume」コマンド）
+    
+     「run」コマンド・画面ありの実行で保存したチェックポイントか
+     ら、画面なしでシミュレーションを再開して最後まで実行し、結果
+     (csv)とサマリ(テキスト)を書き出す。履歴をストリーム出力して
+     いた場合は、同じファイルに続きを出力する。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            ckpt(str):チェックポイントファイル
+            out(str):結果(csv)の保存先(Noneの場合は保存しない)
+            summary(str):サマリの保存先(Noneの場合は標準出力)
+            checkpoint(str):チェックポイントの保存先(Noneの場合は
+                    読み込んだファイル)
+            every(int):チェックポイントの間隔(Noneの場合は保存時の値)
+            store(str):実行結果の保存先(RunStore)(Noneの場合は保存しない)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py resume run.ckpt --out history.csv
+    Note:なし
+    """
+    try:
+        sim=Simulation(None)
+        if args.checkpoint is None:
+            sim.ckpt_path = args.ckpt
+        else:
+            sim.ckpt_path = args.checkpoint
+        sim.tr.clearsimrec()
+        sim.tr.buildsimtime.start()
+        sim.loadcheckpoint(args.ckpt)
+        sim.tr.buildsimtime.stop()
+    except (ValueError, OSError) as e:
+        print("チェックポイントを読み込めません:{}".format(e), file=sys.stderr)
+        return 1
+    if args.every is not None:
+        sim.ckpt_every = args.every
+    sim.runloop()
+
+    writeresult(sim, args)
+    return 0
+
+def trajcmd(args):
+    """軌跡の取り出し（「traj」コマンド）
+    
+     「run」コマンドで記録した軌跡ファイルから、指定したサイクル
+     の全員の位置・ステータス・重篤度をcsvに書き出す。サイクルを
+     指定しない場合は、ファイルの情報を表示する。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            traj_file(str):軌跡ファイル
+            cycle(int):取り出すサイクル(Noneの場合は情報を表示)
+            out(str):csvの保存先(Noneの場合は標準出力)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py traj run.traj --cycle 100 --out cycle100.csv
+    Note:なし
+    """
+    import_np()
+    try:
+        reader = TrajReader(args.traj_file)
+    except (ValueError, OSError) as e:
+        print("軌跡ファイルを読み込めません:{}".format(e), file=sys.stderr)
+        return 1
+    if args.cycle is None:
+        print("人数={} サイクル数={} キーフレーム間隔={} フィールドサイズ={}".format(   \
+            reader.persons, len(reader), reader.key_every, reader.field_size))
+        reader.close()
+        return 0
+    try:
+        xs, ys, stats, serious = reader.frame(args.cycle)
+    except IndexError as e:
+        print("サイクルが範囲外です:{}".format(e), file=sys.stderr)
+        reader.close()
+        return 1
+    if args.out is None:
+        f = sys.stdout
+    else:
+        f = open(args.out, "w", newline="")
+    writer = csv.writer(f)
+    writer.writerow(["no", "x", "y", "stat", "serious"])
+    for i, (x, y, st, se) in enumerate(zip(xs, ys, stats, serious)):
+        writer.writerow([i, round(float(x), 2), round(float(y), 2), CODE_STAT[st], CODE_SERIOUS[se]])
+    if args.out is not None:
+        f.close()
+    reader.close()
+    return 0
+
+def forkcmd(args):
+    """分岐実行（「fork」コマンド）
+    
+     チェックポイントの状態から、分岐指定ファイル(json)の分岐毎に
+     パラメータを変えて、画面なしで並列に最後まで実行し、分岐毎の
+     結果(csv)と、サイクル毎の人数(csv)を書き出す。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            ckpt(str):チェックポイントファイル
+            branches_json(str):分岐指定ファイル(json)
+                    ※Fork.loadjson()を参照
+            workers(int):並列数(Noneの場合はCPUのコア数)
+            out(str):分岐毎の結果(csv)の保存先
+            histories(str):サイクル毎の人数(csv)の保存先
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py fork run.ckpt branches.json --out fork.csv
+    Note:
+        チェックポイントは１回だけ読み込み、各分岐はその状態を
+        forkで引き継ぐ
+    """
+    try:
+        sim=Simulation(None)
+        sim.loadcheckpoint(args.ckpt, stream=False)
+    except (ValueError, OSError) as e:
+        print("チェックポイントを読み込めません:{}".format(e), file=sys.stderr)
+        return 1
+    try:
+        fork=Fork(sim, Fork.loadjson(args.branches_json), args.workers)
+    except (KeyError, ValueError, OSError) as e:
+        print("分岐指定が間違っています: {}".format(e), file=sys.stderr)
+        return 1
+    fork.run()
+
+    if args.out is not None:
+        fork.writesummary(args.out)
+    if args.histories is not None:
+        fork.writehistories(args.histories)
+    print("\n".join(fork.sentences))
+    return 0
+
+def writeresult(sim, args):
+    """結果の書き出し（「run」「resume」コマンド）
+    
+     結果(csv)とサマリ(テキスト)を書き出す
+
+    Args:
+        sim(Simulation):実行が終了したシミュレーション
+        args(argparse.Namespace):コマンドライン引数
+            out(str):結果(csv)の保存先(Noneの場合は保存しない)
+            summary(str):サマリの保存先(Noneの場合は標準出力)
+            store(str):実行結果の保存先(RunStore)(Noneの場合は保存しない)
+    Returns:なし
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    if args.out is not None:
+        sim.writehistory(args.out)
+    if args.store is not None:
+        store = RunStore(args.store)
+        store.add(sim.prm.getdic(), sim.seed, replicametric(sim), sim.allhistories(), args.command, sim.engine_kind)
+        store.close()
+    if args.summary is None:
+        print("\n".join(sim.sentences))
+    else:
+        a = open(args.summary, "w")
+        a.write("\n".join(sim.sentences)+"\n")
+        a.close()
+
+def ensemblecmd(args):
+    """アンサンブル実行（「ensemble」コマンド）
+    
+     パラメータファイル(json)を読み込んで、シードを変えたシミュ
+     レーションを並列に実行し、サイクル毎の集計結果(csv)と、結果
+     のばらつきのサマリ(テキスト)を書き出す。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            prm_json(str):パラメータファイル(json)
+            count(int):レプリカの数(Noneの場合はパラメータの値)
+            workers(int):並列数(Noneの場合はCPUのコア数)
+            out(str):集計結果(csv)の保存先(Noneの場合は保存しない)
+            summary(str):サマリの保存先(Noneの場合は標準出力)
+            engine(str):シミュレーションエンジン
+            store(str):レプリカ毎の実行結果の保存先(RunStore)
+                    (Noneの場合は保存しない)
+            cache(str):実行結果のキャッシュのディレクトリ(Noneの場合
+                    は使わない)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py ensemble params.json -n 100 --out band.csv
+    Note:なし
+    """
+    if args.engine in (ENGINE_ARRAY, ENGINE_BATCH) and not import_np():
+        print("NumPyがインストールされていないため、配列版エンジンは使用できません", file=sys.stderr)
+        return 1
+
+    up=UsrPrms()
+    up.loaddefault()
+    up.loadjson(args.prm_json)
+    if args.count is not None:
+        count = args.count
+    else:
+        count = up.ups_dic["ensemble_count"].getvl()
+    try:
+        ens=Ensemble(up, count, args.engine, args.workers, args.cache)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    ens.run()
+
+    if args.out is not None:
+        ens.writeband(args.out)
+    if args.store is not None:
+        store = RunStore(args.store)
+        ens.store(store)
+        store.close()
+    if args.summary is None:
+        print("\n".join(ens.sentences))
+    else:
+        a = open(args.summary, "w")
+        a.write("\n".join(ens.sentences)+"\n")
+        a.close()
+    return 0
+
+def sweepcmd(args):
+    """パラメータスイープ（「sweep」コマンド）
+    
+     スイープ指定ファイル(json)を読み込んで、パラメータの組合せ毎
+     にシミュレーションを並列に実行し、組合せ毎の結果(csv)と、サ
+     イクル毎の人数(csv)を書き出す。進捗と残り時間の目安を標準
+     エラー出力に表示する。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            sweep_json(str):スイープ指定ファイル(json)
+                base(str):元にするパラメータファイル(省略可。
+                        スイープ指定ファイルからの相対パス)
+                sweep(dic):変化させるパラメータと範囲
+                        ※Sweep.__init__()を参照
+            prm(str):元にするパラメータファイル(baseより優先)
+            workers(int):並列数(Noneの場合はCPUのコア数)
+            out(str):組合せ毎の結果(csv)の保存先
+            histories(str):サイクル毎の人数(csv)の保存先
+                    ※組合せ毎の履歴は、メモリに溜めずにストリーム
+                    出力してから、最後につなげる
+            engine(str):シミュレーションエンジン
+            store(str):組合せ毎の実行結果の保存先(RunStore)
+                    (Noneの場合は保存しない)
+            cache(str):実行結果のキャッシュのディレクトリ(Noneの場合
+                    は使わない)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py sweep sweep.json --out sweep.csv
+    Note:なし
+    """
+    if args.engine == ENGINE_ARRAY and not import_np():
+        print("NumPyがインストールされていないため、配列版エンジンは使用できません", file=sys.stderr)
+        return 1
+
+    b = open(args.sweep_json)
+    spec = json.load(b)
+    b.close()
+
+    up=UsrPrms()
+    up.loaddefault()
+    prm_json = args.prm
+    if prm_json is None and "base" in spec:
+        prm_json = os.path.join(os.path.dirname(args.sweep_json), spec["base"])
+    if prm_json is not None:
+        up.loadjson(prm_json)
+
+    try:
+        sweep=Sweep(up, spec["sweep"], args.engine, args.workers, args.histories, args.cache)
+    except (KeyError, ValueError) as e:
+        print("スイープ指定が間違っています: {}".format(e), file=sys.stderr)
+        return 1
+
+    def progress(done, total, elapsed):
+        eta = elapsed / done * (total - done)
+        print("\r[{}/{}] {:.0%} 経過 {:.1f}秒 残り約 {:.1f}秒 ".format(done, total, done/total, elapsed, eta),   \
+            end="", file=sys.stderr, flush=True)
+    sweep.run(progress)
+    print("", file=sys.stderr)
+
+    if args.out is not None:
+        sweep.writesummary(args.out)
+    #一時ファイルを消す前に保存する
+    if args.store is not None:
+        store = RunStore(args.store)
+        sweep.store(store)
+        store.close()
+    if args.histories is not None:
+        sweep.writehistories(args.histories)
+    print("組合せ数={} 並列数={} 乱数シード={} 総実行時間(ms)={}".format(len(sweep.points), sweep.workers,   \
+        sweep.seed, sweep.alltime.getelapsedtime()))
+    return 0
+
+def querycmd(args):
+    """実行結果の検索（「query」コマンド）
+    
+     実行結果の保存先(RunStore)から、条件に合う実行のパラメータと
+     結果サマリの指標(csv)を書き出す。実行の番号を指定した場合は、
+     その実行のサイクル毎の人数(csv)を書き出す。
+
+    Args:
+        args(argparse.Namespace):コマンドライン引数
+            store(str):実行結果の保存先
+            where[](str):検索条件("列名 演算子 値"。すべてに合うもの)
+            history(int):サイクル毎の人数を書き出す実行の番号
+                    (Noneの場合は検索結果を書き出す)
+            first(int):最初のサイクル(Noneの場合は0)
+            last(int):最後のサイクル(Noneの場合は最後まで)
+            out(str):csvの保存先(Noneの場合は標準出力)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:
+        python3 cv19sim.py query runs.db -w "infection_rate>=0.5" -w "peak_i>80"
+        python3 cv19sim.py query runs.db --history 12 --first 50 --last 100
+    Note:なし
+    """
+    if not os.path.exists(args.store):
+        print("実行結果の保存先がありません: {}".format(args.store), file=sys.stderr)
+        return 1
+    try:
+        store = RunStore(args.store)
+    except ValueError as e:
+        print("実行結果の保存先ではありません: {}".format(e), file=sys.stderr)
+        return 1
+
+    try:
+        if args.history is not None:
+            csv_title = [titles[0] for titles in DSP_TITLES_DIC]
+            rows = store.history(args.history, args.first, args.last)
+        else:
+            runs = store.find([RunStore.parsecond(w) for w in args.where or []])
+            csv_title = list(RunStore.RUN_KEYS + RunStore.PRM_KEYS + RunStore.METRIC_KEYS)
+            rows = [[run[key] for key in csv_title] for run in runs]
+    except ValueError as e:
+        print("検索条件が間違っています: {}".format(e), file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+
+    a = sys.stdout if args.out is None else open(args.out, "w", newline="")
+    csvout = csv.writer(a)
+    csvout.writerow(csv_title)
+    csvout.writerows(rows)
+    if args.out is not None:
+        a.close()
+    return 0
+
+def cmdmain(argv):
+    """コマンドライン引数の解析・実行
+    
+     引数なしの場合・「replay」コマンドの場合は画面ありで、「run」
+     「resume」「fork」「traj」「ensemble」「sweep」「query」コマンドの場合
+     は画面なしで実行する
+
+    Args:
+        argv[](str):コマンドライン引数(プログラム名を除く)
+    Returns:終了コード(int)
+    Raises:なし
+    Yields:なし
+    Examples:なし
+    Note:なし
+    """
+    parser = argparse.ArgumentParser(description="感染simulater")
+    subparsers = parser.add_subparsers(dest="command")
+    p_run = subparsers.add_parser("run", help="画面なしでシミュレーションを実行する")
+    p_run.add_argument("prm_json", help="パラメータファイル(json)")
+    p_run.add_argument("--out", help="結果(csv)の保存先")
+    p_run.add_argument("--summary", help="結果サマリ(テキスト)の保存先(省略時は標準出力)")
+    p_run.add_argument("--engine", choices=ENGINE_LIST, default=ENGINE_PERSON,   \
+        help="シミュレーションエンジン(省略時はperson)")
+    p_run.add_argument("--checkpoint", help="チェックポイントの保存先")
+    p_run.add_argument("--every", type=int, help="チェックポイントの間隔(サイクル)(省略時はパラメータの値)")
+    p_run.add_argument("--stream", help="サイクル毎の履歴を逐次書き出す先(.csvの場合はcsv、それ以外はバイナリ)")
+    p_run.add_argument("--traj", help="全員の軌跡(位置・ステータス)の記録先")
+    p_run.add_argument("--traj-raw", action="store_true", help="軌跡を差分にせずに記録する")
+    p_run.add_argument("--store", help="実行結果を追加するデータベース(SQLite)")
+    p_run.add_argument("--cache", nargs="?", const=CACHE_DIR,   \
+        help="実行結果のキャッシュを使う(ディレクトリ省略時は{})".format(CACHE_DIR))
+    p_res = subparsers.add_parser("resume", help="チェックポイントから画面なしで再開する")
+    p_res.add_argument("ckpt", help="チェックポイントファイル")
+    p_res.add_argument("--out", help="結果(csv)の保存先")
+    p_res.add_argument("--summary", help="結果サマリ(テキスト)の保存先(省略時は標準出力)")
+    p_res.add_argument("--checkpoint", help="チェックポイントの保存先(省略時は読み込んだファイル)")
+    p_res.add_argument("--every", type=int, help="チェックポイントの間隔(サイクル)(省略時は保存時の値)")
+    p_res.add_argument("--store", help="実行結果を追加するデータベース(SQLite)")
+    p_frk = subparsers.add_parser("fork", help="チェックポイントから、パラメータを変えた複数の分岐を実行する")
+    p_frk.add_argument("ckpt", help="チェックポイントファイル")
+    p_frk.add_argument("branches_json", help="分岐指定ファイル(json)")
+    p_frk.add_argument("--workers", type=int, help="並列数(省略時はCPUのコア数)")
+    p_frk.add_argument("--out", help="分岐毎の結果(csv)の保存先")
+    p_frk.add_argument("--histories", help="サイクル毎の人数(csv)の保存先")
+    p_rep = subparsers.add_parser("replay", help="軌跡ファイルを画面で再生する")
+    p_rep.add_argument("traj_file", help="軌跡ファイル")
+    p_trj = subparsers.add_parser("traj", help="軌跡ファイルから、指定したサイクルの全員の状態を取り出す")
+    p_trj.add_argument("traj_file", help="軌跡ファイル")
+    p_trj.add_argument("--cycle", type=int, help="取り出すサイクル(省略時はファイルの情報を表示)")
+    p_trj.add_argument("--out", help="csvの保存先(省略時は標準出力)")
+    p_ens = subparsers.add_parser("ensemble", help="シードを変えて複数回実行し、結果を集計する")
+    p_ens.add_argument("prm_json", help="パラメータファイル(json)")
+    p_ens.add_argument("-n", "--count", type=int, help="実行回数(省略時はパラメータのアンサンブル回数)")
+    p_ens.add_argument("--workers", type=int, help="並列数(省略時はCPUのコア数)")
+    p_ens.add_argument("--out", help="集計結果(csv)の保存先")
+    p_ens.add_argument("--summary", help="結果サマリ(テキスト)の保存先(省略時は標準出力)")
+    p_ens.add_argument("--engine", choices=ENSEMBLE_ENGINE_LIST, default=ENGINE_PERSON,   \
+        help="シミュレーションエンジン(省略時はperson。batchは全レプリカを配列でまとめて実行)")
+    p_ens.add_argument("--store", help="レプリカ毎の実行結果を追加するデータベース(SQLite)")
+    p_ens.add_argument("--cache", nargs="?", const=CACHE_DIR,   \
+        help="実行結果のキャッシュを使う(ディレクトリ省略時は{})".format(CACHE_DIR))
+    p_swp = subparsers.add_parser("sweep", help="パラメータを変化させて(組合せて)実行する")
+    p_swp.add_argument("sweep_json", help="スイープ指定ファイル(json)")
+    p_swp.add_argument("--prm", help="元にするパラメータファイル(json)(省略時はスイープ指定のbase)")
+    p_swp.add_argument("--workers", type=int, help="並列数(省略時はCPUのコア数)")
+    p_swp.add_argument("--out", help="組合せ毎の結果(csv)の保存先")
+    p_swp.add_argument("--histories", help="サイクル毎の人数(csv)の保存先")
+    p_swp.add_argument("--engine", choices=ENGINE_LIST, default=ENGINE_PERSON,   \
+        help="シミュレーションエンジン(省略時はperson)")
+    p_swp.add_argument("--store", help="組合せ毎の実行結果を追加するデータベース(SQLite)")
+    p_swp.add_argument("--cache", nargs="?", const=CACHE_DIR,   \
+        help="実行結果のキャッシュを使う(ディレクトリ省略時は{})".format(CACHE_DIR))
+    p_qry = subparsers.add_parser("query", help="データベースに保存した実行結果を検索する")
+    p_qry.add_argument("store", help="データベース(SQLite)")
+    p_qry.add_argument("-w", "--where", action="append", help="検索条件(例:\"infection_rate>=0.5\")(複数指定可)")
+    p_qry.add_argument("--history", type=int, help="サイクル毎の人数を取り出す実行の番号(run_id)")
+    p_qry.add_argument("--first", type=int, help="最初のサイクル(--historyの場合)")
+    p_qry.add_argument("--last", type=int, help="最後のサイクル(--historyの場合)")
+    p_qry.add_argument("--out", help="csvの保存先(省略時は標準出力)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return runcmd(args)
+    if args.command == "resume":
+        return resumecmd(args)
+    if args.command == "fork":
+        return forkcmd(args)
+    if args.command == "traj":
+        return trajcmd(args)
+    if args.command == "replay":
+        rungui(args.traj_file)
+        return 0
+    if args.command == "ensemble":
+        return ensemblecmd(args)
+    if args.command == "sweep":
+        return sweepcmd(args)
+    if args.command == "query":
+        return querycmd(args)
+
+    rungui()
+    return 0
+
 #ここからメインロジック##################################
 
-main=MainApp()
-main.root.mainloop()
+if __name__ == "__main__":
+    sys.exit(cmdmain(sys.argv[1:]))
@@ -0,0 +1,37 @@
+"""テスト共通の関数
+
+ テストは小さい人数で行う。各テストファイルは、このファイルを
+ import して使う（cv19sim.pyの場所もここで設定する）。
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cv19sim
+
+SEED = 11
+SMALL_PRM = {"s_persons_count": 396, "i_persons_count": 4, "cycle_max": 80}
+
+def makeup(prm=None, seed=SEED):
+    """ユーザーパラメータの作成(デフォルト値にSMALL_PRM・prmとシードを設定)"""
+    up = cv19sim.UsrPrms()
+    up.loaddefault()
+    for key, value in dict(SMALL_PRM, **(prm or {})).items():
+        up.ups_dic[key].set(value)
+    up.ups_dic["seed"].set(seed)
+    up.recalc()
+    return up
+
+def engines():
+    """チェックポイントを使えるエンジン(NumPyが無い場合は配列版を除く)"""
+    result = [cv19sim.ENGINE_PERSON, cv19sim.ENGINE_EVENT]
+    if cv19sim.import_np():
+        result.append(cv19sim.ENGINE_ARRAY)
+    return result
+
+def readcsv(path):
+    """ファイルの内容(文字列)"""
+    a = open(path)
+    text = a.read()
+    a.close()
+    return text
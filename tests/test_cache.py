@@ -0,0 +1,63 @@
+"""ResultCache(実行結果のキャッシュ)のテスト(user-025)"""
+import os
+
+from simtest import SEED, cv19sim, makeup
+
+def test_key():
+    """値の書き方によらず同じキー、シード・エンジンが違えば違うキー"""
+    prm_dic = makeup().getdic()
+    key = cv19sim.ResultCache.key(prm_dic, SEED, cv19sim.ENGINE_PERSON)
+    same = dict(prm_dic, field_size=float(prm_dic["field_size"]))
+    assert cv19sim.ResultCache.key(same, SEED, cv19sim.ENGINE_PERSON) == key
+    assert cv19sim.ResultCache.key(prm_dic, SEED+1, cv19sim.ENGINE_PERSON) != key
+    assert cv19sim.ResultCache.key(prm_dic, SEED, cv19sim.ENGINE_EVENT) != key
+    other = dict(prm_dic, infection_rate=prm_dic["infection_rate"]/2)
+    assert cv19sim.ResultCache.key(other, SEED, cv19sim.ENGINE_PERSON) != key
+
+def test_broken_file_dropped(tmp_path):
+    """壊れたキャッシュファイルは、消して無かったものとする"""
+    cache = cv19sim.ResultCache(str(tmp_path))
+    key = cache.key(makeup().getdic(), SEED, cv19sim.ENGINE_PERSON)
+    value = {"rows": [[0, 1, 2]], "sentences": ["ok"]}
+    cache.put(key, value)
+    assert cache.get(key) == value
+
+    path = cache.filepath(key)
+    b = open(path, "r+b")
+    b.seek(-1, os.SEEK_END)
+    last = b.read(1)
+    b.seek(-1, os.SEEK_END)
+    b.write(bytes([last[0] ^ 0xff]))
+    b.close()
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+    #途中で切れたファイルも同じ
+    cache.put(key, value)
+    b = open(path, "r+b")
+    b.truncate(len(cv19sim.CACHE_MAGIC) + 10)
+    b.close()
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+def test_evict(tmp_path):
+    """上限を超えた場合は、最後に使った日時が古いものから消す"""
+    cache = cv19sim.ResultCache(str(tmp_path))
+    keys = [cache.key(makeup().getdic(), seed, cv19sim.ENGINE_PERSON) for seed in range(4)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"rows": [[i]*100]})
+        os.utime(cache.filepath(key), (1000 + i, 1000 + i))
+    cache.max_bytes = sum(os.path.getsize(cache.filepath(key)) for key in keys[2:])
+    assert cache.evict() == 2
+    assert [os.path.exists(cache.filepath(key)) for key in keys] == [False, False, True, True]
+    assert cache.evict() == 0
+
+def test_replica_from_cache(tmp_path):
+    """キャッシュを使っても、使わない場合と同じ結果になる"""
+    prm_dic = makeup().getdic()
+    expected = cv19sim.runreplica(prm_dic, cv19sim.ENGINE_PERSON, SEED)
+    for i in range(2):
+        hist, metric = cv19sim.runreplica(prm_dic, cv19sim.ENGINE_PERSON, SEED, cache_dir=str(tmp_path))
+        assert list(hist) == list(expected[0])
+        assert metric == expected[1]
+    assert len(os.listdir(str(tmp_path))) == 1
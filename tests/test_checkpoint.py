@@ -0,0 +1,31 @@
+"""チェックポイント（保存と再開）のテスト(user-016)"""
+import pytest
+
+from simtest import cv19sim, engines, makeup, readcsv
+
+@pytest.mark.parametrize("engine", engines())
+def test_resume_same_csv(engine, tmp_path):
+    """途中で保存して再開しても、中断しない実行と同じcsvになる"""
+    ckpt = str(tmp_path / "run.ckpt")
+    sim = cv19sim.Simulation(makeup())
+    sim.setup(engine)
+    for i in range(10):
+        sim.sim_cycle()
+        assert not sim.isend()
+        sim.nextcycle()
+    sim.savecheckpoint(ckpt)
+    sim.runloop()
+    sim.writehistory(str(tmp_path / "whole.csv"))
+
+    resumed = cv19sim.Simulation(None)
+    resumed.resume(ckpt)
+    resumed.writehistory(str(tmp_path / "resumed.csv"))
+    assert resumed.engine_kind == engine
+    assert readcsv(tmp_path / "resumed.csv") == readcsv(tmp_path / "whole.csv")
+
+def test_broken_checkpoint(tmp_path):
+    """チェックポイントでないファイルからは再開できない"""
+    path = tmp_path / "broken.ckpt"
+    path.write_bytes(b"not a checkpoint")
+    with pytest.raises(ValueError):
+        cv19sim.Simulation(None).resume(str(path))
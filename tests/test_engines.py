@@ -0,0 +1,69 @@
+"""シミュレーションエンジンの比較テスト
+
+ 別の実装のエンジンが、人単位のエンジン(PersonEngine)と同じ分
+ 布の結果（最終的な感染者数・死亡者数）になることを確認する。
+ 乱数の使い方がエンジン毎に違うため、結果は１回ずつは一致しな
+ い。同じパラメータで RUNS 回ずつ実行し、平均の差が標準誤差の
+ 3倍以内・標準偏差の比が1/2〜2倍であることを確認する。
+"""
+import functools
+import math
+import statistics
+
+import pytest
+
+from simtest import cv19sim, makeup
+
+RUNS = 40
+#流行が起きたり起きなかったりして、結果がばらつくパラメータ
+DIST_PRM = {"s_persons_count": 197, "i_persons_count": 3, "field_size": 300, "infection_rate": 0.15,
+    "get_immunity_cycle": 14, "cycle_max": 300}
+
+def outcome(hist):
+    """最終的な感染者数(感染しなかった人以外)と死亡者数"""
+    total = DIST_PRM["s_persons_count"] + DIST_PRM["i_persons_count"]
+    return (total - hist[-1][1], hist[-1][6])
+
+@functools.lru_cache(maxsize=None)
+def outcomes(engine):
+    """RUNS回実行した結果[(最終的な感染者数,死亡者数)]"""
+    result = []
+    for seed in range(1, RUNS+1):
+        sim = cv19sim.Simulation(makeup(DIST_PRM, seed))
+        sim.run(engine)
+        result.append(outcome(sim.sim_histories))
+    return tuple(result)
+
+def assert_same_distribution(results, expected):
+    """平均の差が標準誤差の3倍以内で、標準偏差の比が1/2〜2倍"""
+    for col in range(2):
+        a = [r[col] for r in results]
+        b = [r[col] for r in expected]
+        sd_a, sd_b = statistics.stdev(a), statistics.stdev(b)
+        se = math.sqrt(sd_a**2/len(a) + sd_b**2/len(b))
+        assert abs(statistics.mean(a) - statistics.mean(b)) <= 3*se, (col, a, b)
+        assert 0.5 <= sd_a/sd_b <= 2.0, (col, a, b)
+
+def test_event_engine():
+    """イベント駆動のエンジン(EventEngine)の結果の分布"""
+    assert_same_distribution(outcomes(cv19sim.ENGINE_EVENT), outcomes(cv19sim.ENGINE_PERSON))
+
+def test_batch_engine():
+    """レプリカを一括実行するエンジン(BatchEngine)の結果の分布"""
+    if not cv19sim.import_np():
+        pytest.skip("NumPy is not installed")
+    batch = cv19sim.BatchSimulation(makeup(DIST_PRM), range(1, RUNS+1))
+    batch.run()
+    assert len(batch.sim_histories) == RUNS
+    assert_same_distribution([outcome(h) for h in batch.sim_histories], outcomes(cv19sim.ENGINE_PERSON))
+
+def test_batch_same_seed():
+    """BatchEngineも、同じシードの列なら同じ履歴"""
+    if not cv19sim.import_np():
+        pytest.skip("NumPy is not installed")
+    results = []
+    for i in range(2):
+        batch = cv19sim.BatchSimulation(makeup(), [5, 6, 7])
+        batch.run()
+        results.append([list(h) for h in batch.sim_histories])
+    assert results[0] == results[1]
@@ -0,0 +1,38 @@
+"""Ensemble(アンサンブル実行)のテスト(user-006)"""
+import pytest
+
+from simtest import cv19sim, makeup
+
+def test_ensemble():
+    """各レプリカの結果が、同じシードで１回ずつ実行した結果と同じ"""
+    up = makeup()
+    ens = cv19sim.Ensemble(up, 4, workers=2)
+    ens.run()
+    assert len(ens.seeds) == len(set(ens.seeds)) == 4
+    assert len(ens.histories) == len(ens.metrics) == 4
+    prm_dic = up.getdic()
+    for seed, hist, metric in zip(ens.seeds, ens.histories, ens.metrics):
+        one_hist, one_metric = cv19sim.runreplica(prm_dic, cv19sim.ENGINE_PERSON, seed)
+        assert list(hist) == list(one_hist)
+        assert metric == one_metric
+    #バンドは一番長い履歴の長さ、中央値は最小と最大の間
+    assert len(ens.band) == max(len(h) for h in ens.histories)
+    for cycle, (mean, q05, q50, q95) in enumerate(ens.bandcol("感染(計)")):
+        values = [sum(h[min(cycle, len(h)-1)][2:5]) for h in ens.histories]
+        assert min(values) <= q05 <= q50 <= q95 <= max(values)
+        assert mean == pytest.approx(sum(values)/len(values), abs=1e-4)
+
+def test_same_seed_same_seeds():
+    """元のシードが同じなら、レプリカのシードも同じ"""
+    first = cv19sim.Ensemble(makeup(), 3, workers=1)
+    first.run()
+    second = cv19sim.Ensemble(makeup(), 3, workers=1)
+    second.run()
+    assert first.seeds == second.seeds
+    assert first.metrics == second.metrics
+
+@pytest.mark.parametrize("count", [0, -1])
+def test_bad_count(count):
+    """レプリカの数が1未満ならエラー"""
+    with pytest.raises(ValueError):
+        cv19sim.Ensemble(makeup(), count)
@@ -0,0 +1,50 @@
+"""Fork(一時停止した状態からの分岐実行)のテスト(user-017)"""
+import pytest
+
+from simtest import cv19sim, engines, makeup
+
+def advance(sim, cycles):
+    """指定したサイクル数だけ進める(サイクルの間で止める)"""
+    for i in range(cycles):
+        sim.sim_cycle()
+        assert not sim.isend()
+        sim.nextcycle()
+
+@pytest.mark.parametrize("engine", engines())
+def test_fork(engine):
+    """全分岐が分岐したサイクルから始まり、分岐前の履歴は同じ"""
+    sim = cv19sim.Simulation(makeup())
+    sim.setup(engine)
+    advance(sim, 5)
+    fork = cv19sim.Fork(sim, [{"name": "そのまま"}, {"s_move_disable_rate": 0.9},
+        {"i_n_move_limit_rate": 0.5}], workers=2)
+    #分岐を作った後に進めても、分岐するのは実行する時点の状態
+    advance(sim, 5)
+    before = list(sim.sim_histories)
+    fork.run()
+    assert fork.fork_cycle == 10
+    assert fork.names == ["そのまま", "分岐2", "分岐3"]
+    assert len(fork.histories) == len(fork.metrics) == 3
+    for hist in fork.histories:
+        assert list(hist)[:len(before)] == before
+        assert len(hist) > len(before)
+    #分岐しても、元のシミュレーションは変わらない
+    assert list(sim.sim_histories) == before
+
+    #パラメータを変えない分岐は、元のシミュレーションをそのまま続けた結果と同じ
+    sim.runloop()
+    assert list(fork.histories[0]) == list(sim.sim_histories)
+    assert fork.metrics[0] == cv19sim.replicametric(sim)
+
+@pytest.mark.parametrize("branches,error", [
+    ([], ValueError),
+    ([{"seed": 1}], KeyError),
+    ([{"infection_rate": 0.1}], KeyError),
+    ([{"s_move_disable_rate": "high"}], ValueError),
+])
+def test_bad_branches(branches, error):
+    """分岐が無い・変更できないパラメータ・数値でない値はエラー"""
+    sim = cv19sim.Simulation(makeup())
+    sim.setup(cv19sim.ENGINE_PERSON)
+    with pytest.raises(error):
+        cv19sim.Fork(sim, branches)
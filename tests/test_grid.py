@@ -0,0 +1,46 @@
+"""InfectionGrid(感染判定用空間インデックス)のテスト(user-001)"""
+import random
+
+import pytest
+
+from simtest import cv19sim
+
+class Infected():
+    """InfectionGridに登録する感染者(位置とステータスだけ)"""
+    def __init__(self, x, y):
+        self.point = [x, y]
+        self.stat = cv19sim.I_STATE
+
+def brute(persons, point, r2):
+    """全員との距離を調べた人数"""
+    x, y = point
+    return sum(1 for p in persons if r2 > (x - p.point[0])**2 + (y - p.point[1])**2)
+
+@pytest.mark.parametrize("field_size,cell_size", [(100, 3), (100, 7), (50, 30), (20, 25)])
+def test_count(field_size, cell_size):
+    """近傍の感染者数が、全員との距離を調べた人数と同じ（フィールドの端を含む）"""
+    rng = random.Random(field_size*100 + cell_size)
+    persons = [Infected(rng.uniform(0, field_size), rng.uniform(0, field_size)) for i in range(300)]
+    #フィールドの端・角にも置く
+    edges = [0.0, 1e-9, cell_size/2, field_size - cell_size/2, field_size - 1e-9]
+    persons += [Infected(x, y) for x in edges for y in edges]
+    grid = cv19sim.InfectionGrid(field_size, cell_size)
+    grid.rebuild(persons)
+    r2 = cell_size**2
+    points = [p.point for p in persons] + [[x, y] for x in edges for y in edges]
+    points += [[rng.uniform(0, field_size), rng.uniform(0, field_size)] for i in range(300)]
+    for point in points:
+        assert grid.count(point, r2) == brute(persons, point, r2)
+
+    #削除した後も同じ
+    for p in persons[::3]:
+        grid.remove(p)
+    rest = [p for i, p in enumerate(persons) if i % 3]
+    for point in points:
+        assert grid.count(point, r2) == brute(rest, point, r2)
+
+    #追加した後も同じ
+    for p in persons[::3]:
+        grid.add(p)
+    for point in points:
+        assert grid.count(point, r2) == brute(persons, point, r2)
@@ -0,0 +1,39 @@
+"""HistBuffer(シミュレーション履歴)とストリーム出力のテスト(user-018)"""
+import random
+
+import pytest
+
+from simtest import cv19sim, makeup, readcsv
+
+@pytest.mark.parametrize("capacity", [1, 7, 64])
+def test_ring(capacity):
+    """リングバッファの最小値・合計が、全行のリストと同じ"""
+    rng = random.Random(capacity)
+    rows = []
+    ring = cv19sim.HistBuffer(capacity)
+    for no in range(200):
+        row = [no] + [rng.randint(0, 1000) for i in range(cv19sim.HIST_INT_COLS-1)]   \
+            + [round(rng.uniform(0, 100), 2) for i in range(cv19sim.HIST_COLS-cv19sim.HIST_INT_COLS)]
+        rows.append(row)
+        ring.append(row)
+    assert list(ring) == rows[-capacity:]
+    assert ring[-1] == rows[-1]
+    for col in range(cv19sim.HIST_COLS):
+        values = [row[col] for row in rows]
+        assert ring.colmin[col] == min(values)
+        assert ring.argmin[col] == values.index(min(values))
+        assert ring.colsum[col] == pytest.approx(sum(values))
+
+def test_stream_same_csv(tmp_path):
+    """ストリーム出力しても、メモリに保持した場合と同じcsv・指標になる"""
+    whole = cv19sim.Simulation(makeup())
+    whole.run(cv19sim.ENGINE_PERSON)
+    whole.writehistory(str(tmp_path / "whole.csv"))
+
+    stream = cv19sim.Simulation(makeup())
+    stream.hist_path = str(tmp_path / "stream.csv")
+    stream.run(cv19sim.ENGINE_PERSON)
+    stream.writehistory(stream.hist_path)
+    assert stream.sim_histories.capacity == cv19sim.HIST_RING_ROWS
+    assert readcsv(tmp_path / "stream.csv") == readcsv(tmp_path / "whole.csv")
+    assert cv19sim.replicametric(stream) == cv19sim.replicametric(whole)
@@ -0,0 +1,25 @@
+"""感染判定（感染者の人数による判定）のテスト(user-014)"""
+import pytest
+
+from simtest import cv19sim, makeup
+
+@pytest.mark.parametrize("rate", [0.0, 0.05, 0.5, 1.0])
+def test_infection_p(rate):
+    """k人の近くにいる場合の感染確率が 1-(1-感染確率)^k（表にない人数も）"""
+    prm = makeup({"infection_rate": rate}).compile()
+    for k in list(range(10)) + [cv19sim.INFECTION_LUT_SIZE - 1, cv19sim.INFECTION_LUT_SIZE, 500]:
+        assert prm.infection_p(k) == pytest.approx(1.0 - (1.0 - rate)**k)
+    assert prm.infection_p(0) == 0.0
+
+def test_one_draw_per_person():
+    """１回の判定で、感染者１人ずつ判定した場合と同じ割合で感染する"""
+    prm = makeup({"infection_rate": 0.1}).compile()
+    count_rng = cv19sim.SimRandom(3)
+    each_rng = cv19sim.SimRandom(4)
+    trials = 20000
+    for k in (1, 3, 8):
+        by_count = sum(count_rng.bernoulli(prm.infection_p(k)) for i in range(trials))
+        by_each = sum(any(each_rng.bernoulli(prm.infection_rate) for j in range(k)) for i in range(trials))
+        #二項分布の標準偏差の4倍以内
+        sd = (trials*prm.infection_p(k)*(1.0 - prm.infection_p(k)))**0.5
+        assert abs(by_count - by_each) <= 4*sd*2**0.5
@@ -0,0 +1,45 @@
+"""SimRandom(シミュレーション用乱数)と再現性のテスト(user-005)"""
+import copy
+import pickle
+
+import pytest
+
+from simtest import SEED, cv19sim, engines, makeup
+
+@pytest.mark.parametrize("engine", engines())
+def test_same_seed_same_histories(engine):
+    """同じシードなら、同じシミュレーション履歴になる"""
+    results = []
+    for i in range(2):
+        sim = cv19sim.Simulation(makeup())
+        sim.run(engine)
+        results.append(list(sim.sim_histories))
+    assert results[0] == results[1]
+    other = cv19sim.Simulation(makeup(seed=SEED+1))
+    other.run(engine)
+    assert list(other.sim_histories) != results[0]
+
+@pytest.mark.parametrize("dup", [copy.copy, copy.deepcopy, lambda r: pickle.loads(pickle.dumps(r))])
+def test_copy(dup):
+    """コピー・pickleしても、シードと乱数の状態を引き継ぐ"""
+    rng = cv19sim.SimRandom(5)
+    rng.random()
+    other = dup(rng)
+    assert other.base_seed == 5
+    assert [other.random() for i in range(5)] == [rng.random() for i in range(5)]
+
+def test_reseed():
+    """random.Random.seed()で、シードを設定し直せる"""
+    rng = cv19sim.SimRandom(5)
+    rng.seed(3)
+    assert rng.random() == cv19sim.SimRandom(3).random()
+
+def test_geometric():
+    """geometric()の平均が、幾何分布の平均(1/p)に近い"""
+    rng = cv19sim.SimRandom(7)
+    p = 0.2
+    values = [rng.geometric(p) for i in range(20000)]
+    assert min(values) >= 1
+    assert sum(values)/len(values) == pytest.approx(1/p, rel=0.05)
+    assert rng.geometric(0.0) is None
+    assert rng.geometric(1.0) == 1
@@ -0,0 +1,54 @@
+"""simulate()(逐次実行のジェネレータ)のテスト(user-023)"""
+import pytest
+
+from simtest import SEED, SMALL_PRM, cv19sim, engines, makeup
+
+def whole(engine):
+    """途中で止めずに実行したシミュレーション履歴"""
+    sim = cv19sim.Simulation(makeup())
+    sim.run(engine)
+    return list(sim.sim_histories)
+
+@pytest.mark.parametrize("engine", engines())
+def test_same_histories(engine):
+    """記録がSimulation.run()の履歴と同じで、履歴は保持しない"""
+    gen = cv19sim.simulate(SMALL_PRM, seed=SEED, engine=engine)
+    rows = []
+    with pytest.raises(StopIteration) as stop:
+        while True:
+            rows.append(next(gen).row())
+            #直近のサイクルの分だけを保持する
+            assert len(list(gen.gi_frame.f_locals["sim"].sim_histories)) <= 1
+    assert stop.value.value is None
+    assert rows == whole(engine)
+
+def test_history():
+    """history=Trueの場合は、シミュレーション履歴を返す"""
+    gen = cv19sim.simulate(SMALL_PRM, seed=SEED, history=True)
+    rows = []
+    with pytest.raises(StopIteration) as stop:
+        while True:
+            rows.append(next(gen).row())
+    assert list(stop.value.value) == rows
+
+def test_cancel():
+    """途中で受け取るのをやめると、それ以上実行しない"""
+    gen = cv19sim.simulate(SMALL_PRM, seed=SEED)
+    records = [next(gen) for i in range(3)]
+    assert [rec.no for rec in records] == [0, 1, 2]
+    sim = gen.gi_frame.f_locals["sim"]
+    assert sim.now_cycle == 2
+    gen.close()
+    assert sim.now_cycle == 2
+    with pytest.raises(StopIteration):
+        next(gen)
+    assert [rec.row() for rec in records] == whole(cv19sim.ENGINE_PERSON)[:3]
+
+def test_agents():
+    """agents=Trueの場合は、全員の配列を持つ"""
+    gen = cv19sim.simulate(SMALL_PRM, seed=SEED, agents=True)
+    rec = next(gen)
+    gen.close()
+    total = SMALL_PRM["s_persons_count"] + SMALL_PRM["i_persons_count"]
+    assert [len(a) for a in rec.agents] == [total]*4
+    assert next(cv19sim.simulate(SMALL_PRM, seed=SEED)).agents is None
@@ -0,0 +1,50 @@
+"""Simulation(再入可能なエンジン)のテスト(user-021)"""
+import threading
+
+from simtest import cv19sim, makeup
+
+def runalone(seed, engine):
+    sim = cv19sim.Simulation(makeup(seed=seed))
+    sim.run(engine)
+    return list(sim.sim_histories)
+
+def test_interleaved_simulations():
+    """１つのプロセスで、複数のシミュレーションを交互に進めても、
+    １つずつ実行した場合と同じ結果になる"""
+    seeds = [3, 4, 5]
+    sims = []
+    for seed in seeds:
+        sim = cv19sim.Simulation(makeup(seed=seed))
+        sim.setup()
+        sims.append(sim)
+    running = list(sims)
+    while running:
+        for sim in list(running):
+            sim.sim_cycle()
+            if sim.isend():
+                running.remove(sim)
+            else:
+                sim.nextcycle()
+    for sim, seed in zip(sims, seeds):
+        assert list(sim.sim_histories) == runalone(seed, cv19sim.ENGINE_PERSON)
+
+def test_threads():
+    """スレッド毎のシミュレーションも、互いに影響しない"""
+    results = {}
+    def work(seed):
+        results[seed] = runalone(seed, cv19sim.ENGINE_PERSON)
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in (6, 7, 8, 9)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for seed, histories in results.items():
+        assert histories == runalone(seed, cv19sim.ENGINE_PERSON)
+
+def test_default_simulation():
+    """パラメータ省略時は、デフォルト値で実行できる"""
+    sim = cv19sim.Simulation()
+    sim.setup()
+    sim.sim_cycle()
+    assert sim.prm.total_persons_count == cv19sim.defaultprm().total_persons_count
+    assert sum(sim.sim_history[1:7]) == sim.prm.total_persons_count
@@ -0,0 +1,54 @@
+"""RunStore(実行結果の保存先)のテスト(user-024)"""
+import sqlite3
+
+import pytest
+
+from simtest import cv19sim, makeup
+
+def addrun(store, prm):
+    """実行して保存する"""
+    sim = cv19sim.Simulation(makeup(prm))
+    sim.run(cv19sim.ENGINE_PERSON)
+    rows = list(sim.sim_histories)
+    run_id = store.add(sim.prm.getdic(), sim.seed, cv19sim.replicametric(sim), rows, "run")
+    return run_id, rows
+
+def test_add_find(tmp_path):
+    """保存した結果を、パラメータ・指標の範囲で検索できる"""
+    store = cv19sim.RunStore(str(tmp_path / "runs.db"))
+    low, low_rows = addrun(store, {"infection_rate": 0.2})
+    high, high_rows = addrun(store, {"infection_rate": 0.8})
+    assert [r["run_id"] for r in store.find()] == [low, high]
+    found = store.find([cv19sim.RunStore.parsecond("infection_rate>=0.5")])
+    assert [r["run_id"] for r in found] == [high]
+    assert found[0]["kind"] == "run" and found[0]["engine"] == cv19sim.ENGINE_PERSON
+    assert store.find([("infection_rate", ">", 0.9)]) == []
+    assert store.history(low) == low_rows
+    assert store.history(high, 2, 4) == high_rows[2:5]
+    store.close()
+
+    #開き直しても同じ
+    store = cv19sim.RunStore(str(tmp_path / "runs.db"))
+    assert store.history(high) == high_rows
+    store.close()
+
+def test_other_database(tmp_path):
+    """版数が違うデータベースは開けない"""
+    path = str(tmp_path / "other.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA user_version = 999")
+    conn.close()
+    with pytest.raises(ValueError):
+        cv19sim.RunStore(path)
+
+def test_parsecond():
+    """検索条件の列名・演算子が間違っている場合は、ValueError"""
+    assert cv19sim.RunStore.parsecond("infection_rate>=0.5") == ("infection_rate", ">=", 0.5)
+    assert cv19sim.RunStore.parsecond("peak_i < 80") == ("peak_i", "<", 80)
+    assert cv19sim.RunStore.parsecond("kind=sweep") == ("kind", "=", "sweep")
+    with pytest.raises(ValueError):
+        cv19sim.RunStore.parsecond("no_such_column>1")
+    with pytest.raises(ValueError):
+        cv19sim.RunStore.parsecond("1;DROP TABLE params>1")
+    with pytest.raises(ValueError):
+        cv19sim.RunStore.parsecond("infection_rate")
@@ -0,0 +1,47 @@
+"""Sweep(パラメータスイープ)のテスト(user-007)"""
+import pytest
+
+from simtest import cv19sim, makeup
+
+SPEC = {"infection_rate": [0.2, 0.6], "s_move_disable_rate": {"start": 0, "stop": 0.5, "step": 0.5}}
+
+def test_sweep():
+    """各組合せの結果が、そのパラメータで１回実行した結果と同じ"""
+    up = makeup()
+    sweep = cv19sim.Sweep(up, SPEC, workers=2)
+    assert sweep.points == [
+        {"infection_rate": 0.2, "s_move_disable_rate": 0.0},
+        {"infection_rate": 0.2, "s_move_disable_rate": 0.5},
+        {"infection_rate": 0.6, "s_move_disable_rate": 0.0},
+        {"infection_rate": 0.6, "s_move_disable_rate": 0.5}]
+    done = []
+    sweep.run(progress=lambda n, total, sec: done.append((n, total)))
+    assert done == [(n, 4) for n in range(1, 5)]
+    assert len(sweep.metrics) == len(sweep.histories) == 4
+    prm_dic = up.getdic()
+    for point, seed, hist, metric in zip(sweep.points, sweep.seeds, sweep.histories, sweep.metrics):
+        assert seed == prm_dic["seed"]
+        one_hist, one_metric = cv19sim.runreplica(sweep.pointdic(prm_dic, point), cv19sim.ENGINE_PERSON, seed)
+        assert list(hist) == list(one_hist)
+        assert metric == one_metric
+
+def test_density():
+    """人口密度は、その密度になるフィールドサイズにする"""
+    up = makeup()
+    sweep = cv19sim.Sweep(up, {"density": [25, 100]})
+    sizes = [sweep.pointdic(up.getdic(), p)["field_size"] for p in sweep.points]
+    assert sizes[0] == 2*sizes[1]
+
+@pytest.mark.parametrize("spec,error", [
+    ({"no_such_parameter": [1]}, KeyError),
+    ({"seed": [1, 2]}, KeyError),
+    ({"ensemble_count": [1, 2]}, KeyError),
+    ({"infection_rate": []}, ValueError),
+    ({"infection_rate": {"start": 0.5, "stop": 0.1, "step": 0.1}}, ValueError),
+    ({"density": [0, 10]}, ValueError),
+    ({"density": [10], "field_size": [100]}, ValueError),
+])
+def test_bad_spec(spec, error):
+    """変化させられないパラメータ・間違った範囲はエラー"""
+    with pytest.raises(error):
+        cv19sim.Sweep(makeup(), spec)
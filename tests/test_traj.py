@@ -0,0 +1,47 @@
+"""軌跡の記録(TrajRecorder・TrajReader)のテスト(user-019)"""
+import pytest
+
+from simtest import cv19sim, engines, makeup
+
+def test_delta_error(tmp_path):
+    """差分で記録した軌跡の誤差が、差分の単位の半分以内"""
+    readers = {}
+    for delta in (True, False):
+        sim = cv19sim.Simulation(makeup({"cycle_max": 40}))
+        sim.traj_path = str(tmp_path / "{}.traj".format(delta))
+        sim.traj_delta = delta
+        sim.run(cv19sim.ENGINE_PERSON)
+        readers[delta] = cv19sim.TrajReader(sim.traj_path)
+    delta, raw = readers[True], readers[False]
+    assert delta.key_every > 1 and raw.key_every == 1
+    assert len(delta) == len(raw)
+    half = cv19sim.TRAJ_LEVELS//2
+    for frame in range(len(raw)):
+        for qd, qr in zip(delta.quantized(frame), raw.quantized(frame)):
+            for vd, vr in zip(list(qd), list(qr)):
+                #フィールドの1辺で折り返した差
+                assert abs((int(vd) - int(vr) + half) % cv19sim.TRAJ_LEVELS - half) <= delta.dstep/2
+        assert [list(c) for c in delta.codes(frame)] == [list(c) for c in raw.codes(frame)]
+        assert delta.row(frame) == raw.row(frame)
+    delta.close()
+    raw.close()
+
+@pytest.mark.parametrize("engine", engines())
+def test_rows_same_histories(engine, tmp_path):
+    """記録した履歴が、シミュレーション履歴と同じ"""
+    sim = cv19sim.Simulation(makeup({"cycle_max": 40}))
+    sim.traj_path = str(tmp_path / "run.traj")
+    sim.run(engine)
+    reader = cv19sim.TrajReader(sim.traj_path)
+    assert reader.persons == makeup().getdic()["total_persons_count"]
+    assert [reader.row(frame) for frame in range(len(reader))] == list(sim.sim_histories)
+    with pytest.raises(IndexError):
+        reader.row(len(reader))
+    reader.close()
+
+def test_not_traj(tmp_path):
+    """軌跡ファイルではないファイルは読めない"""
+    path = tmp_path / "other.traj"
+    path.write_bytes(bytes(cv19sim.TRAJ_HEAD.size))
+    with pytest.raises(ValueError):
+        cv19sim.TrajReader(str(path))